@@ -3,14 +3,18 @@ from django.conf.urls import url
 from environments.identities.traits.views import SDKTraitsDeprecated
 from environments.identities.views import SDKIdentitiesDeprecated
 from features.views import SDKFeatureStates
+from util.views import sdk_view
 
 app_name = "deprecated"
 
 urlpatterns = [
     url(
         r"^identities/(?P<identifier>[-\w@%.]+)/traits/(?P<trait_key>[-\w.]+)",
-        SDKTraitsDeprecated.as_view(),
+        sdk_view(SDKTraitsDeprecated.as_view()),
     ),
-    url(r"^identities/(?P<identifier>[-\w@%.]+)/", SDKIdentitiesDeprecated.as_view()),
-    url(r"^flags/(?P<identifier>[-\w@%.]+)", SDKFeatureStates.as_view()),
+    url(
+        r"^identities/(?P<identifier>[-\w@%.]+)/",
+        sdk_view(SDKIdentitiesDeprecated.as_view()),
+    ),
+    url(r"^flags/(?P<identifier>[-\w@%.]+)", sdk_view(SDKFeatureStates.as_view())),
 ]
@@ -6,10 +6,15 @@ from drf_yasg2.views import get_schema_view
 from rest_framework import authentication, permissions, routers
 
 from environments.identities.traits.views import SDKTraits
-from environments.identities.views import SDKIdentities
-from environments.sdk.views import SDKEnvironmentAPIView
+from environments.identities.views import SDKIdentities, SDKIdentitiesBulk
+from environments.sdk.views import (
+    SDKEnvironmentAPIView,
+    SDKEnvironmentDeltaAPIView,
+    SDKEnvironmentUpdatesAPIView,
+)
 from features.views import SDKFeatureStates
 from organisations.views import chargebee_webhook
+from util.views import sdk_urls, sdk_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -41,16 +46,31 @@ urlpatterns = [
     # Chargebee webhooks
     url(r"cb-webhook/", chargebee_webhook, name="chargebee-webhook"),
     # Client SDK urls
-    url(r"^flags/$", SDKFeatureStates.as_view(), name="flags"),
-    url(r"^identities/$", SDKIdentities.as_view(), name="sdk-identities"),
-    url(r"^traits/", include(traits_router.urls), name="traits"),
-    url(r"^analytics/flags/$", SDKAnalyticsFlags.as_view()),
+    url(r"^flags/$", sdk_view(SDKFeatureStates.as_view()), name="flags"),
+    url(r"^identities/$", sdk_view(SDKIdentities.as_view()), name="sdk-identities"),
+    url(
+        r"^bulk-identities/$",
+        sdk_view(SDKIdentitiesBulk.as_view()),
+        name="sdk-identities-bulk",
+    ),
+    url(r"^traits/", include(sdk_urls(traits_router.urls)), name="traits"),
+    url(r"^analytics/flags/$", sdk_view(SDKAnalyticsFlags.as_view())),
     url(r"^analytics/telemetry/$", SelfHostedTelemetryAPIView.as_view()),
     url(
         r"^environment-document/$",
-        SDKEnvironmentAPIView.as_view(),
+        sdk_view(SDKEnvironmentAPIView.as_view()),
         name="environment-document",
     ),
+    url(
+        r"^environment-document/delta/$",
+        sdk_view(SDKEnvironmentDeltaAPIView.as_view()),
+        name="environment-document-delta",
+    ),
+    url(
+        r"^environment-updates/$",
+        sdk_view(SDKEnvironmentUpdatesAPIView.as_view()),
+        name="environment-updates",
+    ),
     # API documentation
     url(
         r"^swagger(?P<format>\.json|\.yaml)$",
@@ -0,0 +1,109 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import asyncio
+import os
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import django
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings.local")
+os.environ.setdefault("ENABLE_ASYNC_SDK_VIEWS", "True")
+os.environ.setdefault("ENVIRONMENT_UPDATES_STREAMING", "True")
+
+_END_OF_STREAM = object()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    Django (before 4.2) iterates streaming responses in the event loop, so a stream
+    that blocks while it waits for its next part (e.g. the event stream of
+    environment updates) would hold up every other request served by the process.
+    Each part of a streaming response is produced in a thread of a pool instead.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": _get_response_headers(response),
+            }
+        )
+        try:
+            loop = asyncio.get_running_loop()
+            executor = get_streaming_executor()
+            parts = iter(response)
+            while True:
+                part = await loop.run_in_executor(executor, _get_next_part, parts)
+                if part is _END_OF_STREAM:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+            await send({"type": "http.response.body"})
+        finally:
+            await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_streaming_executor() -> ThreadPoolExecutor:
+    # the event streams of environment updates are the only streaming responses,
+    # and each process serves at most ENVIRONMENT_UPDATES_MAX_WAITERS of them
+    return _get_streaming_executor(settings.ENVIRONMENT_UPDATES_MAX_WAITERS)
+
+
+@lru_cache(maxsize=None)
+def _get_streaming_executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers, thread_name_prefix="asgi-streaming")
+
+
+def _get_next_part(parts: typing.Iterator[bytes]) -> typing.Any:
+    try:
+        return next(parts, _END_OF_STREAM)
+    finally:
+        close_old_connections()
+
+
+def _get_response_headers(response) -> typing.List[typing.Tuple[bytes, bytes]]:
+    # as built by ASGIHandler.send_response
+    response_headers = []
+    for header, value in response.items():
+        if isinstance(header, str):
+            header = header.encode("ascii")
+        if isinstance(value, str):
+            value = value.encode("latin1")
+        response_headers.append((bytes(header), bytes(value)))
+    for cookie in response.cookies.values():
+        response_headers.append(
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+        )
+    return response_headers
+
+
+# as done by django.core.asgi.get_asgi_application
+django.setup(set_prefix=False)
+django_application = StreamingASGIHandler()
+
+
+async def application(scope, receive, send):
+    # Run the synchronous code of each request (e.g. synchronous middleware and
+    # views) in a thread of its own rather than in a single thread shared by all
+    # requests, as Django does itself from version 4.0.
+    async with ThreadSensitiveContext():
+        return await django_application(scope, receive, send)
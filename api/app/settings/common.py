@@ -43,6 +43,14 @@ ENABLE_TELEMETRY = env("ENABLE_TELEMETRY", default=True)
 # Enables gzip compression
 ENABLE_GZIP_COMPRESSION = env.bool("ENABLE_GZIP_COMPRESSION", default=False)
 
+# Serve the SDK endpoints with async views that run the request in a bounded pool of
+# threads, so that an ASGI server can hold many more requests open than there are
+# threads. This is enabled by default when serving app.asgi.
+ENABLE_ASYNC_SDK_VIEWS = env.bool("ENABLE_ASYNC_SDK_VIEWS", default=False)
+# The number of SDK requests (and hence database connections) handled at once by each
+# process when async SDK views are enabled.
+ASYNC_SDK_VIEWS_MAX_THREADS = env.int("ASYNC_SDK_VIEWS_MAX_THREADS", default=20)
+
 SECRET_KEY = env("DJANGO_SECRET_KEY", default=get_random_secret_key())
 
 HOSTED_SEATS_LIMIT = env.int("HOSTED_SEATS_LIMIT", default=0)
@@ -56,6 +64,40 @@ INFLUXDB_TOKEN = env.str("INFLUXDB_TOKEN", default="")
 INFLUXDB_BUCKET = env.str("INFLUXDB_BUCKET", default="")
 INFLUXDB_URL = env.str("INFLUXDB_URL", default="")
 INFLUXDB_ORG = env.str("INFLUXDB_ORG", default="")
+# API usage and flag analytics are summed in memory and written to InfluxDB in a
+# single batch every few seconds, or as soon as the given number of requests have
+# been recorded. Data for new environments, features, etc. is dropped while there
+# are more than INFLUXDB_MAX_TAG_SETS points waiting to be written.
+INFLUXDB_FLUSH_INTERVAL_SECONDS = env.float("INFLUXDB_FLUSH_INTERVAL_SECONDS", 10.0)
+INFLUXDB_FLUSH_MAX_EVENTS = env.int("INFLUXDB_FLUSH_MAX_EVENTS", 10000)
+INFLUXDB_MAX_TAG_SETS = env.int("INFLUXDB_MAX_TAG_SETS", 100000)
+
+# Store API usage and flag analytics in the database, rolled up into buckets of 15
+# minutes, 1 hour and 1 day, instead of InfluxDB.
+USE_POSTGRES_FOR_ANALYTICS = env.bool("USE_POSTGRES_FOR_ANALYTICS", default=False)
+ANALYTICS_BACKEND = env.str(
+    "ANALYTICS_BACKEND",
+    default="app_analytics.backends.DatabaseAnalyticsBackend"
+    if USE_POSTGRES_FOR_ANALYTICS
+    else "app_analytics.backends.InfluxDBAnalyticsBackend",
+)
+# Analytics written to the database are rolled up by each process every given number
+# of seconds. Set to 0 to only roll them up with the compact_analytics command.
+ANALYTICS_COMPACTION_INTERVAL_SECONDS = env.float(
+    "ANALYTICS_COMPACTION_INTERVAL_SECONDS", 60.0
+)
+ANALYTICS_ENABLED = bool(INFLUXDB_TOKEN or USE_POSTGRES_FOR_ANALYTICS)
+# Usage queries are cached until the end of the bucket they read from. The usage of
+# the top organisations (by API calls over the last 30 days) is refreshed every given
+# number of seconds by the prewarm_usage_cache management command, which should be
+# run by a single process (or with --once as a scheduled task). Web processes only
+# run the queries that aren't already cached.
+ANALYTICS_USAGE_PREWARM_INTERVAL_SECONDS = env.float(
+    "ANALYTICS_USAGE_PREWARM_INTERVAL_SECONDS", 300.0
+)
+ANALYTICS_USAGE_PREWARM_ORGANISATIONS = env.int(
+    "ANALYTICS_USAGE_PREWARM_ORGANISATIONS", 100
+)
 
 ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=[])
 USE_X_FORWARDED_HOST = env.bool("USE_X_FORWARDED_HOST", default=False)
@@ -133,16 +175,15 @@ INSTALLED_APPS = [
     "integrations.rudderstack",
     "integrations.slack",
     "integrations.webhook",
+    "webhooks",
     # Rate limiting admin endpoints
     "axes",
     "telemetry",
     # for filtering querysets on viewsets
     "django_filters",
+    "app_analytics",
 ]
 
-if GOOGLE_ANALYTICS_KEY or INFLUXDB_TOKEN:
-    INSTALLED_APPS.append("app_analytics")
-
 SITE_ID = 1
 
 db_conn_max_age = env.int("DJANGO_DB_CONN_MAX_AGE", 60)
@@ -168,6 +209,29 @@ elif "DJANGO_DB_NAME" in os.environ:
             "CONN_MAX_AGE": DJANGO_DB_CONN_MAX_AGE,
         },
     }
+
+# Read only SDK requests can be served from one or more read replicas of the database
+REPLICA_DATABASE_URLS = env.list("REPLICA_DATABASE_URLS", default=[])
+# How to choose a replica, either ROUND_ROBIN or LAG (the least replication lag)
+REPLICA_READ_STRATEGY = env.str("REPLICA_READ_STRATEGY", default="ROUND_ROBIN")
+REPLICA_MAX_LAG_SECONDS = env.float("REPLICA_MAX_LAG_SECONDS", default=5.0)
+REPLICA_HEALTH_CHECK_INTERVAL_SECONDS = env.float(
+    "REPLICA_HEALTH_CHECK_INTERVAL_SECONDS", default=30.0
+)
+REPLICA_DATABASE_ALIASES = []
+for index, replica_database_url in enumerate(REPLICA_DATABASE_URLS, start=1):
+    replica_alias = f"replica_{index}"
+    DATABASES[replica_alias] = {
+        **dj_database_url.parse(
+            replica_database_url, conn_max_age=DJANGO_DB_CONN_MAX_AGE
+        ),
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASE_ALIASES.append(replica_alias)
+
+if REPLICA_DATABASE_ALIASES:
+    DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -186,7 +250,7 @@ REST_FRAMEWORK = {
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.static.whitenoise_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -204,7 +268,7 @@ if ENABLE_GZIP_COMPRESSION:
 if GOOGLE_ANALYTICS_KEY:
     MIDDLEWARE.append("app_analytics.middleware.GoogleAnalyticsMiddleware")
 
-if INFLUXDB_TOKEN:
+if ANALYTICS_ENABLED:
     MIDDLEWARE.append("app_analytics.middleware.InfluxDBMiddleware")
 
 ALLOWED_ADMIN_IP_ADDRESSES = env.list("ALLOWED_ADMIN_IP_ADDRESSES", default=list())
@@ -213,7 +277,10 @@ if len(ALLOWED_ADMIN_IP_ADDRESSES) > 0:
         "Restricting access to the admin site for ip addresses %s"
         % ", ".join(ALLOWED_ADMIN_IP_ADDRESSES)
     )
-    MIDDLEWARE.append("core.middleware.admin.AdminWhitelistMiddleware")
+    MIDDLEWARE.append("core.middleware.admin.admin_whitelist_middleware")
+
+if REPLICA_DATABASE_ALIASES:
+    MIDDLEWARE.append("core.middleware.replicas.replica_routing_middleware")
 
 ROOT_URLCONF = "app.urls"
 
@@ -386,9 +453,109 @@ CACHE_FLAGS_SECONDS = env.int("CACHE_FLAGS_SECONDS", default=0)
 FLAGS_CACHE_LOCATION = "environment-flags"
 ENVIRONMENT_CACHE_LOCATION = "environment-objects"
 
+# Cache the rendered (and optionally gzipped) response of the /flags/ endpoint for
+# each environment version and answer conditional requests for it with a 304.
+CACHE_FLAGS_RESPONSE_SECONDS = env.int("CACHE_FLAGS_RESPONSE_SECONDS", default=0)
+COMPRESS_FLAGS_RESPONSE = env.bool("COMPRESS_FLAGS_RESPONSE", default=False)
+
 CACHE_PROJECT_SEGMENTS_SECONDS = env.int("CACHE_PROJECT_SEGMENTS_SECONDS", 0)
 PROJECT_SEGMENTS_CACHE_LOCATION = "project-segments"
 
+# Environment versions are the id of the latest audit log for an environment (or its
+# project). They are updated when an audit log is created and are otherwise
+# re-read from the database after the configured number of seconds.
+CACHE_ENVIRONMENT_VERSION_SECONDS = env.int("CACHE_ENVIRONMENT_VERSION_SECONDS", 10)
+ENVIRONMENT_VERSION_CACHE_LOCATION = "environment-versions"
+
+# Cache the environment document (as served to server side SDKs for local
+# evaluation) for each environment version. The timeout acts as a backstop for
+# changes that don't create an audit log and hence don't change the version, so it
+# defaults to the timeout of the environment version itself, keeping documents no
+# more out of date than the versions they are cached for. Set to 0 to build the
+# document for every request.
+CACHE_ENVIRONMENT_DOCUMENT_SECONDS = env.int(
+    "CACHE_ENVIRONMENT_DOCUMENT_SECONDS", CACHE_ENVIRONMENT_VERSION_SECONDS
+)
+ENVIRONMENT_DOCUMENT_CACHE_LOCATION = "environment-documents"
+
+# Index of feature names for each environment version, used to look up single
+# features by name. The timeout is a backstop for changes that don't create an
+# audit log and hence don't change the version.
+CACHE_FEATURE_NAME_INDEX_SECONDS = env.int("CACHE_FEATURE_NAME_INDEX_SECONDS", 60)
+FEATURE_NAME_INDEX_CACHE_LOCATION = "feature-name-index"
+EDGE_MIGRATION_STATUS_CACHE_LOCATION = "edge-migration-status"
+ANALYTICS_USAGE_CACHE_LOCATION = "analytics-usage"
+
+# Whether each environment and organisation has any enabled webhooks, so that the
+# work of building webhook data can be skipped when it doesn't. The cache is cleared
+# when webhooks are changed and the timeout is a backstop for other processes.
+CACHE_WEBHOOKS_SECONDS = env.int("CACHE_WEBHOOKS_SECONDS", 30)
+WEBHOOKS_CACHE_LOCATION = "webhooks"
+
+# Clients asking for the changes to an environment document since a version older
+# than this are sent the full document instead.
+ENVIRONMENT_DOCUMENT_DELTA_MAX_AGE_SECONDS = env.int(
+    "ENVIRONMENT_DOCUMENT_DELTA_MAX_AGE_SECONDS", 24 * 60 * 60
+)
+
+# Clients can wait for the version of an environment to change via long polling or
+# server sent events. The broker is responsible for notifying waiting clients,
+# see environments/updates.py for the available implementations. Each waiting client
+# holds a thread, so the endpoint is disabled by default and the number of clients
+# waiting in each process at once is limited. When the limit is reached, long polls
+# are answered straight away and streams are refused with a 429.
+ENABLE_ENVIRONMENT_UPDATES = env.bool("ENABLE_ENVIRONMENT_UPDATES", default=False)
+ENVIRONMENT_UPDATES_MAX_WAITERS = env.int("ENVIRONMENT_UPDATES_MAX_WAITERS", 10)
+ENVIRONMENT_UPDATES_BROKER = env.str(
+    "ENVIRONMENT_UPDATES_BROKER",
+    "environments.updates.PollingEnvironmentUpdatesBroker",
+)
+ENVIRONMENT_UPDATES_POLL_INTERVAL_SECONDS = env.float(
+    "ENVIRONMENT_UPDATES_POLL_INTERVAL_SECONDS", 2.0
+)
+# How long a long poll request waits for, and the keep alive interval for streams.
+# This must stay well below the timeout of the server (e.g. gunicorn's --timeout,
+# 30 seconds by default in scripts/run-docker.sh) or the worker holding the request
+# is killed before it is answered.
+ENVIRONMENT_UPDATES_TIMEOUT_SECONDS = env.int("ENVIRONMENT_UPDATES_TIMEOUT_SECONDS", 20)
+# Streams of server sent events are held open for minutes, which a synchronous
+# (WSGI) worker can't do without being killed by its timeout, so they are only
+# served when running under ASGI, where this is enabled by default (see app/asgi.py).
+# Otherwise clients asking for a stream get a 404 and should long poll instead.
+ENVIRONMENT_UPDATES_STREAMING = env.bool("ENVIRONMENT_UPDATES_STREAMING", default=False)
+# streams are closed after this long so clients reconnect (with Last-Event-ID)
+ENVIRONMENT_UPDATES_STREAM_MAX_SECONDS = env.int(
+    "ENVIRONMENT_UPDATES_STREAM_MAX_SECONDS", 300
+)
+
+# Serve the SDK flag endpoints from a read only snapshot of each environment held in
+# worker memory, which is rebuilt whenever the environment version changes. The
+# maximum age is a backstop for changes that don't change the version.
+ENABLE_ENVIRONMENT_SNAPSHOTS = env.bool("ENABLE_ENVIRONMENT_SNAPSHOTS", default=False)
+ENVIRONMENT_SNAPSHOT_MAX_ENTRIES = env.int("ENVIRONMENT_SNAPSHOT_MAX_ENTRIES", 1000)
+ENVIRONMENT_SNAPSHOT_MAX_AGE_SECONDS = env.int(
+    "ENVIRONMENT_SNAPSHOT_MAX_AGE_SECONDS", 300
+)
+
+# Don't create identities seen for the first time by the SDK endpoints on the request
+# path. Instead, their flags are evaluated using a reserved id and they are created
+# by a background writer, in batches, every few seconds.
+DEFER_IDENTITY_CREATION = env.bool("DEFER_IDENTITY_CREATION", default=False)
+DEFERRED_IDENTITY_CREATION_INTERVAL_SECONDS = env.float(
+    "DEFERRED_IDENTITY_CREATION_INTERVAL_SECONDS", default=1.0
+)
+DEFERRED_IDENTITY_CREATION_BATCH_SIZE = env.int(
+    "DEFERRED_IDENTITY_CREATION_BATCH_SIZE", default=500
+)
+
+# Buffer the increments made to counter traits by the increment value endpoint in
+# memory and add them to the traits in the database, in a single query, every few
+# seconds. The responses contain the projected value of each trait.
+BUFFER_TRAIT_INCREMENTS = env.bool("BUFFER_TRAIT_INCREMENTS", default=False)
+TRAIT_INCREMENTS_FLUSH_INTERVAL_SECONDS = env.float(
+    "TRAIT_INCREMENTS_FLUSH_INTERVAL_SECONDS", default=1.0
+)
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
@@ -406,6 +573,30 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": PROJECT_SEGMENTS_CACHE_LOCATION,
     },
+    ENVIRONMENT_VERSION_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": ENVIRONMENT_VERSION_CACHE_LOCATION,
+    },
+    ENVIRONMENT_DOCUMENT_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": ENVIRONMENT_DOCUMENT_CACHE_LOCATION,
+    },
+    FEATURE_NAME_INDEX_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": FEATURE_NAME_INDEX_CACHE_LOCATION,
+    },
+    EDGE_MIGRATION_STATUS_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": EDGE_MIGRATION_STATUS_CACHE_LOCATION,
+    },
+    ANALYTICS_USAGE_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": ANALYTICS_USAGE_CACHE_LOCATION,
+    },
+    WEBHOOKS_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": WEBHOOKS_CACHE_LOCATION,
+    },
 }
 
 TRENCH_AUTH = {
@@ -475,7 +666,7 @@ if ENABLE_AXES:
     AUTHENTICATION_BACKENDS.insert(0, "axes.backends.AxesBackend")
 
     # must be the last item in the middleware stack
-    MIDDLEWARE.append("core.middleware.axes.AxesMiddleware")
+    MIDDLEWARE.append("core.middleware.axes.axes_middleware")
 
     AXES_COOLOFF_TIME = timedelta(minutes=env.int("AXES_COOLOFF_TIME", 15))
     AXES_BLACKLISTED_URLS = [
@@ -514,6 +705,13 @@ ENVIRONMENTS_API_KEY_TABLE_NAME_DYNAMO = env.str(
 # DynamoDB table name for storing project metadata(currently only used for identity migration)
 PROJECT_METADATA_TABLE_NAME_DYNAMO = env.str("PROJECT_METADATA_TABLE_NAME_DYNAMO", None)
 
+# Write the environment documents changed in the last interval to DynamoDB in a
+# single batch, building each document once, rather than on every change. Set to 0
+# to write them as soon as each change has been committed.
+DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS = env.float(
+    "DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS", 5.0
+)
+
 # Front end environment variables
 API_URL = env("API_URL", default="/api/v1/")
 ASSET_URL = env("ASSET_URL", default="/")
@@ -560,7 +758,90 @@ if SAML_INSTALLED:
 
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
+# Work done in the background (e.g. analytics, integrations and webhooks) is run by
+# a fixed number of worker threads for each subsystem. Work submitted while the
+# queue of a subsystem is full is dropped. On shutdown, queued work is given the
+# configured number of seconds to finish.
+BACKGROUND_EXECUTOR_MAX_WORKERS = env.int("BACKGROUND_EXECUTOR_MAX_WORKERS", 4)
+BACKGROUND_EXECUTOR_MAX_QUEUE_SIZE = env.int("BACKGROUND_EXECUTOR_MAX_QUEUE_SIZE", 1000)
+BACKGROUND_EXECUTOR_SHUTDOWN_TIMEOUT_SECONDS = env.float(
+    "BACKGROUND_EXECUTOR_SHUTDOWN_TIMEOUT_SECONDS", 10.0
+)
+
+# Webhook requests time out after the given number of seconds.
+WEBHOOK_TIMEOUT_SECONDS = env.float("WEBHOOK_TIMEOUT_SECONDS", 10.0)
+# Record webhook events in the database, rather than sending them straight away, and
+# deliver them with the deliver_webhooks command, e.g. run as a separate service.
+WEBHOOK_OUTBOX_ENABLED = env.bool("WEBHOOK_OUTBOX_ENABLED", default=False)
+# Alternatively, deliver the events from a background thread of each process that
+# records them, started when it records its first event and run every
+# WEBHOOK_DELIVERY_INTERVAL_SECONDS. Events (and retries) left by a process that
+# exits are only delivered once another process records an event.
+WEBHOOK_DELIVER_IN_WEB_PROCESSES = env.bool(
+    "WEBHOOK_DELIVER_IN_WEB_PROCESSES", default=False
+)
+WEBHOOK_DELIVERY_INTERVAL_SECONDS = env.float("WEBHOOK_DELIVERY_INTERVAL_SECONDS", 5.0)
+WEBHOOK_DELIVERY_MAX_WORKERS = env.int("WEBHOOK_DELIVERY_MAX_WORKERS", 10)
+# The number of events claimed, and delivered, by each process at a time.
+WEBHOOK_DELIVERY_BATCH_SIZE = env.int("WEBHOOK_DELIVERY_BATCH_SIZE", 100)
+# Send up to the given number of events to each webhook in a single request, as a
+# list. Defaults to sending each event on its own.
+WEBHOOK_BATCH_MAX_EVENTS = env.int("WEBHOOK_BATCH_MAX_EVENTS", 1)
+# Failed deliveries are retried with exponential backoff, starting from the given
+# number of seconds, before the organisation is emailed about the failure.
+WEBHOOK_MAX_ATTEMPTS = env.int("WEBHOOK_MAX_ATTEMPTS", 5)
+WEBHOOK_RETRY_BACKOFF_SECONDS = env.float("WEBHOOK_RETRY_BACKOFF_SECONDS", 30.0)
+WEBHOOK_RETRY_MAX_BACKOFF_SECONDS = env.float(
+    "WEBHOOK_RETRY_MAX_BACKOFF_SECONDS", 3600.0
+)
+# Deliveries that failed every attempt are deleted after the given number of days.
+WEBHOOK_FAILED_DELIVERY_RETENTION_DAYS = env.int(
+    "WEBHOOK_FAILED_DELIVERY_RETENTION_DAYS", 30
+)
+# Requests to a webhook URL are paused for the given number of seconds after the
+# given number of consecutive failures.
+WEBHOOK_CIRCUIT_BREAKER_THRESHOLD = env.int("WEBHOOK_CIRCUIT_BREAKER_THRESHOLD", 5)
+WEBHOOK_CIRCUIT_BREAKER_RESET_SECONDS = env.float(
+    "WEBHOOK_CIRCUIT_BREAKER_RESET_SECONDS", 60.0
+)
+
+# Collect the identities sent to each identity integration (e.g. Amplitude or
+# Segment) and send only the latest flags of each identity, in batches, every
+# INTEGRATIONS_IDENTIFY_FLUSH_INTERVAL_SECONDS. Identities collected while
+# INTEGRATIONS_IDENTIFY_MAX_PENDING others are waiting are dropped.
+BATCH_IDENTITY_INTEGRATIONS = env.bool("BATCH_IDENTITY_INTEGRATIONS", default=False)
+INTEGRATIONS_IDENTIFY_FLUSH_INTERVAL_SECONDS = env.float(
+    "INTEGRATIONS_IDENTIFY_FLUSH_INTERVAL_SECONDS", 5.0
+)
+INTEGRATIONS_IDENTIFY_BATCH_SIZE = env.int("INTEGRATIONS_IDENTIFY_BATCH_SIZE", 100)
+INTEGRATIONS_IDENTIFY_MAX_PENDING = env.int("INTEGRATIONS_IDENTIFY_MAX_PENDING", 10000)
+# Requests to identity integrations time out after the given number of seconds. The
+# batches of every integration are sent by a single thread, so this also limits
+# how long a slow integration can hold up the others.
+INTEGRATIONS_REQUEST_TIMEOUT_SECONDS = env.float(
+    "INTEGRATIONS_REQUEST_TIMEOUT_SECONDS", 10.0
+)
+
 # Used to keep edge identities in sync by forwarding the http requests
 EDGE_API_URL = env.str("EDGE_API_URL", None)
 # Used for signing forwarded request to edge
 EDGE_REQUEST_SIGNING_KEY = env.str("EDGE_REQUEST_SIGNING_KEY", None)
+# Requests are forwarded to edge by a fixed number of worker threads, which share a
+# pool of keep-alive connections. Requests forwarded while the queue is full are
+# dropped.
+EDGE_REQUEST_FORWARDER_MAX_WORKERS = env.int("EDGE_REQUEST_FORWARDER_MAX_WORKERS", 4)
+EDGE_REQUEST_FORWARDER_MAX_QUEUE_SIZE = env.int(
+    "EDGE_REQUEST_FORWARDER_MAX_QUEUE_SIZE", 10000
+)
+# Each forwarded request holds one of the workers until it is answered, so give up
+# (and log the error) after this long rather than letting an unresponsive edge api
+# hold up the forwarding of everything else.
+EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS = env.float(
+    "EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS", 5.0
+)
+# Forward the traits of each identity sent to the bulk traits endpoint to edge in a
+# single request.
+EDGE_FORWARD_TRAITS_IN_BULK = env.bool("EDGE_FORWARD_TRAITS_IN_BULK", default=False)
+# How long to cache whether the identities of each project have been migrated to
+# edge, and hence whether to forward its requests.
+CACHE_EDGE_MIGRATION_STATUS_SECONDS = env.int("CACHE_EDGE_MIGRATION_STATUS_SECONDS", 60)
@@ -0,0 +1,149 @@
+import logging
+import threading
+import typing
+from functools import lru_cache
+
+from app_analytics.backends import get_analytics_backend
+from django.conf import settings
+
+from util.util import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+TagSet = typing.Tuple[typing.Tuple[str, typing.Any], ...]
+
+
+class AnalyticsAggregator:
+    """
+    Sum the values recorded for each set of tags in memory and write them to the
+    analytics backend (e.g. InfluxDB, as one point per set of tags) in a single
+    write, every `flush_interval` seconds (or as soon as `max_events` values have
+    been recorded) and when the process exits. Values for new sets of tags are
+    dropped, and counted, once there are `max_tag_sets` waiting to be written. If a
+    write fails its values are kept, within the same limit, for the next one.
+    """
+
+    def __init__(
+        self,
+        measurement: str,
+        field_name: str,
+        flush_interval: float,
+        max_events: int,
+        max_tag_sets: int = None,
+    ):
+        self.measurement = measurement
+        self.field_name = field_name
+        self.max_events = max_events
+        self.max_tag_sets = max_tag_sets
+
+        self.dropped_count = 0
+        self.written_count = 0
+
+        self._counts: typing.Dict[TagSet, int] = {}
+        self._event_count = 0
+        self._dropped_since_flush = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = PeriodicFlusher(
+            self.flush, flush_interval, name=f"{measurement}-aggregator"
+        )
+
+    def add(self, tags: typing.Dict[str, typing.Any], value: int = 1) -> None:
+        tag_set = tuple(sorted(tags.items()))
+        with self._lock:
+            if (
+                self.max_tag_sets is not None
+                and tag_set not in self._counts
+                and len(self._counts) >= self.max_tag_sets
+            ):
+                self.dropped_count += value
+                self._dropped_since_flush += value
+                return
+
+            self._counts[tag_set] = self._counts.get(tag_set, 0) + value
+            self._event_count += 1
+            event_count = self._event_count
+
+        self._flusher.start()
+        if event_count >= self.max_events:
+            self._flusher.wake()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, {}
+                self._event_count = 0
+                dropped_count, self._dropped_since_flush = self._dropped_since_flush, 0
+
+            if dropped_count:
+                logger.warning(
+                    "Dropped %d %s values, too many sets of tags to aggregate.",
+                    dropped_count,
+                    self.measurement,
+                )
+
+            if not counts:
+                return
+
+            try:
+                get_analytics_backend().write(
+                    self.measurement,
+                    self.field_name,
+                    [(dict(tag_set), count) for tag_set, count in counts.items()],
+                )
+            except Exception:
+                self._restore(counts)
+                raise
+            self.written_count += len(counts)
+
+    def _restore(self, counts: typing.Dict[TagSet, int]) -> None:
+        with self._lock:
+            for tag_set, count in counts.items():
+                if (
+                    self.max_tag_sets is not None
+                    and tag_set not in self._counts
+                    and len(self._counts) >= self.max_tag_sets
+                ):
+                    self.dropped_count += count
+                    self._dropped_since_flush += count
+                    continue
+                self._counts[tag_set] = self._counts.get(tag_set, 0) + count
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            return {
+                "pending_tag_sets": len(self._counts),
+                "written": self.written_count,
+                "dropped": self.dropped_count,
+            }
+
+
+def get_api_usage_aggregator() -> AnalyticsAggregator:
+    return _get_aggregator("api_call", "request_count", *_get_aggregator_settings())
+
+
+def get_feature_evaluation_aggregator() -> AnalyticsAggregator:
+    return _get_aggregator(
+        "feature_evaluation", "request_count", *_get_aggregator_settings()
+    )
+
+
+def _get_aggregator_settings() -> typing.Tuple[float, int, int]:
+    return (
+        settings.INFLUXDB_FLUSH_INTERVAL_SECONDS,
+        settings.INFLUXDB_FLUSH_MAX_EVENTS,
+        settings.INFLUXDB_MAX_TAG_SETS,
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_aggregator(
+    measurement: str,
+    field_name: str,
+    flush_interval: float,
+    max_events: int,
+    max_tag_sets: int,
+) -> AnalyticsAggregator:
+    return AnalyticsAggregator(
+        measurement, field_name, flush_interval, max_events, max_tag_sets
+    )
@@ -0,0 +1,320 @@
+"""
+Storage for API usage and flag analytics. InfluxDBAnalyticsBackend stores them in
+InfluxDB, DatabaseAnalyticsBackend stores them in the database (so that self hosted
+installations don't need to run InfluxDB) and rolls them up into buckets of 15
+minutes, 1 hour and 1 day, mirroring the downsampled InfluxDB buckets.
+"""
+import logging
+import typing
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from app_analytics import influxdb_wrapper
+from app_analytics.influxdb_wrapper import InfluxDBWrapper
+from app_analytics.models import (
+    BUCKET_SIZE_1_DAY,
+    BUCKET_SIZE_1_HOUR,
+    BUCKET_SIZE_15_MINUTES,
+    APIUsageBucket,
+    APIUsageRaw,
+    FeatureEvaluationBucket,
+    FeatureEvaluationRaw,
+)
+from app_analytics.rollups import compact_analytics
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from util.util import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+Counts = typing.Iterable[typing.Tuple[typing.Dict[str, typing.Any], int]]
+
+DURATION_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+# the number of days of usage returned by the event list queries
+EVENT_LIST_DAYS = 30
+
+
+class BaseAnalyticsBackend(ABC):
+    @abstractmethod
+    def write(self, measurement: str, field_name: str, counts: Counts) -> None:
+        """
+        Store the given counts, e.g. of the `api_call` or `feature_evaluation`
+        measurements, each of which is given along with its tags.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_events_for_organisation(
+        self, organisation_id: int, date_range: str = "30d"
+    ) -> int:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.Tuple[typing.Dict[str, typing.List[int]], typing.List[str]]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_multiple_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.List[dict]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_multiple_event_list_for_feature(
+        self, environment_id: int, feature_name: str, period: str = "30d"
+    ) -> typing.List[dict]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_top_organisations(
+        self, date_range: str, limit: str = ""
+    ) -> typing.Dict[int, int]:
+        raise NotImplementedError()
+
+
+class InfluxDBAnalyticsBackend(BaseAnalyticsBackend):
+    def write(self, measurement: str, field_name: str, counts: Counts) -> None:
+        influxdb = InfluxDBWrapper(measurement)
+        for tags, count in counts:
+            influxdb.add_data_point(field_name, count, tags=tags)
+        influxdb.write()
+
+    def get_events_for_organisation(
+        self, organisation_id: int, date_range: str = "30d"
+    ) -> int:
+        return influxdb_wrapper.get_events_for_organisation(
+            organisation_id, date_range=date_range
+        )
+
+    def get_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.Tuple[typing.Dict[str, typing.List[int]], typing.List[str]]:
+        return influxdb_wrapper.get_event_list_for_organisation(organisation_id)
+
+    def get_multiple_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.List[dict]:
+        return influxdb_wrapper.get_multiple_event_list_for_organisation(
+            organisation_id
+        )
+
+    def get_multiple_event_list_for_feature(
+        self, environment_id: int, feature_name: str, period: str = "30d"
+    ) -> typing.List[dict]:
+        return influxdb_wrapper.get_multiple_event_list_for_feature(
+            environment_id, feature_name, period=period
+        )
+
+    def get_top_organisations(
+        self, date_range: str, limit: str = ""
+    ) -> typing.Dict[int, int]:
+        return influxdb_wrapper.get_top_organisations(date_range, limit=limit)
+
+
+class DatabaseAnalyticsBackend(BaseAnalyticsBackend):
+    """
+    Writes the counts as raw rows, which are rolled up into buckets every
+    ANALYTICS_COMPACTION_INTERVAL_SECONDS (by each process that writes) or by the
+    compact_analytics management command. Usage is only read from the buckets.
+    """
+
+    def __init__(self):
+        self._compactor = PeriodicFlusher(
+            compact_analytics,
+            settings.ANALYTICS_COMPACTION_INTERVAL_SECONDS,
+            name="analytics-compaction",
+        )
+
+    def write(self, measurement: str, field_name: str, counts: Counts) -> None:
+        if measurement == "api_call":
+            APIUsageRaw.objects.bulk_create(
+                APIUsageRaw(
+                    organisation_id=tags["organisation_id"],
+                    project_id=tags["project_id"],
+                    environment_id=tags["environment_id"],
+                    resource=tags["resource"],
+                    count=count,
+                )
+                for tags, count in counts
+            )
+        elif measurement == "feature_evaluation":
+            FeatureEvaluationRaw.objects.bulk_create(
+                FeatureEvaluationRaw(
+                    environment_id=tags["environment_id"],
+                    feature_name=tags["feature_id"],
+                    count=count,
+                )
+                for tags, count in counts
+            )
+        else:
+            logger.debug("Not storing unknown measurement %s.", measurement)
+            return
+
+        if settings.ANALYTICS_COMPACTION_INTERVAL_SECONDS:
+            self._compactor.start()
+
+    def get_events_for_organisation(
+        self, organisation_id: int, date_range: str = "30d"
+    ) -> int:
+        buckets = _filter_buckets_for_range(
+            APIUsageBucket.objects.filter(organisation_id=organisation_id),
+            parse_duration(date_range),
+        )
+        return buckets.aggregate(total=Sum("total_count"))["total"] or 0
+
+    def get_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.Tuple[typing.Dict[str, typing.List[int]], typing.List[str]]:
+        labels, counts_by_resource = _get_daily_usage_by_resource(organisation_id)
+        dataset = defaultdict(list)
+        for resource, counts in counts_by_resource.items():
+            dataset[resource] = [counts.get(label, 0) for label in labels]
+        return dataset, labels
+
+    def get_multiple_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.List[dict]:
+        labels, counts_by_resource = _get_daily_usage_by_resource(organisation_id)
+        if not counts_by_resource:
+            return []
+
+        return [
+            {
+                **{
+                    resource.capitalize(): counts.get(label, 0)
+                    for resource, counts in counts_by_resource.items()
+                },
+                "name": label,
+            }
+            for label in labels
+        ]
+
+    def get_multiple_event_list_for_feature(
+        self, environment_id: int, feature_name: str, period: str = "30d"
+    ) -> typing.List[dict]:
+        window = parse_duration(period)
+        bucket_size = (
+            BUCKET_SIZE_1_HOUR if window < timedelta(days=1) else BUCKET_SIZE_1_DAY
+        )
+        since = _truncate(timezone.now() - timedelta(days=EVENT_LIST_DAYS), bucket_size)
+        buckets = (
+            FeatureEvaluationBucket.objects.filter(
+                bucket_size=bucket_size,
+                environment_id=environment_id,
+                feature_name=feature_name,
+                start__gte=since,
+            )
+            .order_by("start")
+            .values_list("start", "total_count")
+        )
+
+        # sum the buckets into windows of the given period, labelled with the end
+        # of each window, as InfluxDB's aggregateWindow does
+        totals = {}
+        for start, total_count in buckets:
+            window_end = since + ((start - since) // window + 1) * window
+            totals[window_end] = totals.get(window_end, 0) + total_count
+
+        return [
+            {feature_name: total, "datetime": window_end.strftime("%Y-%m-%d")}
+            for window_end, total in totals.items()
+        ]
+
+    def get_top_organisations(
+        self, date_range: str, limit: str = ""
+    ) -> typing.Dict[int, int]:
+        buckets = _filter_buckets_for_range(
+            APIUsageBucket.objects.all(), parse_duration(date_range)
+        )
+        totals = (
+            buckets.values("organisation_id")
+            .annotate(total=Sum("total_count"))
+            .order_by("-total")
+            .values_list("organisation_id", "total")
+        )
+        if limit:
+            totals = totals[: int(limit)]
+        return dict(totals)
+
+
+def get_analytics_backend() -> BaseAnalyticsBackend:
+    return _get_analytics_backend(settings.ANALYTICS_BACKEND)
+
+
+@lru_cache(maxsize=None)
+def _get_analytics_backend(backend_class_path: str) -> BaseAnalyticsBackend:
+    return import_string(backend_class_path)()
+
+
+def parse_duration(value: str) -> timedelta:
+    """
+    Parse a duration as used in flux queries, e.g. 24h or 30d.
+    """
+    amount, unit = value[:-1], value[-1:]
+    if unit not in DURATION_UNITS or not amount.isdigit():
+        raise ValueError(f"Invalid duration '{value}'.")
+    return timedelta(**{DURATION_UNITS[unit]: int(amount)})
+
+
+def _truncate(value: datetime, bucket_size: int) -> datetime:
+    """
+    Truncate the datetime to the start of the bucket of the given size (in minutes)
+    that it falls in.
+    """
+    seconds = bucket_size * 60
+    timestamp = value.timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % seconds, tz=value.tzinfo)
+
+
+def get_bucket_size_for_range(date_range: timedelta) -> int:
+    """
+    Get the size of the buckets to read usage over the given date range from, i.e.
+    the largest that still gives a reasonably accurate start to the range.
+    """
+    if date_range <= timedelta(days=7):
+        return BUCKET_SIZE_15_MINUTES
+    elif date_range <= timedelta(days=90):
+        return BUCKET_SIZE_1_HOUR
+    return BUCKET_SIZE_1_DAY
+
+
+def _filter_buckets_for_range(queryset, date_range: timedelta):
+    bucket_size = get_bucket_size_for_range(date_range)
+    since = _truncate(timezone.now() - date_range, bucket_size)
+    return queryset.filter(bucket_size=bucket_size, start__gte=since)
+
+
+def _get_daily_usage_by_resource(
+    organisation_id: int,
+) -> typing.Tuple[typing.List[str], typing.Dict[str, typing.Dict[str, int]]]:
+    since = _truncate(
+        timezone.now() - timedelta(days=EVENT_LIST_DAYS), BUCKET_SIZE_1_DAY
+    )
+    buckets = (
+        APIUsageBucket.objects.filter(
+            bucket_size=BUCKET_SIZE_1_DAY,
+            organisation_id=organisation_id,
+            start__gte=since,
+        )
+        .values("resource", "start")
+        .annotate(total=Sum("total_count"))
+    )
+
+    counts_by_resource = defaultdict(dict)
+    for bucket in buckets:
+        label = bucket["start"].strftime("%Y-%m-%d")
+        counts_by_resource[bucket["resource"]][label] = bucket["total"]
+
+    labels = [
+        (since + timedelta(days=i)).strftime("%Y-%m-%d")
+        for i in range(EVENT_LIST_DAYS + 1)
+    ]
+    return labels, dict(counts_by_resource)
@@ -0,0 +1,9 @@
+from app_analytics.rollups import compact_analytics
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Roll up the API usage and flag analytics stored in the database"
+
+    def handle(self, *args, **options):
+        compact_analytics()
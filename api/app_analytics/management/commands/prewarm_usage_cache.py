@@ -0,0 +1,29 @@
+import time
+
+from app_analytics.usage import prewarm_usage_cache
+from django.conf import settings
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Refresh the cached usage of the top organisations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Refresh the cached usage and exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.ANALYTICS_USAGE_PREWARM_INTERVAL_SECONDS,
+            help="Seconds to wait between refreshing the cached usage",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            prewarm_usage_cache()
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -1,7 +1,4 @@
-from .track import (
-    track_request_googleanalytics_async,
-    track_request_influxdb_async,
-)
+from .track import track_request_googleanalytics_async, track_request_influxdb
 
 
 class GoogleAnalyticsMiddleware:
@@ -22,8 +19,9 @@ class InfluxDBMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # for each API request, trigger a call to InfluxDB to track the request
-        track_request_influxdb_async(request)
+        # for each API request, record the request to be sent to the analytics
+        # backend (InfluxDB or the database) in the next batch
+        track_request_influxdb(request)
 
         response = self.get_response(request)
 
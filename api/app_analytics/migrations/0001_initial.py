@@ -0,0 +1,73 @@
+# Generated by Django 3.2.12 on 2026-10-18 03:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIUsageBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('organisation_id', models.PositiveIntegerField()),
+                ('project_id', models.PositiveIntegerField()),
+                ('environment_id', models.PositiveIntegerField()),
+                ('resource', models.CharField(max_length=50)),
+                ('bucket_size', models.PositiveSmallIntegerField()),
+                ('start', models.DateTimeField()),
+                ('total_count', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='APIUsageRaw',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('organisation_id', models.PositiveIntegerField()),
+                ('project_id', models.PositiveIntegerField()),
+                ('environment_id', models.PositiveIntegerField()),
+                ('resource', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FeatureEvaluationBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('environment_id', models.PositiveIntegerField()),
+                ('feature_name', models.CharField(max_length=2000)),
+                ('bucket_size', models.PositiveSmallIntegerField()),
+                ('start', models.DateTimeField()),
+                ('total_count', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FeatureEvaluationRaw',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('environment_id', models.PositiveIntegerField()),
+                ('feature_name', models.CharField(max_length=2000)),
+                ('count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='featureevaluationbucket',
+            constraint=models.UniqueConstraint(fields=('bucket_size', 'environment_id', 'feature_name', 'start'), name='unique_feature_evaluation_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='apiusagebucket',
+            index=models.Index(fields=['bucket_size', 'start'], name='app_analyti_bucket__5353ff_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='apiusagebucket',
+            constraint=models.UniqueConstraint(fields=('bucket_size', 'organisation_id', 'start', 'project_id', 'environment_id', 'resource'), name='unique_api_usage_bucket'),
+        ),
+    ]
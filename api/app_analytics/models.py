@@ -0,0 +1,84 @@
+from django.db import models
+from django.utils import timezone
+
+# sizes, in minutes, of the buckets that usage is rolled up into, mirroring the
+# downsampled InfluxDB buckets
+BUCKET_SIZE_15_MINUTES = 15
+BUCKET_SIZE_1_HOUR = 60
+BUCKET_SIZE_1_DAY = 24 * 60
+BUCKET_SIZES = (BUCKET_SIZE_15_MINUTES, BUCKET_SIZE_1_HOUR, BUCKET_SIZE_1_DAY)
+
+
+class APIUsageRaw(models.Model):
+    """
+    Counts of API requests, as written by each process, waiting to be rolled up.
+    """
+
+    dimensions = ("organisation_id", "project_id", "environment_id", "resource")
+
+    organisation_id = models.PositiveIntegerField()
+    project_id = models.PositiveIntegerField()
+    environment_id = models.PositiveIntegerField()
+    resource = models.CharField(max_length=50)
+    count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+
+class APIUsageBucket(models.Model):
+    dimensions = APIUsageRaw.dimensions
+
+    organisation_id = models.PositiveIntegerField()
+    project_id = models.PositiveIntegerField()
+    environment_id = models.PositiveIntegerField()
+    resource = models.CharField(max_length=50)
+    bucket_size = models.PositiveSmallIntegerField()
+    start = models.DateTimeField()
+    total_count = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    "bucket_size",
+                    "organisation_id",
+                    "start",
+                    "project_id",
+                    "environment_id",
+                    "resource",
+                ),
+                name="unique_api_usage_bucket",
+            )
+        ]
+        indexes = [models.Index(fields=("bucket_size", "start"))]
+
+
+class FeatureEvaluationRaw(models.Model):
+    """
+    Counts of feature evaluations, as written by each process, waiting to be rolled
+    up.
+    """
+
+    dimensions = ("environment_id", "feature_name")
+
+    environment_id = models.PositiveIntegerField()
+    feature_name = models.CharField(max_length=2000)
+    count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+
+class FeatureEvaluationBucket(models.Model):
+    dimensions = FeatureEvaluationRaw.dimensions
+
+    environment_id = models.PositiveIntegerField()
+    feature_name = models.CharField(max_length=2000)
+    bucket_size = models.PositiveSmallIntegerField()
+    start = models.DateTimeField()
+    total_count = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("bucket_size", "environment_id", "feature_name", "start"),
+                name="unique_feature_evaluation_bucket",
+            )
+        ]
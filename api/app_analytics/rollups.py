@@ -0,0 +1,126 @@
+"""
+Roll the raw analytics counts written by DatabaseAnalyticsBackend up into buckets of
+15 minutes, which are in turn rolled up into buckets of 1 hour and 1 day, so that
+usage can be read from a small number of indexed rows regardless of the number of
+requests.
+"""
+import typing
+from datetime import datetime
+
+from app_analytics.models import (
+    BUCKET_SIZE_1_DAY,
+    BUCKET_SIZE_1_HOUR,
+    BUCKET_SIZE_15_MINUTES,
+    APIUsageBucket,
+    APIUsageRaw,
+    FeatureEvaluationBucket,
+    FeatureEvaluationRaw,
+)
+from django.db import connections, router, transaction
+from django.db.models import Model
+
+ROLLUPS = (
+    (APIUsageRaw, APIUsageBucket),
+    (FeatureEvaluationRaw, FeatureEvaluationBucket),
+)
+
+# the postgres function used to find the start of each bucket of the given size,
+# from the start of the buckets of the previous size
+BUCKET_TRUNCATE_UNITS = ((BUCKET_SIZE_1_HOUR, "hour"), (BUCKET_SIZE_1_DAY, "day"))
+
+
+def compact_analytics() -> None:
+    for raw_model, bucket_model in ROLLUPS:
+        with transaction.atomic(using=router.db_for_write(bucket_model)):
+            earliest_start = _compact_raw_counts(raw_model, bucket_model)
+            if earliest_start is None:
+                continue
+
+            previous_bucket_size = BUCKET_SIZE_15_MINUTES
+            for bucket_size, unit in BUCKET_TRUNCATE_UNITS:
+                _roll_up(
+                    bucket_model,
+                    previous_bucket_size,
+                    bucket_size,
+                    unit,
+                    earliest_start,
+                )
+                previous_bucket_size = bucket_size
+
+
+def _compact_raw_counts(
+    raw_model: typing.Type[Model], bucket_model: typing.Type[Model]
+) -> typing.Optional[datetime]:
+    """
+    Move the raw counts into 15 minute buckets, adding to any existing buckets.
+
+    :return: the start of the earliest bucket changed, if any
+    """
+    connection, quote_name = _get_connection(bucket_model)
+    dimensions = ", ".join(quote_name(d) for d in bucket_model.dimensions)
+    seconds = BUCKET_SIZE_15_MINUTES * 60
+
+    sql = f"""
+        WITH compacted AS (
+            DELETE FROM {quote_name(raw_model._meta.db_table)}
+            RETURNING {dimensions}, count, created_at
+        ), inserted AS (
+            INSERT INTO {quote_name(bucket_model._meta.db_table)} AS bucket
+                ({dimensions}, bucket_size, start, total_count)
+            SELECT
+                {dimensions},
+                %s,
+                to_timestamp(floor(extract(epoch FROM created_at) / %s) * %s),
+                SUM(count)
+            FROM compacted
+            GROUP BY {dimensions}, {len(bucket_model.dimensions) + 2}
+            ON CONFLICT ({_get_unique_columns(bucket_model, quote_name)})
+            DO UPDATE SET total_count = bucket.total_count + EXCLUDED.total_count
+            RETURNING start
+        )
+        SELECT MIN(start) FROM inserted
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [BUCKET_SIZE_15_MINUTES, seconds, seconds])
+        return cursor.fetchone()[0]
+
+
+def _roll_up(
+    bucket_model: typing.Type[Model],
+    from_bucket_size: int,
+    to_bucket_size: int,
+    unit: str,
+    since: datetime,
+) -> None:
+    """
+    Recalculate the buckets of the given size, from the smaller buckets, for every
+    bucket that includes or follows `since`.
+    """
+    connection, quote_name = _get_connection(bucket_model)
+    dimensions = ", ".join(quote_name(d) for d in bucket_model.dimensions)
+
+    sql = f"""
+        INSERT INTO {quote_name(bucket_model._meta.db_table)} AS bucket
+            ({dimensions}, bucket_size, start, total_count)
+        SELECT {dimensions}, %s, date_trunc(%s, start), SUM(total_count)
+        FROM {quote_name(bucket_model._meta.db_table)} AS smaller
+        WHERE bucket_size = %s AND start >= date_trunc(%s, %s::timestamptz)
+        GROUP BY {dimensions}, date_trunc(%s, start)
+        ON CONFLICT ({_get_unique_columns(bucket_model, quote_name)})
+        DO UPDATE SET total_count = EXCLUDED.total_count
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [to_bucket_size, unit, from_bucket_size, unit, since, unit])
+
+
+def _get_connection(model: typing.Type[Model]):
+    connection = connections[router.db_for_write(model)]
+    return connection, connection.ops.quote_name
+
+
+def _get_unique_columns(bucket_model: typing.Type[Model], quote_name) -> str:
+    (constraint,) = bucket_model._meta.constraints
+    return ", ".join(
+        quote_name(bucket_model._meta.get_field(name).column)
+        for name in constraint.fields
+    )
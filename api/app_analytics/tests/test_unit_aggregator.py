@@ -0,0 +1,130 @@
+from unittest import mock
+
+import pytest
+from app_analytics.aggregator import AnalyticsAggregator
+
+
+@pytest.fixture()
+def aggregator():
+    aggregator = AnalyticsAggregator(
+        "api_call", "request_count", flush_interval=60, max_events=3
+    )
+    # flush from the test rather than from a background thread
+    aggregator._flusher = mock.MagicMock()
+    return aggregator
+
+
+@mock.patch("app_analytics.backends.InfluxDBWrapper")
+def test_flush_writes_summed_points_in_one_write(MockInfluxDBWrapper, aggregator):
+    # Given
+    flags_tags = {"resource": "flags", "environment_id": 1}
+    traits_tags = {"resource": "traits", "environment_id": 1}
+    aggregator.add(flags_tags)
+    aggregator.add(traits_tags)
+    aggregator.add(dict(reversed(list(flags_tags.items()))), value=2)
+
+    # When
+    aggregator.flush()
+
+    # Then
+    MockInfluxDBWrapper.assert_called_once_with("api_call")
+    mock_influxdb = MockInfluxDBWrapper.return_value
+    assert mock_influxdb.add_data_point.call_args_list == [
+        mock.call("request_count", 3, tags=flags_tags),
+        mock.call("request_count", 1, tags=traits_tags),
+    ]
+    mock_influxdb.write.assert_called_once_with()
+
+    # and nothing is written when there is nothing new to write
+    aggregator.flush()
+    MockInfluxDBWrapper.assert_called_once()
+
+
+def test_add_wakes_flusher_after_max_events(aggregator):
+    # When
+    for _ in range(2):
+        aggregator.add({"resource": "flags"})
+
+    # Then
+    aggregator._flusher.wake.assert_not_called()
+
+    # and
+    aggregator.add({"resource": "flags"})
+    aggregator._flusher.wake.assert_called_once_with()
+
+
+@mock.patch("app_analytics.backends.InfluxDBWrapper")
+def test_add_drops_values_for_new_tag_sets_when_full(MockInfluxDBWrapper):
+    # Given
+    aggregator = AnalyticsAggregator(
+        "feature_evaluation",
+        "request_count",
+        flush_interval=60,
+        max_events=100,
+        max_tag_sets=1,
+    )
+    aggregator._flusher = mock.MagicMock()
+
+    # When
+    aggregator.add({"feature_id": "first"}, 5)
+    aggregator.add({"feature_id": "second"}, 3)
+    aggregator.add({"feature_id": "first"}, 1)
+
+    # Then
+    assert aggregator.get_metrics() == {
+        "pending_tag_sets": 1,
+        "written": 0,
+        "dropped": 3,
+    }
+
+    # and
+    aggregator.flush()
+    MockInfluxDBWrapper.return_value.add_data_point.assert_called_once_with(
+        "request_count", 6, tags={"feature_id": "first"}
+    )
+    assert aggregator.get_metrics()["written"] == 1
+
+
+@mock.patch("app_analytics.backends.InfluxDBWrapper")
+def test_flush_keeps_values_if_write_fails(MockInfluxDBWrapper):
+    # Given
+    aggregator = AnalyticsAggregator(
+        "feature_evaluation",
+        "request_count",
+        flush_interval=60,
+        max_events=100,
+        max_tag_sets=2,
+    )
+    aggregator._flusher = mock.MagicMock()
+    aggregator.add({"feature_id": "first"}, 5)
+    aggregator.add({"feature_id": "second"}, 3)
+
+    def add_and_fail():
+        # a value recorded while the failed write is in progress
+        aggregator.add({"feature_id": "third"}, 2)
+        raise Exception()
+
+    MockInfluxDBWrapper.return_value.write.side_effect = add_and_fail
+
+    # When
+    with pytest.raises(Exception):
+        aggregator.flush()
+
+    # Then
+    # the values that failed to be written are kept, up to the limit on the number
+    # of sets of tags
+    assert aggregator.get_metrics() == {
+        "pending_tag_sets": 2,
+        "written": 0,
+        "dropped": 3,
+    }
+
+    # and
+    MockInfluxDBWrapper.return_value.write.side_effect = None
+    MockInfluxDBWrapper.return_value.add_data_point.reset_mock()
+    aggregator.flush()
+    assert MockInfluxDBWrapper.return_value.add_data_point.call_args_list == [
+        mock.call("request_count", 2, tags={"feature_id": "third"}),
+        mock.call("request_count", 5, tags={"feature_id": "first"}),
+    ]
+    assert aggregator.get_metrics()["written"] == 2
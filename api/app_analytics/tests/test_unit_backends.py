@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+import pytest
+from app_analytics.backends import DatabaseAnalyticsBackend
+from app_analytics.models import (
+    BUCKET_SIZE_1_DAY,
+    BUCKET_SIZE_1_HOUR,
+    BUCKET_SIZE_15_MINUTES,
+    APIUsageBucket,
+    APIUsageRaw,
+    FeatureEvaluationBucket,
+    FeatureEvaluationRaw,
+)
+from app_analytics.rollups import compact_analytics
+from django.utils import timezone
+
+
+@pytest.fixture()
+def backend(settings):
+    # compact from the test rather than from a background thread
+    settings.ANALYTICS_COMPACTION_INTERVAL_SECONDS = 0
+    return DatabaseAnalyticsBackend()
+
+
+def _api_usage_tags(organisation_id=1, resource="flags"):
+    return {
+        "organisation_id": organisation_id,
+        "project_id": 2,
+        "environment_id": 3,
+        "resource": resource,
+    }
+
+
+@pytest.mark.django_db
+def test_write_stores_raw_counts(backend):
+    # When
+    backend.write(
+        "api_call",
+        "request_count",
+        [
+            (_api_usage_tags(resource="flags"), 3),
+            (_api_usage_tags(resource="traits"), 1),
+        ],
+    )
+    backend.write(
+        "feature_evaluation",
+        "request_count",
+        [({"environment_id": 3, "feature_id": "my_feature"}, 5)],
+    )
+
+    # Then
+    assert APIUsageRaw.objects.count() == 2
+    assert FeatureEvaluationRaw.objects.get().feature_name == "my_feature"
+
+
+@pytest.mark.django_db
+def test_compact_analytics_rolls_raw_counts_up_into_buckets():
+    # Given
+    now = timezone.now()
+    for created_at, count in ((now, 2), (now, 3), (now - timedelta(days=2), 10)):
+        APIUsageRaw.objects.create(
+            **_api_usage_tags(), count=count, created_at=created_at
+        )
+
+    # When
+    compact_analytics()
+
+    # Then
+    assert not APIUsageRaw.objects.exists()
+    for bucket_size in (BUCKET_SIZE_15_MINUTES, BUCKET_SIZE_1_HOUR, BUCKET_SIZE_1_DAY):
+        assert list(
+            APIUsageBucket.objects.filter(bucket_size=bucket_size)
+            .order_by("start")
+            .values_list("total_count", flat=True)
+        ) == [10, 5]
+
+    # and counts written later are added to the existing buckets
+    APIUsageRaw.objects.create(**_api_usage_tags(), count=1, created_at=now)
+    compact_analytics()
+    assert (
+        APIUsageBucket.objects.filter(bucket_size=BUCKET_SIZE_1_DAY)
+        .order_by("start")
+        .last()
+        .total_count
+        == 6
+    )
+
+
+@pytest.mark.django_db
+def test_usage_queries_read_buckets(backend):
+    # Given
+    backend.write(
+        "api_call",
+        "request_count",
+        [
+            (_api_usage_tags(organisation_id=1, resource="flags"), 3),
+            (_api_usage_tags(organisation_id=1, resource="identities"), 2),
+            (_api_usage_tags(organisation_id=2, resource="flags"), 10),
+        ],
+    )
+    backend.write(
+        "feature_evaluation",
+        "request_count",
+        [({"environment_id": 3, "feature_id": "my_feature"}, 5)],
+    )
+    compact_analytics()
+    today = timezone.now().strftime("%Y-%m-%d")
+
+    # When
+    events = backend.get_events_for_organisation(1)
+    event_list, labels = backend.get_event_list_for_organisation(1)
+    multiple_event_list = backend.get_multiple_event_list_for_organisation(1)
+    feature_event_list = backend.get_multiple_event_list_for_feature(
+        3, "my_feature", period="1d"
+    )
+    top_organisations = backend.get_top_organisations("30d", limit="1")
+
+    # Then
+    assert events == 5
+    assert labels[-1] == today
+    assert event_list["flags"][-1] == 3
+    assert event_list["identities"] == [0] * (len(labels) - 1) + [2]
+    assert multiple_event_list[-1] == {"Flags": 3, "Identities": 2, "name": today}
+    assert [event["my_feature"] for event in feature_event_list] == [5]
+    assert top_organisations == {2: 10}
+
+
+@pytest.mark.django_db
+def test_usage_queries_return_nothing_without_data(backend):
+    assert backend.get_events_for_organisation(1) == 0
+    assert backend.get_multiple_event_list_for_organisation(1) == []
+    assert backend.get_multiple_event_list_for_feature(1, "my_feature") == []
+    assert backend.get_top_organisations("24h") == {}
+    assert not FeatureEvaluationBucket.objects.exists()
@@ -2,6 +2,7 @@ from unittest import mock
 
 import pytest
 from app_analytics.track import (
+    track_feature_evaluation_influxdb,
     track_request_googleanalytics,
     track_request_influxdb,
 )
@@ -50,13 +51,13 @@ def test_track_request_googleanalytics(
         ("/api/v1/traits/", "traits"),
     ),
 )
-@mock.patch("app_analytics.track.InfluxDBWrapper")
+@mock.patch("app_analytics.track.get_api_usage_aggregator")
 @mock.patch("app_analytics.track.Environment")
 def test_track_request_sends_data_to_influxdb_for_tracked_uris(
-    MockEnvironment, MockInfluxDBWrapper, request_uri, expected_resource
+    MockEnvironment, mock_get_api_usage_aggregator, request_uri, expected_resource
 ):
     """
-    Verify that the correct number of calls are made to InfluxDB for the various uris.
+    Verify that the requests to the various uris are recorded to be sent to InfluxDB.
     """
     # Given
     request = mock.MagicMock()
@@ -64,25 +65,20 @@ def test_track_request_sends_data_to_influxdb_for_tracked_uris(
     environment_api_key = "test"
     request.headers = {"X-Environment-Key": environment_api_key}
 
-    mock_influxdb = mock.MagicMock()
-    MockInfluxDBWrapper.return_value = mock_influxdb
+    mock_aggregator = mock_get_api_usage_aggregator.return_value
 
     # When
     track_request_influxdb(request)
 
     # Then
-    call_list = MockInfluxDBWrapper.call_args_list
-    assert len(call_list) == 1
-    assert (
-        mock_influxdb.add_data_point.call_args_list[0][1]["tags"]["resource"]
-        == expected_resource
-    )
+    mock_aggregator.add.assert_called_once()
+    assert mock_aggregator.add.call_args[0][0]["resource"] == expected_resource
 
 
-@mock.patch("app_analytics.track.InfluxDBWrapper")
+@mock.patch("app_analytics.track.get_api_usage_aggregator")
 @mock.patch("app_analytics.track.Environment")
 def test_track_request_sends_host_data_to_influxdb(
-    MockEnvironment, MockInfluxDBWrapper, rf
+    MockEnvironment, mock_get_api_usage_aggregator, rf
 ):
     """
     Verify that host is part of the data send to influxDB
@@ -93,26 +89,22 @@ def test_track_request_sends_host_data_to_influxdb(
 
     request = rf.get("/api/v1/flags/", headers=headers)
 
-    mock_influxdb = mock.MagicMock()
-    MockInfluxDBWrapper.return_value = mock_influxdb
+    mock_aggregator = mock_get_api_usage_aggregator.return_value
 
     # When
     track_request_influxdb(request)
 
     # Then
-    assert (
-        mock_influxdb.add_data_point.call_args_list[0][1]["tags"]["host"]
-        == "testserver"
-    )
+    assert mock_aggregator.add.call_args[0][0]["host"] == "testserver"
 
 
-@mock.patch("app_analytics.track.InfluxDBWrapper")
+@mock.patch("app_analytics.track.get_api_usage_aggregator")
 @mock.patch("app_analytics.track.Environment")
 def test_track_request_does_not_send_data_to_influxdb_for_not_tracked_uris(
-    MockEnvironment, MockInfluxDBWrapper
+    MockEnvironment, mock_get_api_usage_aggregator
 ):
     """
-    Verify that the correct number of calls are made to InfluxDB for the various uris.
+    Verify that requests to uris that aren't tracked aren't recorded.
     """
     # Given
     request = mock.MagicMock()
@@ -120,11 +112,26 @@ def test_track_request_does_not_send_data_to_influxdb_for_not_tracked_uris(
     environment_api_key = "test"
     request.headers = {"X-Environment-Key": environment_api_key}
 
-    mock_influxdb = mock.MagicMock()
-    MockInfluxDBWrapper.return_value = mock_influxdb
-
     # When
     track_request_influxdb(request)
 
     # Then
-    MockInfluxDBWrapper.assert_not_called()
+    mock_get_api_usage_aggregator.assert_not_called()
+
+
+@mock.patch("app_analytics.track.get_feature_evaluation_aggregator")
+def test_track_feature_evaluation_influxdb_records_evaluations(
+    mock_get_feature_evaluation_aggregator,
+):
+    # Given
+    environment_id = 1
+    feature_evaluations = {"feature_one": 10, "feature_two": 2, "bad_count": "1"}
+
+    # When
+    track_feature_evaluation_influxdb(environment_id, feature_evaluations)
+
+    # Then
+    assert mock_get_feature_evaluation_aggregator.return_value.add.call_args_list == [
+        mock.call({"feature_id": "feature_one", "environment_id": environment_id}, 10),
+        mock.call({"feature_id": "feature_two", "environment_id": environment_id}, 2),
+    ]
@@ -0,0 +1,106 @@
+from unittest import mock
+
+import pytest
+from app_analytics import usage
+from app_analytics.usage import (
+    get_events_for_organisation,
+    get_top_organisations,
+    prewarm_usage_cache,
+    usage_cache,
+)
+from django.core.management import call_command
+
+
+@pytest.fixture(autouse=True)
+def clear_usage_cache():
+    usage_cache.clear()
+    yield
+    usage_cache.clear()
+
+
+@pytest.fixture()
+def mock_backend(mocker):
+    mock_backend = mock.MagicMock()
+    mocker.patch.object(usage, "get_analytics_backend", return_value=mock_backend)
+    return mock_backend
+
+
+def test_usage_queries_are_cached_until_the_end_of_the_bucket(mocker, mock_backend):
+    # Given
+    mock_backend.get_events_for_organisation.return_value = 10
+    # 5 minutes into a 15 minute bucket
+    mocker.patch.object(usage.time, "time", return_value=15 * 60 * 1000 + 5 * 60)
+    mock_cache_set = mocker.spy(usage_cache, "set")
+
+    # When
+    results = [get_events_for_organisation(1, date_range="7d") for _ in range(3)]
+
+    # Then
+    assert results == [10, 10, 10]
+    mock_backend.get_events_for_organisation.assert_called_once_with(1, date_range="7d")
+    mock_cache_set.assert_called_once_with("events:1:7d", 10, timeout=10 * 60)
+
+
+def test_refresh_reruns_the_query(mock_backend):
+    # Given
+    mock_backend.get_top_organisations.side_effect = [{1: 10}, {1: 20}]
+    get_top_organisations("30d")
+
+    # When
+    refreshed = get_top_organisations("30d", refresh=True)
+
+    # Then
+    assert refreshed == {1: 20}
+    assert get_top_organisations("30d") == {1: 20}
+
+
+def test_prewarm_usage_cache_refreshes_the_top_organisations(settings, mock_backend):
+    # Given
+    settings.ANALYTICS_USAGE_PREWARM_ORGANISATIONS = 1
+    mock_backend.get_top_organisations.return_value = {2: 20, 1: 10}
+    mock_backend.get_events_for_organisation.return_value = 20
+    mock_backend.get_event_list_for_organisation.return_value = ({}, [])
+    mock_backend.get_multiple_event_list_for_organisation.return_value = []
+
+    # When
+    prewarm_usage_cache()
+
+    # Then
+    assert mock_backend.get_top_organisations.call_count == 3
+    assert mock_backend.get_events_for_organisation.call_args_list == [
+        mock.call(2, date_range=date_range) for date_range in ("24h", "7d", "30d")
+    ]
+    mock_backend.get_event_list_for_organisation.assert_called_once_with(2)
+    mock_backend.get_multiple_event_list_for_organisation.assert_called_once_with(2)
+
+    # and the dashboard is served from the cache
+    get_top_organisations("24h", "100")
+    get_events_for_organisation(2, date_range="30d")
+    assert mock_backend.get_top_organisations.call_count == 3
+    assert mock_backend.get_events_for_organisation.call_count == 3
+
+
+def test_prewarm_usage_cache_command_refreshes_the_cache_once(mocker):
+    # Given
+    mock_prewarm_usage_cache = mocker.patch(
+        "app_analytics.management.commands.prewarm_usage_cache.prewarm_usage_cache"
+    )
+
+    # When
+    call_command("prewarm_usage_cache", "--once")
+
+    # Then
+    mock_prewarm_usage_cache.assert_called_once_with()
+
+
+def test_usage_queries_do_not_start_any_threads(settings, mock_backend, mocker):
+    # Given
+    settings.ANALYTICS_USAGE_PREWARM_INTERVAL_SECONDS = 300
+    mock_thread_start = mocker.patch("threading.Thread.start")
+    mock_backend.get_events_for_organisation.return_value = 10
+
+    # When
+    get_events_for_organisation(1)
+
+    # Then
+    mock_thread_start.assert_not_called()
@@ -2,7 +2,10 @@ import logging
 import uuid
 
 import requests
-from app_analytics.influxdb_wrapper import InfluxDBWrapper
+from app_analytics.aggregator import (
+    get_api_usage_aggregator,
+    get_feature_evaluation_aggregator,
+)
 from django.conf import settings
 from django.core.cache import caches
 from six.moves.urllib.parse import quote  # python 2/3 compatible urllib import
@@ -27,16 +30,11 @@ TRACKED_RESOURCE_ACTIONS = {
 }
 
 
-@postpone
+@postpone(queue_name="analytics")
 def track_request_googleanalytics_async(request):
     return track_request_googleanalytics(request)
 
 
-@postpone
-def track_request_influxdb_async(request):
-    return track_request_influxdb(request)
-
-
 def get_resource_from_uri(request_uri):
     """
     Split the uri so we can determine the resource that is being requested
@@ -94,7 +92,8 @@ def track_event(category, action, label="", value=""):
 
 def track_request_influxdb(request):
     """
-    Sends API event data to InfluxDB
+    Records API event data to be sent to InfluxDB, summed with the other requests
+    for the same resource, environment and host, by the API usage aggregator
 
     :param request: (HttpRequest) the request being made
     """
@@ -118,22 +117,27 @@ def track_request_influxdb(request):
             "host": request.get_host(),
         }
 
-        influxdb = InfluxDBWrapper("api_call")
-        influxdb.add_data_point("request_count", 1, tags=tags)
-        influxdb.write()
+        get_api_usage_aggregator().add(tags)
 
 
 def track_feature_evaluation_influxdb(environment_id, feature_evaluations):
     """
-    Sends Feature analytics event data to InfluxDB
+    Records Feature analytics event data to be sent to InfluxDB, summed with the
+    evaluations of the same feature sent by other requests
 
     :param environment_id: (int) the id of the environment the feature is being evaluated within
     :param feature_evaluations: (dict) A collection of key id / evaluation counts
     """
-    influxdb = InfluxDBWrapper("feature_evaluation")
+    aggregator = get_feature_evaluation_aggregator()
 
     for feature_id, evaluation_count in feature_evaluations.items():
-        tags = {"feature_id": feature_id, "environment_id": environment_id}
-        influxdb.add_data_point("request_count", evaluation_count, tags=tags)
+        if isinstance(evaluation_count, bool) or not isinstance(evaluation_count, int):
+            logger.warning(
+                "Ignoring evaluation count %r for feature %s.",
+                evaluation_count,
+                feature_id,
+            )
+            continue
 
-    influxdb.write()
+        tags = {"feature_id": feature_id, "environment_id": environment_id}
+        aggregator.add(tags, evaluation_count)
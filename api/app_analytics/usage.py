@@ -0,0 +1,152 @@
+"""
+Queries for API usage and flag analytics, answered by the configured analytics
+backend (see app_analytics.backends).
+
+Results are cached until the end of the bucket they are read from, as new usage
+only shows up once it has been rolled up into a bucket. Only one thread per process
+runs each query at a time, and the usage of the top organisations is refreshed by
+the prewarm_usage_cache management command so that the dashboards don't wait on the
+backend.
+"""
+import logging
+import threading
+import time
+import typing
+
+from app_analytics.backends import (
+    get_analytics_backend,
+    get_bucket_size_for_range,
+    parse_duration,
+)
+from app_analytics.models import BUCKET_SIZE_1_HOUR
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+usage_cache = caches[settings.ANALYTICS_USAGE_CACHE_LOCATION]
+
+# the date ranges, and limits, of the top organisations shown on the sales dashboard
+TOP_ORGANISATIONS_QUERIES = (("30d", ""), ("7d", ""), ("24h", "100"))
+# the date ranges of the usage shown for each organisation
+ORGANISATION_USAGE_RANGES = ("24h", "7d", "30d")
+
+# the daily event lists are cached for up to an hour, so that today's usage is
+# reasonably up to date
+EVENT_LIST_BUCKET_SIZE = BUCKET_SIZE_1_HOUR
+
+# queries are refreshed under one of a fixed number of locks, chosen by cache key
+_refresh_locks = [threading.Lock() for _ in range(64)]
+
+
+def get_events_for_organisation(
+    organisation_id: int, date_range: str = "30d", refresh: bool = False
+) -> int:
+    return _get_cached(
+        f"events:{organisation_id}:{date_range}",
+        get_bucket_size_for_range(parse_duration(date_range)),
+        lambda: get_analytics_backend().get_events_for_organisation(
+            organisation_id, date_range=date_range
+        ),
+        refresh,
+    )
+
+
+def get_event_list_for_organisation(
+    organisation_id: int, refresh: bool = False
+) -> typing.Tuple[typing.Dict[str, typing.List[int]], typing.List[str]]:
+    return _get_cached(
+        f"event-list:{organisation_id}",
+        EVENT_LIST_BUCKET_SIZE,
+        lambda: get_analytics_backend().get_event_list_for_organisation(
+            organisation_id
+        ),
+        refresh,
+    )
+
+
+def get_multiple_event_list_for_organisation(
+    organisation_id: int, refresh: bool = False
+) -> typing.List[dict]:
+    return _get_cached(
+        f"multiple-event-list:{organisation_id}",
+        EVENT_LIST_BUCKET_SIZE,
+        lambda: get_analytics_backend().get_multiple_event_list_for_organisation(
+            organisation_id
+        ),
+        refresh,
+    )
+
+
+def get_multiple_event_list_for_feature(
+    environment_id: int, feature_name: str, period: str = "30d", refresh: bool = False
+) -> typing.List[dict]:
+    return _get_cached(
+        f"feature-event-list:{environment_id}:{feature_name}:{period}",
+        EVENT_LIST_BUCKET_SIZE,
+        lambda: get_analytics_backend().get_multiple_event_list_for_feature(
+            environment_id, feature_name, period=period
+        ),
+        refresh,
+    )
+
+
+def get_top_organisations(
+    date_range: str, limit: str = "", refresh: bool = False
+) -> typing.Dict[int, int]:
+    return _get_cached(
+        f"top-organisations:{date_range}:{limit}",
+        get_bucket_size_for_range(parse_duration(date_range)),
+        lambda: get_analytics_backend().get_top_organisations(date_range, limit=limit),
+        refresh,
+    )
+
+
+def prewarm_usage_cache() -> None:
+    """
+    Refresh the cached top organisations, and the usage of the first
+    ANALYTICS_USAGE_PREWARM_ORGANISATIONS of them.
+    """
+    top_organisations = {}
+    for date_range, limit in TOP_ORGANISATIONS_QUERIES:
+        top_organisations[date_range] = get_top_organisations(
+            date_range, limit, refresh=True
+        )
+
+    organisation_ids = list(top_organisations["30d"])[
+        : settings.ANALYTICS_USAGE_PREWARM_ORGANISATIONS
+    ]
+    for organisation_id in organisation_ids:
+        for date_range in ORGANISATION_USAGE_RANGES:
+            get_events_for_organisation(organisation_id, date_range, refresh=True)
+        get_event_list_for_organisation(organisation_id, refresh=True)
+        get_multiple_event_list_for_organisation(organisation_id, refresh=True)
+
+    logger.debug("Pre-warmed usage of %d organisations.", len(organisation_ids))
+
+
+def _get_cached(
+    key: str, bucket_size: int, query: typing.Callable[[], typing.Any], refresh: bool
+) -> typing.Any:
+    if not refresh:
+        result = usage_cache.get(key)
+        if result is not None:
+            return result
+
+    with _refresh_locks[hash(key) % len(_refresh_locks)]:
+        if not refresh:
+            # another thread may have run the query while we waited for the lock
+            result = usage_cache.get(key)
+            if result is not None:
+                return result
+
+        result = query()
+        usage_cache.set(
+            key, result, timeout=_get_seconds_until_next_bucket(bucket_size)
+        )
+        return result
+
+
+def _get_seconds_until_next_bucket(bucket_size: int) -> int:
+    bucket_seconds = bucket_size * 60
+    return max(1, int(bucket_seconds - time.time() % bucket_seconds))
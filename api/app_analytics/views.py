@@ -21,7 +21,7 @@ class SDKAnalyticsFlags(GenericAPIView):
         """
         Send flag evaluation events from the SDK back to the API for reporting.
         """
-        if settings.INFLUXDB_TOKEN:
+        if settings.ANALYTICS_ENABLED:
             track_feature_evaluation_influxdb(request.environment.id, request.data)
 
         return Response(status=status.HTTP_200_OK)
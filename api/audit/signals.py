@@ -1,20 +1,20 @@
 import logging
 
-import boto3
 from django.conf import settings
-from django.db.models import Q
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from flag_engine.django_transform.document_builders import (
-    build_environment_document,
-)
 
 from audit.models import AuditLog, RelatedObjectType
 from audit.serializers import AuditLogSerializer
-from environments.models import Environment
+from environments.dynamodb.environment_sync import (
+    sync_environments_to_dynamodb,
+)
+from environments.updates import publish_environment_versions
+from environments.versioning import update_environment_versions
 from integrations.datadog.datadog import DataDogWrapper
 from integrations.new_relic.new_relic import NewRelicWrapper
 from integrations.slack.slack import SlackWrapper
+from util.util import get_executor
 from webhooks.webhooks import WebhookEventType, call_organisation_webhooks
 
 logger = logging.getLogger(__name__)
@@ -33,7 +33,24 @@ def call_webhooks(sender, instance, **kwargs):
         if instance.project
         else instance.environment.project.organisation
     )
-    call_organisation_webhooks(organisation, data, WebhookEventType.AUDIT_LOG_CREATED)
+    if settings.WEBHOOK_OUTBOX_ENABLED:
+        # only records the events, to be delivered in the background
+        call_organisation_webhooks(
+            organisation, data, WebhookEventType.AUDIT_LOG_CREATED
+        )
+    else:
+        get_executor("webhooks").submit(
+            call_organisation_webhooks,
+            organisation,
+            data,
+            WebhookEventType.AUDIT_LOG_CREATED,
+        )
+
+
+@receiver(post_save, sender=AuditLog)
+def bump_environment_versions(sender, instance, **kwargs):
+    environment_ids = update_environment_versions(instance)
+    publish_environment_versions(environment_ids, instance.id)
 
 
 def _get_integration_config(instance, integration_name):
@@ -99,30 +116,13 @@ def send_audit_log_event_to_new_relic(sender, instance, **kwargs):
     _track_event_async(instance, new_relic)
 
 
-# Intialize the dynamo client globally
-dynamo_env_table = None
-if settings.ENVIRONMENTS_TABLE_NAME_DYNAMO:
-    dynamo_env_table = boto3.resource("dynamodb").Table(
-        settings.ENVIRONMENTS_TABLE_NAME_DYNAMO
-    )
-
-
 @receiver(post_save, sender=AuditLog)
 def send_environments_to_dynamodb(sender, instance, **kwargs):
-    environments_filter = (
-        Q(id=instance.environment_id)
-        if instance.environment_id
-        else Q(project=instance.project)
-    )
-    environments = Environment.objects.filter_for_document_builder(environments_filter)
-
-    project = instance.project or getattr(environments.first(), "project", None)
-    if not (project and project.enable_dynamo_db and dynamo_env_table):
-        return
-
-    with dynamo_env_table.batch_writer() as writer:
-        for environment in environments:
-            writer.put_item(Item=build_environment_document(environment))
+    # the documents are built, and written, in the background
+    if instance.environment_id:
+        sync_environments_to_dynamodb(environment_ids=[instance.environment_id])
+    elif instance.project_id:
+        sync_environments_to_dynamodb(project_ids=[instance.project_id])
 
 
 @receiver(post_save, sender=AuditLog)
@@ -1,6 +1,7 @@
 from unittest import TestCase, mock
 
 import pytest
+from django.test import override_settings
 
 from audit.models import AuditLog, RelatedObjectType
 from integrations.datadog.models import DataDogConfiguration
@@ -16,9 +17,10 @@ class AuditLogTestCase(TestCase):
             name="Test project", organisation=self.organisation
         )
 
+    @mock.patch("audit.signals.get_executor")
     @mock.patch("audit.signals.call_organisation_webhooks")
     def test_organisation_webhooks_are_called_when_audit_log_saved(
-        self, mock_call_webhooks
+        self, mock_call_webhooks, mock_get_executor
     ):
         # Given
         audit_log = AuditLog(project=self.project, log="Some audit log")
@@ -27,7 +29,26 @@ class AuditLogTestCase(TestCase):
         audit_log.save()
 
         # Then
-        mock_call_webhooks.assert_called()
+        mock_get_executor.assert_called_once_with("webhooks")
+        submit_args = mock_get_executor.return_value.submit.call_args[0]
+        assert submit_args[0] == mock_call_webhooks
+        assert submit_args[1] == self.organisation
+
+    @override_settings(WEBHOOK_OUTBOX_ENABLED=True)
+    @mock.patch("audit.signals.get_executor")
+    @mock.patch("audit.signals.call_organisation_webhooks")
+    def test_organisation_webhooks_are_called_inline_when_outbox_enabled(
+        self, mock_call_webhooks, mock_get_executor
+    ):
+        # Given
+        audit_log = AuditLog(project=self.project, log="Some audit log")
+
+        # When
+        audit_log.save()
+
+        # Then
+        mock_call_webhooks.assert_called_once()
+        mock_get_executor.assert_not_called()
 
     @mock.patch("integrations.datadog.datadog.DataDogWrapper.track_event_async")
     def test_data_dog_track_event_not_called_on_audit_log_saved_when_not_configured(
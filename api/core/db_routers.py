@@ -0,0 +1,189 @@
+"""
+Route the reads of read only (SDK) requests to read replicas of the database.
+
+Reads are only sent to a replica while inside `use_replicas()` (which the
+`replica_routing_middleware` enters for read only SDK requests) and only until the
+first write, after which all queries go to the primary so that the request can
+read its own writes. Anything built from the database and cached under the
+environment version (which is updated from the primary) is built inside
+`use_primary()` so that a lagging replica can't cache old data under a new version.
+"""
+import itertools
+import logging
+import threading
+import time
+import typing
+from contextlib import contextmanager
+from functools import lru_cache
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_DATABASE_ALIAS = "default"
+
+ROUND_ROBIN = "ROUND_ROBIN"
+LAG = "LAG"
+
+# Only consider the replica to be lagging if it has WAL still to replay, otherwise
+# an idle primary would make the replica look like it is falling behind.
+POSTGRES_REPLICATION_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+    THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+_state = Local()
+
+
+@contextmanager
+def use_replicas():
+    previous = (_get_state("use_replicas"), _get_state("pinned_to_primary"))
+    _state.use_replicas = True
+    _state.pinned_to_primary = False
+    try:
+        yield
+    finally:
+        _state.use_replicas, _state.pinned_to_primary = previous
+
+
+@contextmanager
+def use_primary():
+    previous = _get_state("use_primary")
+    _state.use_primary = True
+    try:
+        yield
+    finally:
+        _state.use_primary = previous
+
+
+def _get_state(name: str) -> bool:
+    return getattr(_state, name, False)
+
+
+class ReplicaSelector:
+    """
+    Choose a healthy replica to read from, either in turn or the one with the least
+    replication lag. Replicas are checked at most once every `health_check_interval`
+    seconds and any that error or lag by more than `max_lag_seconds` are skipped
+    until the next check.
+    """
+
+    def __init__(
+        self,
+        aliases: typing.Sequence[str],
+        strategy: str = ROUND_ROBIN,
+        max_lag_seconds: float = 5.0,
+        health_check_interval: float = 30.0,
+    ):
+        if strategy not in (ROUND_ROBIN, LAG):
+            raise ValueError(f"Unknown replica read strategy: {strategy}")
+
+        self.aliases = tuple(aliases)
+        self.strategy = strategy
+        self.max_lag_seconds = max_lag_seconds
+        self.health_check_interval = health_check_interval
+
+        self._lags = {}
+        self._next_check = 0.0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def get_replica(self) -> typing.Optional[str]:
+        if time.monotonic() >= self._next_check:
+            self.check_health()
+
+        lags = self._lags
+        if not lags:
+            return None
+
+        if self.strategy == LAG:
+            return min(lags, key=lags.get)
+
+        healthy_aliases = list(lags)
+        return healthy_aliases[next(self._counter) % len(healthy_aliases)]
+
+    def check_health(self) -> None:
+        # only one thread needs to check, the others can use the previous result
+        if not self._lock.acquire(blocking=False):
+            return
+
+        try:
+            lags = {}
+            for alias in self.aliases:
+                try:
+                    lag = _get_replication_lag(alias)
+                except DatabaseError:
+                    logger.warning("Replica database '%s' is unavailable.", alias)
+                    continue
+
+                if lag > self.max_lag_seconds:
+                    logger.warning(
+                        "Replica database '%s' is %.1f seconds behind.", alias, lag
+                    )
+                    continue
+
+                lags[alias] = lag
+
+            self._lags = lags
+            self._next_check = time.monotonic() + self.health_check_interval
+        finally:
+            self._lock.release()
+
+
+def _get_replication_lag(alias: str) -> float:
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(POSTGRES_REPLICATION_LAG_SQL)
+            return float(cursor.fetchone()[0] or 0)
+
+        cursor.execute("SELECT 1")
+        return 0.0
+
+
+def get_replica_selector() -> ReplicaSelector:
+    return _get_replica_selector(
+        tuple(settings.REPLICA_DATABASE_ALIASES),
+        settings.REPLICA_READ_STRATEGY,
+        settings.REPLICA_MAX_LAG_SECONDS,
+        settings.REPLICA_HEALTH_CHECK_INTERVAL_SECONDS,
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_replica_selector(
+    aliases: typing.Tuple[str, ...],
+    strategy: str,
+    max_lag_seconds: float,
+    health_check_interval: float,
+) -> ReplicaSelector:
+    return ReplicaSelector(aliases, strategy, max_lag_seconds, health_check_interval)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints) -> str:
+        if (
+            _get_state("use_replicas")
+            and not _get_state("pinned_to_primary")
+            and not _get_state("use_primary")
+        ):
+            return get_replica_selector().get_replica() or PRIMARY_DATABASE_ALIAS
+        return PRIMARY_DATABASE_ALIAS
+
+    def db_for_write(self, model, **hints) -> str:
+        _state.pinned_to_primary = True
+        return PRIMARY_DATABASE_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASE_ALIASES:
+            return False
+        return None
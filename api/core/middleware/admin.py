@@ -1,25 +1,38 @@
+import asyncio
 import logging
 
 from core.helpers import get_ip_address_from_request
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.utils.decorators import sync_and_async_middleware
 
 logger = logging.getLogger(__name__)
 
 
-class AdminWhitelistMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+@sync_and_async_middleware
+def admin_whitelist_middleware(get_response):
+    if asyncio.iscoroutinefunction(get_response):
 
-    def __call__(self, request):
-        if request.path.startswith("/admin"):
-            ip = get_ip_address_from_request(request)
-            if (
-                settings.ALLOWED_ADMIN_IP_ADDRESSES
-                and ip not in settings.ALLOWED_ADMIN_IP_ADDRESSES
-            ):
-                # IP address not allowed!
-                logger.info("Denying access to admin for ip address %s" % ip)
-                raise PermissionDenied()
+        async def middleware(request):
+            _check_ip_address(request)
+            return await get_response(request)
 
-        return self.get_response(request)
+    else:
+
+        def middleware(request):
+            _check_ip_address(request)
+            return get_response(request)
+
+    return middleware
+
+
+def _check_ip_address(request):
+    if request.path.startswith("/admin"):
+        ip = get_ip_address_from_request(request)
+        if (
+            settings.ALLOWED_ADMIN_IP_ADDRESSES
+            and ip not in settings.ALLOWED_ADMIN_IP_ADDRESSES
+        ):
+            # IP address not allowed!
+            logger.info("Denying access to admin for ip address %s" % ip)
+            raise PermissionDenied()
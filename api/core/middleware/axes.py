@@ -1,13 +1,43 @@
-from axes.middleware import AxesMiddleware as DefaultAxesMiddleware
+import asyncio
+
+from asgiref.sync import sync_to_async
+from axes.helpers import get_lockout_response
+from axes.middleware import AxesMiddleware
 from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+
+@sync_and_async_middleware
+def axes_middleware(get_response):
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            response = await get_response(request)
+
+            if (
+                _is_blacklisted_url(request)
+                and settings.AXES_ENABLED
+                and getattr(request, "axes_locked_out", None)
+            ):
+                credentials = getattr(request, "axes_credentials", None)
+                response = await sync_to_async(get_lockout_response)(
+                    request, credentials
+                )
+
+            return response
+
+    else:
+        default_middleware = AxesMiddleware(get_response)
+
+        def middleware(request):
+            if _is_blacklisted_url(request):
+                return default_middleware(request)
+            return get_response(request)
 
+    return middleware
 
-class AxesMiddleware(DefaultAxesMiddleware):
-    def __call__(self, request):
-        if hasattr(request, "path") and any(
-            url in request.path for url in settings.AXES_BLACKLISTED_URLS
-        ):
-            return super().__call__(request)
 
-        response = self.get_response(request)
-        return response
+def _is_blacklisted_url(request) -> bool:
+    return hasattr(request, "path") and any(
+        url in request.path for url in settings.AXES_BLACKLISTED_URLS
+    )
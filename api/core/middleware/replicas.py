@@ -0,0 +1,38 @@
+import asyncio
+
+from core.db_routers import use_replicas
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """
+    Serve the reads of read only SDK requests from the read replicas. Everything
+    else, including the admin API and any SDK request that writes (e.g. identify
+    with traits), reads from the primary.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if _is_read_only_sdk_request(request):
+                with use_replicas():
+                    return await get_response(request)
+
+            return await get_response(request)
+
+    else:
+
+        def middleware(request):
+            if _is_read_only_sdk_request(request):
+                with use_replicas():
+                    return get_response(request)
+
+            return get_response(request)
+
+    return middleware
+
+
+def _is_read_only_sdk_request(request) -> bool:
+    return request.method in SAFE_METHODS and "HTTP_X_ENVIRONMENT_KEY" in request.META
@@ -0,0 +1,23 @@
+import asyncio
+
+from django.utils.decorators import sync_and_async_middleware
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+@sync_and_async_middleware
+def whitenoise_middleware(get_response):
+    """
+    WhiteNoise middleware that can also be used in an async middleware chain, so that
+    serving with ASGI doesn't force every request through a synchronous middleware.
+    """
+    whitenoise = WhiteNoiseMiddleware(get_response)
+    if not asyncio.iscoroutinefunction(get_response):
+        return whitenoise
+
+    async def middleware(request):
+        response = whitenoise.process_request(request)
+        if response is None:
+            response = await get_response(request)
+        return response
+
+    return middleware
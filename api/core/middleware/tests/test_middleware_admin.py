@@ -1,7 +1,9 @@
+import asyncio
 from unittest import mock
 
 import pytest
-from core.middleware.admin import AdminWhitelistMiddleware
+from asgiref.sync import async_to_sync
+from core.middleware.admin import admin_whitelist_middleware
 from django.core.exceptions import PermissionDenied
 from django.test import override_settings
 
@@ -18,7 +20,7 @@ def test_admin_whitelist_middleware_raises_permission_denied_for_admin_pages_if_
     mock_request.path = "/admin/login"
     mock_request.META = {"REMOTE_ADDR": not_allowed_ip_address}
 
-    middleware = AdminWhitelistMiddleware(mock_get_response)
+    middleware = admin_whitelist_middleware(mock_get_response)
 
     # When
     with pytest.raises(PermissionDenied):
@@ -38,7 +40,7 @@ def test_admin_whitelist_middleware_returns_get_response_for_admin_pages_if_ip_a
     mock_request.path = "/admin/login"
     mock_request.META = {"REMOTE_ADDR": allowed_ip_address}
 
-    middleware = AdminWhitelistMiddleware(mock_get_response)
+    middleware = admin_whitelist_middleware(mock_get_response)
 
     # When
     response = middleware(mock_request)
@@ -59,7 +61,7 @@ def test_admin_whitelist_middleware_returns_get_response_for_non_admin_request_i
     mock_request.path = "/api/v1/flags"
     mock_request.META = {"REMOTE_ADDR": not_allowed_ip_address}
 
-    middleware = AdminWhitelistMiddleware(mock_get_response)
+    middleware = admin_whitelist_middleware(mock_get_response)
 
     # When
     response = middleware(mock_request)
@@ -67,3 +69,23 @@ def test_admin_whitelist_middleware_returns_get_response_for_non_admin_request_i
     # Then
     mock_get_response.assert_called_with(mock_request)
     assert response == mock_get_response_return
+
+
+@override_settings(ALLOWED_ADMIN_IP_ADDRESSES=[allowed_ip_address])
+def test_admin_whitelist_middleware_checks_ip_address_of_async_requests():
+    # Given
+    async def get_response(request):
+        return mock.MagicMock()
+
+    mock_request = mock.MagicMock()
+    mock_request.path = "/admin/login"
+    mock_request.META = {"REMOTE_ADDR": not_allowed_ip_address}
+
+    middleware = admin_whitelist_middleware(get_response)
+
+    # When
+    with pytest.raises(PermissionDenied):
+        async_to_sync(middleware)(mock_request)
+
+    # Then
+    assert asyncio.iscoroutinefunction(middleware)
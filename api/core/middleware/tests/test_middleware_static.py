@@ -0,0 +1,37 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from core.middleware.static import whitenoise_middleware
+
+
+def test_whitenoise_middleware_awaits_async_get_response():
+    # Given
+    response = mock.MagicMock()
+
+    async def get_response(request):
+        return response
+
+    middleware = whitenoise_middleware(get_response)
+    request = mock.MagicMock(path_info="/api/v1/flags/")
+
+    # When
+    result = async_to_sync(middleware)(request)
+
+    # Then
+    assert asyncio.iscoroutinefunction(middleware)
+    assert result is response
+
+
+def test_whitenoise_middleware_calls_sync_get_response():
+    # Given
+    get_response = mock.MagicMock()
+    middleware = whitenoise_middleware(get_response)
+    request = mock.MagicMock(path_info="/api/v1/flags/")
+
+    # When
+    result = middleware(request)
+
+    # Then
+    assert not asyncio.iscoroutinefunction(middleware)
+    assert result is get_response.return_value
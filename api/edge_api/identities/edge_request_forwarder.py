@@ -1,23 +1,39 @@
 import json
+import typing
+from functools import lru_cache
 
 import requests
 from core.constants import FLAGSMITH_SIGNATURE_HEADER
 from core.signing import sign_payload
 from django.conf import settings
+from django.core.cache import caches
 from rest_framework.request import Request
 
-from environments.dynamodb import DynamoIdentityWrapper
-from util.util import postpone
+from environments.dynamodb.migrator import IdentityMigrator
+from util.util import BoundedExecutor, get_executor
+
+migration_status_cache = caches[settings.EDGE_MIGRATION_STATUS_CACHE_LOCATION]
 
 
 def _should_forward(project_id: int) -> bool:
-    dynamo_identity_wrapper = DynamoIdentityWrapper()
-    return dynamo_identity_wrapper.is_migration_done(project_id)
+    is_migration_done = migration_status_cache.get(project_id)
+    if is_migration_done is None:
+        is_migration_done = bool(
+            settings.PROJECT_METADATA_TABLE_NAME_DYNAMO
+            and IdentityMigrator(project_id).is_migration_done
+        )
+        migration_status_cache.set(
+            project_id,
+            is_migration_done,
+            timeout=settings.CACHE_EDGE_MIGRATION_STATUS_SECONDS,
+        )
+    return is_migration_done
 
 
-@postpone
 def forward_identity_request(request, project_id: int):
-    forward_identity_request_sync(request, project_id)
+    get_edge_request_executor().submit(
+        forward_identity_request_sync, request, project_id
+    )
 
 
 def forward_identity_request_sync(request, project_id: int):
@@ -34,25 +50,43 @@ def forward_identity_request_sync(request, project_id: int):
 
 
 def _forward_identity_get_request(request: Request, url: str):
-    requests.get(
+    get_edge_session().get(
         url,
         params=request.GET.dict(),
         headers=_get_headers(request),
+        timeout=settings.EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS,
     )
 
 
-def _forward_identity_post_request(request: Request, url: str):
-    payload = json.dumps(request.data)
-    requests.post(
+def _forward_identity_post_request(request: Request, url: str, payload: dict = None):
+    payload = json.dumps(payload if payload is not None else request.data)
+    get_edge_session().post(
         url,
         data=payload,
         headers=_get_headers(request, payload),
+        timeout=settings.EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS,
     )
 
 
-@postpone
+def forward_identity_requests(request: Request, project_id: int):
+    get_edge_request_executor().submit(
+        forward_identity_requests_sync, request, project_id
+    )
+
+
+def forward_identity_requests_sync(request: Request, project_id: int):
+    if not _should_forward(project_id):
+        return
+
+    url = settings.EDGE_API_URL + "identities/"
+    for identity_data in request.data:
+        _forward_identity_post_request(request, url, payload=identity_data)
+
+
 def forward_trait_request(request: Request, project_id: int, payload: dict = None):
-    return forward_trait_request_sync(request, project_id, payload)
+    get_edge_request_executor().submit(
+        forward_trait_request_sync, request, project_id, payload
+    )
 
 
 def forward_trait_request_sync(request: Request, project_id: int, payload: dict = None):
@@ -60,19 +94,44 @@ def forward_trait_request_sync(request: Request, project_id: int, payload: dict
         return
 
     url = settings.EDGE_API_URL + "traits/"
-    payload = payload if payload else request.data
+    payload = payload if payload is not None else request.data
     payload = json.dumps(payload)
-    requests.post(
+    get_edge_session().post(
         url,
         data=payload,
         headers=_get_headers(request, payload),
+        timeout=settings.EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS,
     )
 
 
-@postpone
 def forward_trait_requests(request: Request, project_id: int):
+    get_edge_request_executor().submit(forward_trait_requests_sync, request, project_id)
+
+
+def forward_trait_requests_sync(request: Request, project_id: int):
+    if not _should_forward(project_id):
+        return
+
+    if not settings.EDGE_FORWARD_TRAITS_IN_BULK:
+        for trait_data in request.data:
+            forward_trait_request_sync(request, project_id, payload=trait_data)
+        return
+
+    # send the traits of each identity in a single request
+    url = settings.EDGE_API_URL + "traits/bulk/"
+    trait_data_by_identifier: typing.Dict[str, typing.List[dict]] = {}
     for trait_data in request.data:
-        return forward_trait_request_sync(request, project_id, payload=trait_data)
+        identifier = trait_data["identity"]["identifier"]
+        trait_data_by_identifier.setdefault(identifier, []).append(trait_data)
+
+    for trait_data_items in trait_data_by_identifier.values():
+        payload = json.dumps(trait_data_items)
+        get_edge_session().put(
+            url,
+            data=payload,
+            headers=_get_headers(request, payload),
+            timeout=settings.EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS,
+        )
 
 
 def _get_headers(request: Request, payload: str = "") -> dict:
@@ -86,3 +145,27 @@ def _get_headers(request: Request, payload: str = "") -> dict:
     signature = sign_payload(payload, settings.EDGE_REQUEST_SIGNING_KEY)
     headers[FLAGSMITH_SIGNATURE_HEADER] = signature
     return headers
+
+
+def get_edge_request_executor() -> BoundedExecutor:
+    return get_executor(
+        "edge-request-forwarder",
+        max_workers=settings.EDGE_REQUEST_FORWARDER_MAX_WORKERS,
+        max_queue_size=settings.EDGE_REQUEST_FORWARDER_MAX_QUEUE_SIZE,
+    )
+
+
+def get_edge_session() -> requests.Session:
+    return _get_edge_session(settings.EDGE_REQUEST_FORWARDER_MAX_WORKERS)
+
+
+@lru_cache(maxsize=None)
+def _get_edge_session(max_workers: int) -> requests.Session:
+    # keep a connection to the edge api alive for each worker
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=max_workers
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import typing
+from datetime import datetime, timedelta
+
+from core.db_routers import use_primary
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch, Q
+from django.http import HttpRequest, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from flag_engine.django_transform.document_builders import (
+    build_environment_document,
+)
+from flag_engine.django_transform.schemas import (
+    DjangoEnvironmentSchema,
+    DjangoFeatureStateSchema,
+    DjangoSegmentSchema,
+)
+from rest_framework.response import Response
+
+from audit.models import AuditLog, RelatedObjectType
+from environments.models import Environment
+from environments.snapshot import get_feature_states_queryset
+from environments.versioning import get_environment_version
+from features.models import (
+    Feature,
+    FeatureSegment,
+    FeatureState,
+    FeatureStateValue,
+)
+from features.multivariate.models import MultivariateFeatureStateValue
+from segments.models import Segment
+
+environment_document_cache = caches[settings.ENVIRONMENT_DOCUMENT_CACHE_LOCATION]
+
+# audit logs are created after the changes they describe have been saved, so look
+# for changes in the history tables from a little before the audit log for the
+# client's version. Sending something that hasn't changed is harmless, missing
+# something that has is not.
+DELTA_HISTORY_MARGIN = timedelta(seconds=30)
+
+
+class VersionedEnvironmentDocument(typing.NamedTuple):
+    document: dict
+    version: int
+    etag: str
+
+
+def get_versioned_environment_document(
+    environment: Environment,
+) -> VersionedEnvironmentDocument:
+    """
+    Get the document for the given environment, only building it if the
+    environment has changed since it was last built. Clients that already have the
+    current version are answered from the cache without building anything.
+
+    :raises Environment.DoesNotExist: if the environment has since been deleted
+    """
+    version = get_environment_version(environment)
+    cache_key = f"{environment.id}-{version}"
+
+    versioned_document = environment_document_cache.get(cache_key)
+    if versioned_document is None:
+        versioned_document = _build_versioned_environment_document(environment, version)
+        if settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS > 0:
+            environment_document_cache.set(
+                cache_key,
+                versioned_document,
+                timeout=settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS,
+            )
+
+    return versioned_document
+
+
+def get_environment_document_response(
+    request: HttpRequest, environment: Environment
+) -> typing.Union[Response, HttpResponseNotModified]:
+    """
+    Get a response containing the document for the given environment, or a 304 if
+    the client already has the current version of it.
+
+    There is no Last-Modified header as some changes (e.g. deleting a segment) don't
+    change the environment version, so there is no date that reliably changes
+    whenever the document does.
+    """
+    versioned_document = get_versioned_environment_document(environment)
+
+    not_modified_response = get_conditional_response(
+        request, etag=versioned_document.etag
+    )
+    if not_modified_response is not None:
+        not_modified_response["ETag"] = versioned_document.etag
+        return not_modified_response
+
+    return Response(
+        versioned_document.document, headers={"ETag": versioned_document.etag}
+    )
+
+
+def _build_versioned_environment_document(
+    environment: Environment, version: int
+) -> VersionedEnvironmentDocument:
+    # read from the primary, which the version is derived from, so that a lagging
+    # replica can't cache an old document under the new version
+    with use_primary():
+        document = build_environment_document(
+            Environment.objects.filter_for_document_builder(id=environment.id).get()
+        )
+
+    # some changes (e.g. deleting a segment) don't change the environment version
+    # so the content hash is included to guarantee that the ETag changes whenever
+    # the document does
+    content_hash = hashlib.md5(
+        json.dumps(document, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+
+    return VersionedEnvironmentDocument(
+        document=document, version=version, etag=f'"{version}-{content_hash}"'
+    )
+
+
+@use_primary()
+def get_environment_document_delta(environment: Environment, since: int) -> dict:
+    """
+    Get the changes to the document for the given environment since the given
+    version. If the changes can't be determined (e.g. the version is unknown or too
+    old) the full document is returned instead.
+
+    The changes are read from the primary, as the version is, otherwise a client
+    could be told it is up to date with changes that a lagging replica doesn't have.
+
+    The delta contains the environment (and project) attributes, the environment
+    feature states and segments that have been added or changed, the ids of the
+    features that have been deleted and the ids of all of the segments that
+    currently exist, so that clients can drop any deleted segments.
+    """
+    version = get_environment_version(environment)
+    since_date = _get_version_date(environment, since) if since <= version else None
+
+    max_age = timedelta(seconds=settings.ENVIRONMENT_DOCUMENT_DELTA_MAX_AGE_SECONDS)
+    if since_date is None or since_date < timezone.now() - max_age:
+        return {
+            "version": version,
+            "full_document": True,
+            "document": get_versioned_environment_document(environment).document,
+        }
+
+    changed_since = since_date - DELTA_HISTORY_MARGIN
+    feature_ids, segment_ids = _get_changed_feature_and_segment_ids(
+        environment, since, changed_since
+    )
+
+    environment = Environment.objects.select_related(
+        "project",
+        "project__organisation",
+        "mixpanel_config",
+        "segment_config",
+        "amplitude_config",
+        "heap_config",
+    ).get(id=environment.id)
+    feature_states = list(
+        get_feature_states_queryset().filter(
+            environment=environment,
+            feature_id__in=feature_ids,
+            identity__isnull=True,
+            feature_segment__isnull=True,
+        )
+    )
+    all_segment_ids = list(
+        Segment.objects.filter(project_id=environment.project_id).values_list(
+            "id", flat=True
+        )
+    )
+    segments = _get_segments_for_document(environment, segment_ids)
+
+    environment_data = DjangoEnvironmentSchema(
+        exclude=("feature_states", "project.segments")
+    ).dump(environment)
+    return {
+        "version": version,
+        "full_document": False,
+        **environment_data,
+        "feature_states": DjangoFeatureStateSchema().dump(feature_states, many=True),
+        "deleted_feature_ids": sorted(
+            feature_ids - {feature_state.feature_id for feature_state in feature_states}
+        ),
+        "segments": DjangoSegmentSchema(
+            context={"environment_api_key": environment.api_key}
+        ).dump(segments, many=True),
+        "segment_ids": all_segment_ids,
+    }
+
+
+def _get_version_date(
+    environment: Environment, version: int
+) -> typing.Optional[datetime]:
+    if version == 0:
+        return None
+
+    return (
+        AuditLog.objects.filter(
+            Q(environment_id=environment.id)
+            | Q(project_id=environment.project_id, environment__isnull=True),
+            id=version,
+        )
+        .values_list("created_date", flat=True)
+        .first()
+    )
+
+
+def _get_changed_feature_and_segment_ids(
+    environment: Environment, since: int, changed_since: datetime
+) -> typing.Tuple[typing.Set[int], typing.Set[int]]:
+    feature_ids = set(
+        Feature.history.filter(
+            project_id=environment.project_id, history_date__gt=changed_since
+        ).values_list("id", flat=True)
+    )
+    segment_ids = set(
+        FeatureSegment.history.filter(
+            environment_id=environment.id, history_date__gt=changed_since
+        ).values_list("segment_id", flat=True)
+    )
+
+    feature_segment_ids = set()
+    for audit_log in AuditLog.objects.filter(
+        Q(environment_id=environment.id)
+        | Q(project_id=environment.project_id, environment__isnull=True),
+        id__gt=since,
+    ).values("related_object_type", "related_object_id"):
+        if audit_log["related_object_type"] == RelatedObjectType.FEATURE.name:
+            feature_ids.add(audit_log["related_object_id"])
+        elif audit_log["related_object_type"] == RelatedObjectType.SEGMENT.name:
+            segment_ids.add(audit_log["related_object_id"])
+
+    changed_feature_state_ids = FeatureStateValue.history.filter(
+        feature_state__environment_id=environment.id,
+        history_date__gt=changed_since,
+    ).values("feature_state_id")
+    changed_feature_states = (
+        FeatureState.history.filter(
+            Q(history_date__gt=changed_since) | Q(id__in=changed_feature_state_ids),
+            environment_id=environment.id,
+            identity_id__isnull=True,
+        )
+        .values_list("feature_id", "feature_segment_id")
+        .distinct()
+    )
+    for feature_id, feature_segment_id in changed_feature_states:
+        if feature_segment_id:
+            feature_segment_ids.add(feature_segment_id)
+        else:
+            feature_ids.add(feature_id)
+
+    # segment overrides include the details of the feature they override so the
+    # segments need updating if any of the features they override have changed
+    segment_ids.update(
+        FeatureSegment.history.filter(
+            Q(id__in=feature_segment_ids) | Q(feature_id__in=feature_ids),
+            environment_id=environment.id,
+        ).values_list("segment_id", flat=True)
+    )
+
+    return feature_ids, segment_ids
+
+
+def _get_segments_for_document(
+    environment: Environment, segment_ids: typing.Iterable[int]
+) -> typing.List[Segment]:
+    return list(
+        Segment.objects.filter(
+            project_id=environment.project_id, id__in=segment_ids
+        ).prefetch_related(
+            "rules",
+            "rules__rules",
+            "rules__conditions",
+            "rules__rules__conditions",
+            "rules__rules__rules",
+            Prefetch(
+                "feature_segments",
+                queryset=FeatureSegment.objects.select_related("environment"),
+            ),
+            Prefetch(
+                "feature_segments__feature_states",
+                queryset=FeatureState.objects.select_related(
+                    "feature", "feature_state_value"
+                ),
+            ),
+            Prefetch(
+                "feature_segments__feature_states__multivariate_feature_state_values",
+                queryset=MultivariateFeatureStateValue.objects.select_related(
+                    "multivariate_feature_option"
+                ),
+            ),
+        )
+    )
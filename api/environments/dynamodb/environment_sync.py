@@ -0,0 +1,200 @@
+"""
+Keep the environment documents stored in DynamoDB (for the edge API) up to date.
+Changes only mark their environments (or, for project wide changes, all of the
+environments in the project) as dirty, once the transaction that made them has been
+committed. Every DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS the documents of the
+dirty environments are built, once each, and written in a single batch, so that a
+bulk edit doesn't rebuild the same documents for every change it makes.
+"""
+import logging
+import threading
+import time
+import typing
+from functools import lru_cache
+
+import boto3
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from flag_engine.django_transform.document_builders import (
+    build_environment_document,
+)
+
+from environments.models import Environment
+from util.util import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+dynamo_env_table = None
+if settings.ENVIRONMENTS_TABLE_NAME_DYNAMO:
+    dynamo_env_table = boto3.resource("dynamodb").Table(
+        settings.ENVIRONMENTS_TABLE_NAME_DYNAMO
+    )
+
+
+class EnvironmentDocumentSyncer:
+    """
+    Collect the environments, and projects, whose documents need writing to
+    DynamoDB and write them all whenever `sync` is called. Environments that fail to
+    sync stay dirty, so they are retried by the next sync. The lag between an
+    environment being marked dirty and its document being written is recorded.
+    """
+
+    def __init__(self):
+        self.synced_count = 0
+        self.failed_count = 0
+        self.total_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+        # the time at which each environment, or project, was first marked dirty
+        self._dirty_environments: typing.Dict[int, float] = {}
+        self._dirty_projects: typing.Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark_dirty(
+        self,
+        environment_ids: typing.Iterable[int] = (),
+        project_ids: typing.Iterable[int] = (),
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for environment_id in environment_ids:
+                self._dirty_environments.setdefault(environment_id, now)
+            for project_id in project_ids:
+                self._dirty_projects.setdefault(project_id, now)
+
+    def sync(self) -> int:
+        """
+        Write the documents of the dirty environments of projects that use DynamoDB.
+
+        :return: the number of documents written
+        """
+        with self._lock:
+            dirty_environments, self._dirty_environments = self._dirty_environments, {}
+            dirty_projects, self._dirty_projects = self._dirty_projects, {}
+
+        if not (dirty_environments or dirty_projects) or not dynamo_env_table:
+            return 0
+
+        try:
+            environments = list(
+                Environment.objects.filter_for_document_builder(
+                    Q(id__in=list(dirty_environments))
+                    | Q(project_id__in=list(dirty_projects)),
+                    project__enable_dynamo_db=True,
+                )
+            )
+            with dynamo_env_table.batch_writer() as writer:
+                for environment in environments:
+                    writer.put_item(Item=build_environment_document(environment))
+        except Exception:
+            with self._lock:
+                self.failed_count += len(dirty_environments) + len(dirty_projects)
+            self._mark_dirty_since(dirty_environments, dirty_projects)
+            raise
+
+        now = time.monotonic()
+        lags = [
+            now
+            - min(
+                dirty_environments.get(environment.id, now),
+                dirty_projects.get(environment.project_id, now),
+            )
+            for environment in environments
+        ]
+        with self._lock:
+            self.synced_count += len(environments)
+            self.total_lag_seconds += sum(lags)
+            self.max_lag_seconds = max([self.max_lag_seconds, *lags])
+
+        logger.debug(
+            "Synced %d environment documents to DynamoDB, with a maximum lag of %.2fs.",
+            len(environments),
+            max(lags, default=0.0),
+        )
+        return len(environments)
+
+    def _mark_dirty_since(
+        self,
+        dirty_environments: typing.Dict[int, float],
+        dirty_projects: typing.Dict[int, float],
+    ) -> None:
+        # keep the earliest time, so that the lag includes the failed attempts
+        with self._lock:
+            for environment_id, dirty_since in dirty_environments.items():
+                self._dirty_environments[environment_id] = min(
+                    dirty_since,
+                    self._dirty_environments.get(environment_id, dirty_since),
+                )
+            for project_id, dirty_since in dirty_projects.items():
+                self._dirty_projects[project_id] = min(
+                    dirty_since, self._dirty_projects.get(project_id, dirty_since)
+                )
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            dirty_since = [
+                *self._dirty_environments.values(),
+                *self._dirty_projects.values(),
+            ]
+            return {
+                "dirty": len(dirty_since),
+                "synced": self.synced_count,
+                "failed": self.failed_count,
+                "average_lag_seconds": (
+                    self.total_lag_seconds / self.synced_count
+                    if self.synced_count
+                    else 0.0
+                ),
+                "max_lag_seconds": self.max_lag_seconds,
+                "oldest_dirty_seconds": now - min(dirty_since, default=now),
+            }
+
+
+def sync_environments_to_dynamodb(
+    environment_ids: typing.Iterable[int] = (),
+    project_ids: typing.Iterable[int] = (),
+) -> None:
+    """
+    Mark the given environments, and all of the environments of the given projects,
+    as dirty once the current transaction has been committed. If
+    DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS is 0 they are written straight away.
+    """
+    if not dynamo_env_table:
+        return
+
+    environment_ids, project_ids = list(environment_ids), list(project_ids)
+
+    def mark_dirty():
+        syncer = get_environment_document_syncer()
+        syncer.mark_dirty(environment_ids, project_ids)
+        if settings.DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS:
+            get_environment_document_sync_flusher().start()
+        else:
+            try:
+                syncer.sync()
+            except Exception:
+                logger.exception("Failed to sync environment documents to DynamoDB.")
+
+    transaction.on_commit(mark_dirty)
+
+
+@lru_cache(maxsize=None)
+def get_environment_document_syncer() -> EnvironmentDocumentSyncer:
+    return EnvironmentDocumentSyncer()
+
+
+def get_environment_document_sync_flusher() -> PeriodicFlusher:
+    return _get_environment_document_sync_flusher(
+        settings.DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_environment_document_sync_flusher(interval: float) -> PeriodicFlusher:
+    return PeriodicFlusher(
+        get_environment_document_syncer().sync,
+        interval,
+        name="dynamodb-environment-sync",
+    )
@@ -0,0 +1,56 @@
+import typing
+
+from core.db_routers import use_primary
+from django.conf import settings
+from django.core.cache import caches
+
+from environments.models import Environment
+from environments.versioning import get_environment_version
+from features.models import Feature
+
+feature_name_index_cache = caches[settings.FEATURE_NAME_INDEX_CACHE_LOCATION]
+
+FeatureNameIndex = typing.Dict[str, typing.List[typing.Tuple[str, int]]]
+
+
+def get_feature_name_index(environment: Environment) -> FeatureNameIndex:
+    """
+    Get an index of the (name, id) pairs of the features in the environment's
+    project, keyed on the lower case feature name.
+    """
+    version = get_environment_version(environment)
+    cache_key = f"{environment.id}-{version}"
+
+    index = feature_name_index_cache.get(cache_key)
+    if index is None:
+        index = {}
+        with use_primary():
+            features = list(
+                Feature.objects.filter(project_id=environment.project_id).values_list(
+                    "id", "name"
+                )
+            )
+        for feature_id, name in features:
+            index.setdefault(name.lower(), []).append((name, feature_id))
+        feature_name_index_cache.set(
+            cache_key, index, timeout=settings.CACHE_FEATURE_NAME_INDEX_SECONDS
+        )
+
+    return index
+
+
+def get_feature_id_by_name(
+    environment: Environment, feature_name: str, case_sensitive: bool = False
+) -> typing.Optional[int]:
+    """
+    Get the id of the feature with the given name in the environment's project.
+    Names are only unique per project when case is taken into account, so when
+    matching case insensitively an exact match is preferred.
+    """
+    candidates = get_feature_name_index(environment).get(feature_name.lower(), [])
+
+    exact_match = next((id_ for name, id_ in candidates if name == feature_name), None)
+    if exact_match is not None or case_sensitive:
+        return exact_match
+
+    return candidates[0][1] if candidates else None
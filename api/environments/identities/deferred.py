@@ -0,0 +1,277 @@
+"""
+Create identities seen for the first time by the SDK endpoints in the background so
+that the first request for each identity doesn't need to write to the database.
+
+Each new identity has its id reserved from the identity table's sequence when it is
+first seen so that the flags returned to it (e.g. percentage splits and multivariate
+values, which depend on the id) don't change once it has been created. If another
+process creates the same identity with a different id first, the flags already
+returned using the reserved id may differ from those returned from then on. These
+conflicts are logged and counted by the writer.
+"""
+import logging
+import threading
+import typing
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.db.models import QuerySet
+
+from environments.identities.models import Identity
+from environments.models import Environment
+from util.util import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+IdentityKey = typing.Tuple[int, str]
+
+
+class DeferredIdentityWriter:
+    """
+    Holds the identities that are yet to be created and creates them from a background
+    thread every `flush_interval` seconds (or as soon as there are `batch_size` of
+    them), ignoring any that have been created in the meantime.
+    """
+
+    def __init__(self, flush_interval: float, batch_size: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.conflict_count = 0
+
+        self._pending: typing.Dict[IdentityKey, Identity] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = PeriodicFlusher(
+            self.flush, flush_interval, name="deferred-identity-writer"
+        )
+
+    def add(self, identity: Identity) -> Identity:
+        """
+        Add the identity to be created, unless an identity with the same identifier
+        is already waiting to be created, in which case that identity is returned.
+        """
+        with self._lock:
+            identity = self._pending.setdefault(_get_key(identity), identity)
+            pending_count = len(self._pending)
+
+        self._flusher.start()
+        if pending_count >= self.batch_size:
+            self._flusher.wake()
+
+        return identity
+
+    def get_pending(
+        self, environment: Environment, identifier: str
+    ) -> typing.Optional[Identity]:
+        with self._lock:
+            return self._pending.get((environment.id, identifier))
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                identities = list(self._pending.values())
+
+            if not identities:
+                return
+
+            failed_identities = _create_identities(identities, self.batch_size)
+            self._record_conflicts(identities, failed_identities)
+
+            # only forget the identities once they can be read from the database
+            with self._lock:
+                for identity in identities:
+                    self._pending.pop(_get_key(identity), None)
+
+    def _record_conflicts(
+        self,
+        identities: typing.List[Identity],
+        failed_identities: typing.List[Identity],
+    ) -> None:
+        # the identities that weren't created with their reserved ids have been
+        # created by another process (or request) in the meantime
+        reserved_ids = {
+            identity.id
+            for identity in identities
+            if identity.id is not None and identity not in failed_identities
+        }
+        created_ids = set(
+            Identity.objects.filter(id__in=reserved_ids).values_list("id", flat=True)
+        )
+        conflicting_ids = reserved_ids - created_ids
+        if not conflicting_ids:
+            return
+
+        with self._lock:
+            self.conflict_count += len(conflicting_ids)
+        for identity in identities:
+            if identity.id in conflicting_ids:
+                logger.warning(
+                    "Identity '%s' in environment %d was created with a different id "
+                    "to the one reserved for it (%d), its flags may have changed.",
+                    identity.identifier,
+                    identity.environment_id,
+                    identity.id,
+                )
+
+
+def _get_key(identity: Identity) -> IdentityKey:
+    return identity.environment_id, identity.identifier
+
+
+def _create_identities(
+    identities: typing.List[Identity], batch_size: int
+) -> typing.List[Identity]:
+    """
+    :return: the identities that couldn't be created
+    """
+    try:
+        Identity.objects.bulk_create(
+            identities, batch_size=batch_size, ignore_conflicts=True
+        )
+        return []
+    except IntegrityError:
+        pass
+
+    # e.g. the environment of one of the identities has been deleted, create the rest
+    # of them one at a time instead
+    failed_identities = []
+    for identity in identities:
+        try:
+            Identity.objects.bulk_create([identity], ignore_conflicts=True)
+        except IntegrityError:
+            logger.warning(
+                "Unable to create identity '%s' in environment %d.",
+                identity.identifier,
+                identity.environment_id,
+            )
+            failed_identities.append(identity)
+    return failed_identities
+
+
+def get_identity_writer() -> DeferredIdentityWriter:
+    return _get_identity_writer(
+        settings.DEFERRED_IDENTITY_CREATION_INTERVAL_SECONDS,
+        settings.DEFERRED_IDENTITY_CREATION_BATCH_SIZE,
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_identity_writer(flush_interval: float, batch_size: int):
+    return DeferredIdentityWriter(flush_interval, batch_size)
+
+
+def get_or_defer_identity(
+    environment: Environment,
+    identifier: str,
+    queryset: typing.Optional[QuerySet] = None,
+) -> Identity:
+    """
+    Get the identity with the given identifier. If it doesn't exist, return an
+    unsaved identity (with the id it will be created with), which has no overrides or
+    traits, and create it in the background.
+    """
+    writer = get_identity_writer()
+    identity = writer.get_pending(environment, identifier)
+    if identity is not None:
+        return identity
+
+    queryset = Identity.objects.all() if queryset is None else queryset
+    identity = queryset.filter(environment=environment, identifier=identifier).first()
+    if identity is not None:
+        return identity
+
+    identity_id = _reserve_identity_id()
+    if identity_id is None:
+        identity, _ = queryset.get_or_create(
+            environment=environment, identifier=identifier
+        )
+        return identity
+
+    return writer.add(
+        Identity(id=identity_id, environment=environment, identifier=identifier)
+    )
+
+
+def get_or_create_identity(
+    environment: Environment, identifier: str
+) -> typing.Tuple[Identity, bool]:
+    """
+    Get or create the identity immediately, e.g. to store traits for it, using the
+    id reserved for it if it's waiting to be created by the background writer.
+    """
+    pending_identity = get_identity_writer().get_pending(environment, identifier)
+    return Identity.objects.get_or_create(
+        environment=environment,
+        identifier=identifier,
+        defaults={"id": pending_identity.id} if pending_identity else {},
+    )
+
+
+def get_or_create_identities(
+    environment: Environment,
+    identifiers: typing.Iterable[str],
+    create: typing.Optional[typing.Container[str]] = None,
+) -> typing.Tuple[typing.Dict[str, Identity], typing.Dict[str, Identity]]:
+    """
+    Get or create the identities with the given identifiers using a fixed number of
+    queries, like get_or_create_identity.
+
+    :param create: the identifiers to create if they don't exist (all of them by
+        default)
+    :return: the existing and new identities, keyed on identifier
+    """
+    identifiers = list(identifiers)
+    existing_identities = {
+        identity.identifier: identity
+        for identity in Identity.objects.filter(
+            environment=environment, identifier__in=identifiers
+        )
+    }
+
+    writer = get_identity_writer()
+    identities_to_create = []
+    for identifier in identifiers:
+        if identifier in existing_identities or (
+            create is not None and identifier not in create
+        ):
+            continue
+        pending_identity = writer.get_pending(environment, identifier)
+        identities_to_create.append(
+            Identity(
+                id=pending_identity.id if pending_identity else None,
+                identifier=identifier,
+                environment=environment,
+            )
+        )
+
+    new_identities = {}
+    if identities_to_create:
+        # ignore conflicts in case the identities are created by another request in
+        # the meantime, then fetch them again to get their ids
+        Identity.objects.bulk_create(identities_to_create, ignore_conflicts=True)
+        new_identities = {
+            identity.identifier: identity
+            for identity in Identity.objects.filter(
+                environment=environment,
+                identifier__in=[i.identifier for i in identities_to_create],
+            )
+        }
+
+    for identity in (*existing_identities.values(), *new_identities.values()):
+        # avoid looking up the environment again for every identity
+        identity.environment = environment
+
+    return existing_identities, new_identities
+
+
+def _reserve_identity_id() -> typing.Optional[int]:
+    if connection.vendor != "postgresql":
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id'))",
+            [Identity._meta.db_table],
+        )
+        return cursor.fetchone()[0]
@@ -1,6 +1,13 @@
 import hashlib
 import typing
 
+import numpy
+
+# md5 hashes are reduced modulo this to get a percentage
+HASH_MODULUS = 9999
+# 2 ** 64 modulo HASH_MODULUS, to reduce each hash from its two 64 bit halves
+_HIGH_WORD_FACTOR = numpy.uint64(2**64 % HASH_MODULUS)
+
 
 def get_hashed_percentage_for_object_ids(
     object_ids: typing.Iterable[int], iterations: int = 1
@@ -15,10 +22,10 @@ def get_hashed_percentage_for_object_ids(
     :return: (float) number between 0 (inclusive) and 1 (exclusive)
     """
 
-    to_hash = ",".join(str(id_) for id_ in list(object_ids) * iterations)
+    to_hash = ",".join(map(str, list(object_ids) * iterations))
     hashed_value = hashlib.md5(to_hash.encode("utf-8"))
     hashed_value_as_int = int(hashed_value.hexdigest(), base=16)
-    value = (hashed_value_as_int % 9999) / 9998
+    value = (hashed_value_as_int % HASH_MODULUS) / (HASH_MODULUS - 1)
 
     if value == 1:
         # since we want a number between 0 (inclusive) and 1 (exclusive), in the
@@ -29,3 +36,41 @@ def get_hashed_percentage_for_object_ids(
         )
 
     return value
+
+
+def get_hashed_percentages_for_object_ids(
+    object_ids_list: typing.Iterable[typing.Sequence[int]],
+) -> typing.List[float]:
+    """
+    Batch version of get_hashed_percentage_for_object_ids, e.g. to get the value for
+    many (segment id, identity id) pairs at once. Each list of ids is still hashed on
+    its own but the hashes are reduced to percentages with NumPy, giving values
+    identical to calling get_hashed_percentage_for_object_ids for each list of ids.
+
+    :param object_ids_list: iterable of lists of object ids to calculate the hash for
+    :return: list of floats between 0 (inclusive) and 1 (exclusive), in the same
+        order as object_ids_list
+    """
+    object_ids_list = [list(object_ids) for object_ids in object_ids_list]
+    digests = b"".join(
+        hashlib.md5(",".join(map(str, object_ids)).encode("utf-8")).digest()
+        for object_ids in object_ids_list
+    )
+
+    # each (128 bit) hash as its big endian high and low 64 bit halves, so that it
+    # can be reduced without integers wider than 64 bits
+    words = numpy.frombuffer(digests, dtype=">u8").reshape(-1, 2) % numpy.uint64(
+        HASH_MODULUS
+    )
+    remainders = (words[:, 0] * _HIGH_WORD_FACTOR + words[:, 1]) % numpy.uint64(
+        HASH_MODULUS
+    )
+    values = remainders / (HASH_MODULUS - 1)
+
+    # see get_hashed_percentage_for_object_ids
+    for index in numpy.flatnonzero(remainders == HASH_MODULUS - 1):
+        values[index] = get_hashed_percentage_for_object_ids(
+            object_ids_list[index], iterations=2
+        )
+
+    return values.tolist()
@@ -1,13 +1,25 @@
 import typing
 
+from django.conf import settings
 from django.db import models
 from django.db.models import Prefetch, Q
 
 from environments.dynamodb import DynamoIdentityWrapper
 from environments.identities.traits.models import Trait
 from environments.models import Environment
+from environments.snapshot import (
+    EnvironmentSnapshot,
+    get_environment_snapshot,
+    get_feature_states_queryset,
+)
 from features.models import FeatureState
 from features.multivariate.models import MultivariateFeatureStateValue
+from segments.evaluator import (
+    get_compiled_segments_from_cache,
+    get_matching_segments,
+    get_matching_segments_in_bulk,
+    get_traits_by_key,
+)
 
 
 class Identity(models.Model):
@@ -40,6 +52,157 @@ class Identity(models.Model):
         :return: (list) flags for an identity with the correct values based on
             identity / segment priorities
         """
+        if settings.ENABLE_ENVIRONMENT_SNAPSHOTS:
+            identity_flags = self._get_feature_states_from_snapshot(traits=traits)
+        else:
+            identity_flags = self._get_feature_states_from_db(traits=traits)
+
+        if self.environment.project.hide_disabled_flags:
+            # filter out any flags that are disabled if configured on the project
+            # Note: done here instead of the DB because of CH1245
+            return [value for value in identity_flags.values() if value.enabled]
+
+        return list(identity_flags.values())
+
+    @classmethod
+    def get_all_feature_states_in_bulk(
+        cls,
+        environment: Environment,
+        traits_by_identity: typing.Mapping["Identity", typing.Iterable[Trait]],
+    ) -> typing.Dict[int, typing.List[FeatureState]]:
+        """
+        Get all feature states for many identities in the same environment, keyed on
+        identity id. Each list of flags is the same as would be returned by calling
+        get_all_feature_states on the identity with the given traits but the
+        identity overrides are fetched in a single query and segments are only
+        evaluated once for each distinct set of traits.
+        """
+        if settings.ENABLE_ENVIRONMENT_SNAPSHOTS:
+            snapshot = get_environment_snapshot(environment)
+        else:
+            # build a snapshot just for this request so that we still only need a
+            # fixed number of queries regardless of the number of identities
+            snapshot = EnvironmentSnapshot.build(environment, version=None)
+
+        segments_by_identity_id = get_matching_segments_in_bulk(
+            snapshot.segments,
+            {identity.id: traits for identity, traits in traits_by_identity.items()},
+        )
+
+        identity_overrides = {}
+        for feature_state in get_feature_states_queryset().filter(
+            environment=environment, identity__in=list(traits_by_identity)
+        ):
+            identity_overrides.setdefault(feature_state.identity_id, []).append(
+                feature_state
+            )
+
+        hide_disabled_flags = environment.project.hide_disabled_flags
+        all_feature_states = {}
+        for identity in traits_by_identity:
+            identity_flags = snapshot.get_identity_feature_states(
+                {segment.id for segment in segments_by_identity_id[identity.id]},
+                identity_overrides.get(identity.id, []),
+            )
+            all_feature_states[identity.id] = [
+                feature_state
+                for feature_state in identity_flags.values()
+                if feature_state.enabled or not hide_disabled_flags
+            ]
+
+        return all_feature_states
+
+    def get_feature_state(
+        self, feature_id: int, traits: typing.List[Trait] = None
+    ) -> typing.Optional[FeatureState]:
+        """
+        Get the feature state for a single feature for an identity, with the same
+        priorities as get_all_feature_states, only evaluating the segments which
+        override the given feature.
+
+        :return: the feature state or None if the feature has no feature state in
+            the environment (or it is disabled and the project hides disabled flags)
+        """
+        traits = self.identity_traits.all() if traits is None else traits
+        if settings.ENABLE_ENVIRONMENT_SNAPSHOTS:
+            feature_state = get_environment_snapshot(
+                self.environment
+            ).get_identity_feature_state(
+                feature_id,
+                identity_id=self.id,
+                traits=traits,
+                identity_override=get_feature_states_queryset()
+                .filter(
+                    environment=self.environment, identity=self, feature_id=feature_id
+                )
+                .first(),
+            )
+        else:
+            feature_state = self._get_feature_state_from_db(feature_id, traits)
+
+        if (
+            feature_state
+            and self.environment.project.hide_disabled_flags
+            and not feature_state.enabled
+        ):
+            return None
+
+        return feature_state
+
+    def _get_feature_state_from_db(
+        self, feature_id: int, traits: typing.Iterable[Trait]
+    ) -> typing.Optional[FeatureState]:
+        environment_feature_state = None
+        segment_overrides = []
+        for feature_state in get_feature_states_queryset().filter(
+            Q(identity=self) | Q(identity__isnull=True),
+            environment=self.environment,
+            feature_id=feature_id,
+        ):
+            if feature_state.identity_id:
+                return feature_state
+            elif feature_state.feature_segment_id:
+                segment_overrides.append(feature_state)
+            else:
+                environment_feature_state = feature_state
+
+        if segment_overrides:
+            compiled_segments = {
+                compiled_segment.id: compiled_segment
+                for compiled_segment in get_compiled_segments_from_cache(
+                    self.environment.project
+                )
+            }
+            traits_by_key = get_traits_by_key(traits)
+            # priority 0 is the highest priority for a feature segment
+            for segment_override in sorted(
+                segment_overrides, key=lambda fs: fs.feature_segment.priority
+            ):
+                segment = compiled_segments.get(
+                    segment_override.feature_segment.segment_id
+                )
+                if segment and segment.does_identity_match(self.id, traits_by_key):
+                    return segment_override
+
+        return environment_feature_state
+
+    def _get_feature_states_from_snapshot(
+        self, traits: typing.List[Trait] = None
+    ) -> typing.Dict[int, FeatureState]:
+        snapshot = get_environment_snapshot(self.environment)
+
+        traits = self.identity_traits.all() if traits is None else traits
+        segment_ids = {segment.id for segment in snapshot.get_segments(self.id, traits)}
+
+        # identity overrides are the only feature states that aren't in the snapshot
+        identity_overrides = get_feature_states_queryset().filter(
+            environment=self.environment, identity=self
+        )
+        return snapshot.get_identity_feature_states(segment_ids, identity_overrides)
+
+    def _get_feature_states_from_db(
+        self, traits: typing.List[Trait] = None
+    ) -> typing.Dict[int, FeatureState]:
         segments = self.get_segments(traits=traits)
 
         # define sub queries
@@ -89,22 +252,15 @@ class Identity(models.Model):
                 if flag > identity_flags[flag.feature_id]:
                     identity_flags[flag.feature_id] = flag
 
-        if self.environment.project.hide_disabled_flags:
-            # filter out any flags that are disabled if configured on the project
-            # Note: done here instead of the DB because of CH1245
-            return [value for value in identity_flags.values() if value.enabled]
-
-        return list(identity_flags.values())
+        return identity_flags
 
     def get_segments(self, traits: typing.List[Trait] = None):
-        segments = []
         traits = self.identity_traits.all() if traits is None else traits
-
-        for segment in self.environment.project.get_segments_from_cache():
-            if segment.does_identity_match(self, traits=traits):
-                segments.append(segment)
-
-        return segments
+        return get_matching_segments(
+            get_compiled_segments_from_cache(self.environment.project),
+            identity_id=self.id,
+            traits=traits,
+        )
 
     def get_all_user_traits(self):
         # this is pointless, we should probably replace all uses with the below code
@@ -145,38 +301,6 @@ class Identity(models.Model):
         Return the full list of traits for the given identity after these changes.
 
         :param trait_data_items: list of dictionaries validated by TraitSerializerFull
-        :return: queryset of updated trait models
+        :return: list of updated trait models
         """
-        current_traits = self.get_all_user_traits()
-
-        keys_to_delete = []
-
-        for trait_data_item in trait_data_items:
-            trait_key = trait_data_item["trait_key"]
-            trait_value = trait_data_item["trait_value"]
-
-            if trait_value is None:
-                # build a list of trait keys to delete having been nulled by the
-                # input data
-                keys_to_delete.append(trait_key)
-                continue
-
-            trait_value_data = Trait.generate_trait_value_data(trait_value)
-
-            if current_traits.filter(trait_key=trait_key).exists():
-                current_trait = current_traits.get(trait_key=trait_key)
-                for attr, value in trait_value_data.items():
-                    setattr(current_trait, attr, value)
-                current_trait.save()
-            else:
-                # use update_or_create to avoid race condition
-                kwargs = {"trait_key": trait_key, "identity": self}
-                Trait.objects.update_or_create(defaults=trait_value_data, **kwargs)
-
-        # delete the traits that had their keys set to None
-        if keys_to_delete:
-            current_traits.filter(trait_key__in=keys_to_delete).delete()
-
-        # return the full list of traits for this identity by refreshing from the db
-        # TODO: handle this in the above logic to avoid a second hit to the DB
-        return self.get_all_user_traits()
+        return Trait.objects.upsert_traits({self: trait_data_items})[self.id]
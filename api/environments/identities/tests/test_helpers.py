@@ -3,6 +3,7 @@ from unittest import mock
 
 from environments.identities.helpers import (
     get_hashed_percentage_for_object_ids,
+    get_hashed_percentages_for_object_ids,
 )
 
 
@@ -122,3 +123,51 @@ def test_get_hashed_percentage_does_not_return_1(mock_hashlib):
     # the second call, with a string (in bytes) that contains each object id twice
     expected_bytes_2 = ",".join(str(id_) for id_ in object_ids * 2).encode("utf-8")
     assert call_list[1][0][0] == expected_bytes_2
+
+
+def test_get_hashed_percentages_for_object_ids_matches_scalar_function():
+    # Given
+    object_ids_list = [
+        [segment_id, identity_id]
+        for segment_id, identity_id in itertools.product(range(1, 20), range(1, 200))
+    ]
+    # and some ids too large to fit in 64 bits when joined
+    object_ids_list += [[2**40 + i, 2**62 + i, i] for i in range(100)]
+
+    # When
+    values = get_hashed_percentages_for_object_ids(object_ids_list)
+
+    # Then
+    assert values == [
+        get_hashed_percentage_for_object_ids(object_ids)
+        for object_ids in object_ids_list
+    ]
+
+
+def test_get_hashed_percentages_for_object_ids_returns_empty_list_for_no_ids():
+    assert get_hashed_percentages_for_object_ids([]) == []
+
+
+@mock.patch("environments.identities.helpers.hashlib")
+def test_get_hashed_percentages_for_object_ids_does_not_return_1(mock_hashlib):
+    # Given
+    # a hash that is 9998 modulo 9999 (and hence gives a value of exactly 1) and,
+    # when the ids are repeated, a hash that gives a value of 0
+    mock_hash = mock.MagicMock()
+    mock_hashlib.md5.return_value = mock_hash
+    mock_hash.digest.side_effect = [
+        (2**64 * 9999 + 9998).to_bytes(16, "big"),
+        (1).to_bytes(16, "big"),
+    ]
+    mock_hash.hexdigest.return_value = "270f"
+
+    # When
+    values = get_hashed_percentages_for_object_ids([[12, 93], [1, 2]])
+
+    # Then
+    assert values == [0, 1 / 9998]
+    assert mock_hashlib.md5.call_args_list == [
+        mock.call(b"12,93"),
+        mock.call(b"1,2"),
+        mock.call(b"12,93,12,93"),
+    ]
@@ -0,0 +1,174 @@
+"""
+Buffer the increments made to counter traits (e.g. page views) by the increment
+value endpoint in memory and write them to the database from a background thread,
+as a single atomic update per flush, rather than one read-modify-write per request.
+
+The value returned for each request is the projected value of the trait, i.e. its
+value when it was last read by this process plus any increments that are yet to be
+written. Increments made by other processes are included once they have been
+flushed.
+"""
+import logging
+import threading
+import typing
+from functools import lru_cache
+
+from core.constants import INTEGER
+from django.conf import settings
+from rest_framework import exceptions
+
+from environments.identities.deferred import get_or_create_identity
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+from environments.models import Environment
+from util.util import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+CounterKey = typing.Tuple[int, str, str]
+
+
+class _Counter:
+    def __init__(self, trait: Trait):
+        self.trait_id = trait.id
+        self.identity_id = trait.identity_id
+        self.value = trait.integer_value or 0
+        self.pending = 0
+
+    @property
+    def projected_value(self) -> int:
+        return self.value + self.pending
+
+
+class TraitIncrementBuffer:
+    """
+    Holds the pending increments of each counter trait, keyed on environment,
+    identifier and trait key, and adds them to the traits every `flush_interval`
+    seconds.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+
+        self._counters: typing.Dict[CounterKey, _Counter] = {}
+        self._flush_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = PeriodicFlusher(
+            self.flush, flush_interval, name="trait-increment-buffer"
+        )
+
+    def increment(
+        self,
+        environment: Environment,
+        identifier: str,
+        trait_key: str,
+        increment_by: int,
+    ) -> Trait:
+        """
+        Add to the value of the trait, creating the identity and trait if they don't
+        exist, and return an unsaved trait holding its projected value.
+        """
+        key = (environment.id, identifier, trait_key)
+
+        while True:
+            with self._lock:
+                counter = self._counters.get(key)
+                if counter is not None:
+                    counter.pending += increment_by
+                    projected_value = counter.projected_value
+                    break
+                flush_count = self._flush_count
+
+            trait = get_or_create_counter_trait(environment, identifier, trait_key)
+
+            with self._lock:
+                # if a flush has forgotten a counter for the trait since it was read,
+                # the value read may not include the increments that it wrote
+                if key not in self._counters and self._flush_count == flush_count:
+                    counter = self._counters[key] = _Counter(trait)
+                    counter.pending += increment_by
+                    projected_value = counter.projected_value
+                    break
+
+        self._flusher.start()
+
+        return Trait(
+            id=counter.trait_id,
+            trait_key=trait_key,
+            value_type=INTEGER,
+            integer_value=projected_value,
+            identity=Identity(
+                id=counter.identity_id, identifier=identifier, environment=environment
+            ),
+        )
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                increments = {}
+                for counter in self._counters.values():
+                    if counter.pending:
+                        increments[counter.trait_id] = counter.pending
+                        counter.value += counter.pending
+                        counter.pending = 0
+
+            if not increments:
+                return
+
+            try:
+                values = Trait.objects.increment_integer_values(increments)
+            except Exception:
+                # put the increments back so that they are written by the next flush
+                with self._lock:
+                    for counter in self._counters.values():
+                        amount = increments.get(counter.trait_id, 0)
+                        counter.value -= amount
+                        counter.pending += amount
+                raise
+
+            with self._lock:
+                self._flush_count += 1
+                for key, counter in list(self._counters.items()):
+                    if (
+                        counter.trait_id in increments
+                        and counter.trait_id not in values
+                    ):
+                        logger.warning(
+                            "Unable to increment trait %d, it no longer exists or is "
+                            "no longer an integer.",
+                            counter.trait_id,
+                        )
+                    elif counter.pending:
+                        # pick up any increments made by other processes
+                        counter.value = values.get(counter.trait_id, counter.value)
+                        continue
+
+                    # forget counters that are no longer in use so that the buffer
+                    # doesn't grow without bound, they are read again if needed
+                    del self._counters[key]
+
+
+def get_or_create_counter_trait(
+    environment: Environment, identifier: str, trait_key: str
+) -> Trait:
+    identity, _ = get_or_create_identity(environment, identifier)
+    trait, _ = Trait.objects.get_or_create(
+        identity=identity,
+        trait_key=trait_key,
+        defaults={"value_type": INTEGER, "integer_value": 0},
+    )
+
+    if trait.value_type != INTEGER:
+        raise exceptions.ValidationError("Trait is not an integer.")
+
+    return trait
+
+
+def get_trait_increment_buffer() -> TraitIncrementBuffer:
+    return _get_trait_increment_buffer(settings.TRAIT_INCREMENTS_FLUSH_INTERVAL_SECONDS)
+
+
+@lru_cache(maxsize=None)
+def _get_trait_increment_buffer(flush_interval: float) -> TraitIncrementBuffer:
+    return TraitIncrementBuffer(flush_interval)
@@ -0,0 +1,179 @@
+import typing
+
+from core.constants import INTEGER
+from django.db import connections, router
+from django.db.models import Manager, Q
+from django.utils import timezone
+
+from environments.identities.traits.exceptions import TraitPersistenceError
+
+if typing.TYPE_CHECKING:
+    from environments.identities.models import Identity
+    from environments.identities.traits.models import Trait
+
+UPSERT_FIELDS = (
+    "identity",
+    "trait_key",
+    "value_type",
+    "boolean_value",
+    "integer_value",
+    "string_value",
+    "float_value",
+    "created_date",
+)
+UNIQUE_FIELDS = ("trait_key", "identity")
+
+
+class TraitManager(Manager):
+    def upsert_traits(
+        self,
+        trait_data_items_by_identity: typing.Mapping["Identity", typing.Iterable[dict]],
+    ) -> typing.Dict[int, typing.List["Trait"]]:
+        """
+        Create or update the traits of the given identities and delete any traits
+        with a value of None, using a constant number of queries regardless of the
+        number of identities or traits.
+
+        :param trait_data_items_by_identity: lists of dictionaries validated by
+            TraitSerializerFull (or similar), keyed on identity
+        :return: the full list of traits for each identity after these changes,
+            keyed on identity id
+        """
+        for identity in trait_data_items_by_identity:
+            if not identity.environment.project.organisation.persist_trait_data:
+                raise TraitPersistenceError(
+                    "Not possible to persist traits for this organisation."
+                )
+
+        identities_by_id = {
+            identity.id: identity for identity in trait_data_items_by_identity
+        }
+        traits = []
+        delete_query = Q()
+        for identity, trait_data_items in trait_data_items_by_identity.items():
+            # if a key is given more than once, the last value wins
+            trait_values = {
+                item["trait_key"]: item["trait_value"] for item in trait_data_items
+            }
+            keys_to_delete = [k for k, v in trait_values.items() if v is None]
+            if keys_to_delete:
+                delete_query |= Q(identity=identity, trait_key__in=keys_to_delete)
+
+            traits.extend(
+                self.model(
+                    identity=identity,
+                    trait_key=trait_key,
+                    **self.model.generate_trait_value_data(trait_value),
+                )
+                for trait_key, trait_value in trait_values.items()
+                if trait_value is not None
+            )
+
+        if delete_query:
+            self.filter(delete_query).delete()
+
+        identity_ids = list(identities_by_id)
+        if traits:
+            all_traits = self._upsert(traits, identity_ids)
+        else:
+            all_traits = self.filter(identity_id__in=identity_ids)
+
+        traits_by_identity_id = {identity_id: [] for identity_id in identity_ids}
+        for trait in all_traits:
+            trait.identity = identities_by_id[trait.identity_id]
+            traits_by_identity_id[trait.identity_id].append(trait)
+        return traits_by_identity_id
+
+    def _upsert(
+        self, traits: typing.List["Trait"], identity_ids: typing.List[int]
+    ) -> typing.List["Trait"]:
+        """
+        Insert the traits, updating the value of those that already exist, and return
+        them along with the other existing traits of the given identities in the
+        same statement.
+        """
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+
+        opts = self.model._meta
+        table = quote_name(opts.db_table)
+        upsert_fields = [opts.get_field(name) for name in UPSERT_FIELDS]
+        unique_columns = [opts.get_field(name).column for name in UNIQUE_FIELDS]
+        returned_fields = opts.concrete_fields
+
+        insert_columns = ", ".join(quote_name(f.column) for f in upsert_fields)
+        returned_columns = ", ".join(quote_name(f.column) for f in returned_fields)
+        update_columns = ", ".join(
+            f"{quote_name(f.column)} = EXCLUDED.{quote_name(f.column)}"
+            for f in upsert_fields
+            if f.column not in unique_columns and f.name != "created_date"
+        )
+        row_placeholder = f"({', '.join(['%s'] * len(upsert_fields))})"
+
+        now = timezone.now()
+        params = []
+        for trait in traits:
+            trait.created_date = now
+            params.extend(
+                f.get_db_prep_save(getattr(trait, f.attname), connection)
+                for f in upsert_fields
+            )
+        params.append(identity_ids)
+
+        sql = f"""
+            WITH upserted AS (
+                INSERT INTO {table} ({insert_columns})
+                VALUES {", ".join([row_placeholder] * len(traits))}
+                ON CONFLICT ({", ".join(quote_name(c) for c in unique_columns)})
+                DO UPDATE SET {update_columns}
+                RETURNING {returned_columns}
+            )
+            SELECT {returned_columns} FROM upserted
+            UNION ALL
+            SELECT {returned_columns} FROM {table} AS existing
+            WHERE existing.identity_id = ANY(%s) AND NOT EXISTS (
+                SELECT 1 FROM upserted
+                WHERE upserted.identity_id = existing.identity_id
+                AND upserted.trait_key = existing.trait_key
+            )
+            ORDER BY id
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        field_names = [f.attname for f in returned_fields]
+        return [self.model.from_db(db, field_names, row) for row in rows]
+
+    def increment_integer_values(
+        self, increments: typing.Mapping[int, int]
+    ) -> typing.Dict[int, int]:
+        """
+        Atomically add to the values of the given integer traits in a single query.
+
+        :param increments: the amount to add to each trait, keyed on trait id
+        :return: the new value of each trait, keyed on trait id (traits that no
+            longer exist or are no longer integers are left out)
+        """
+        if not increments:
+            return {}
+
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        rows = ", ".join(["(%s, %s)"] * len(increments))
+
+        sql = f"""
+            UPDATE {table} AS trait
+            SET integer_value = COALESCE(trait.integer_value, 0) + increments.amount
+            FROM (VALUES {rows}) AS increments (id, amount)
+            WHERE trait.id = increments.id AND trait.value_type = %s
+            RETURNING trait.id, trait.integer_value
+        """
+        params = [value for item in increments.items() for value in item]
+        params.append(INTEGER)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return dict(cursor.fetchall())
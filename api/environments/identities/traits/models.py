@@ -5,6 +5,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 
 from environments.identities.traits.exceptions import TraitPersistenceError
+from environments.identities.traits.managers import TraitManager
 
 
 class Trait(models.Model):
@@ -29,6 +30,8 @@ class Trait(models.Model):
 
     created_date = models.DateTimeField("DateCreated", auto_now_add=True)
 
+    objects = TraitManager()
+
     class Meta:
         verbose_name_plural = "User Traits"
         unique_together = ("trait_key", "identity")
@@ -98,7 +101,7 @@ class Trait(models.Model):
         return "Identity: %s - %s" % (self.identity.identifier, self.trait_key)
 
     def save(self, *args, **kwargs):
-        if not self.identity.environment.project.organisation.persist_trait_data:
+        if not self._does_organisation_persist_trait_data():
             # this is a final line of defense to ensure that traits are never saved
             # for organisations which have the flag set to not persist trait data
             raise TraitPersistenceError(
@@ -106,3 +109,24 @@ class Trait(models.Model):
             )
 
         return super(Trait, self).save(*args, **kwargs)
+
+    def _does_organisation_persist_trait_data(self) -> bool:
+        # use the organisation if it has already been loaded, rather than lazily
+        # loading the identity, environment, project and organisation one at a time
+        obj = self
+        for relation in ("identity", "environment", "project", "organisation"):
+            if not obj._meta.get_field(relation).is_cached(obj):
+                break
+            obj = getattr(obj, relation)
+        else:
+            return obj.persist_trait_data
+
+        identity_model = self._meta.get_field("identity").related_model
+        return (
+            identity_model.objects.filter(id=self.identity_id)
+            .values_list(
+                "environment__project__organisation__persist_trait_data", flat=True
+            )
+            .first()
+            or False
+        )
@@ -1,9 +1,12 @@
-from core.constants import INTEGER
-from rest_framework import exceptions, serializers
+from django.conf import settings
+from rest_framework import serializers
 
-from environments.identities.models import Identity
 from environments.identities.serializers import IdentitySerializer
 from environments.identities.traits.fields import TraitValueField
+from environments.identities.traits.increments import (
+    get_or_create_counter_trait,
+    get_trait_increment_buffer,
+)
 from environments.identities.traits.models import Trait
 
 
@@ -43,30 +46,24 @@ class IncrementTraitValueSerializer(serializers.Serializer):
         }
 
     def create(self, validated_data):
-        trait, _ = Trait.objects.get_or_create(
-            **self._build_query_data(validated_data),
-            defaults=self._build_default_data(),
-        )
-
-        if trait.value_type != INTEGER:
-            raise exceptions.ValidationError("Trait is not an integer.")
-
-        trait.integer_value += validated_data.get("increment_by")
-        trait.save()
+        environment = self.context.get("request").environment
+        identifier = validated_data.get("identifier")
+        trait_key = validated_data.get("trait_key")
+        increment_by = validated_data.get("increment_by")
+
+        if settings.BUFFER_TRAIT_INCREMENTS:
+            return get_trait_increment_buffer().increment(
+                environment, identifier, trait_key, increment_by
+            )
+
+        trait = get_or_create_counter_trait(environment, identifier, trait_key)
+
+        # add to the value in the database rather than saving the value read above
+        # so that concurrent increments aren't lost
+        values = Trait.objects.increment_integer_values({trait.id: increment_by})
+        trait.integer_value = values.get(trait.id, trait.integer_value + increment_by)
         return trait
 
-    def _build_query_data(self, validated_data):
-        identity_data = {
-            "identifier": validated_data.get("identifier"),
-            "environment": self.context.get("request").environment,
-        }
-        identity, _ = Identity.objects.get_or_create(**identity_data)
-
-        return {"trait_key": validated_data.get("trait_key"), "identity": identity}
-
-    def _build_default_data(self):
-        return {"value_type": INTEGER, "integer_value": 0}
-
 
 class TraitKeysSerializer(serializers.Serializer):
     keys = serializers.ListSerializer(child=serializers.CharField())
@@ -1,6 +1,5 @@
 import coreapi
 from django.conf import settings
-from django.db.models import Q
 from drf_yasg2 import openapi
 from drf_yasg2.utils import swagger_auto_schema
 from rest_framework import mixins, status, viewsets
@@ -29,7 +28,6 @@ from environments.sdk.serializers import (
     SDKBulkCreateUpdateTraitSerializer,
     SDKCreateUpdateTraitSerializer,
 )
-from environments.views import logger
 from util.views import SDKAPIView
 
 
@@ -291,36 +289,13 @@ class SDKTraits(mixins.CreateModelMixin, viewsets.GenericViewSet):
     @swagger_auto_schema(request_body=SDKCreateUpdateTraitSerializer(many=True))
     @action(detail=False, methods=["PUT"], url_path="bulk")
     def bulk_create(self, request):
-        try:
-            # endpoint allows users to delete existing traits by sending null values
-            # for the trait value so we need to filter those out here
-            traits = []
-            delete_filter_query = Q()
-
-            for trait in request.data:
-                if trait.get("trait_value") is None:
-                    delete_filter_query = delete_filter_query | Q(
-                        trait_key=trait.get("trait_key"),
-                        identity__identifier=trait["identity"]["identifier"],
-                        identity__environment=request.environment,
-                    )
-                else:
-                    traits.append(trait)
-
-            if delete_filter_query:
-                Trait.objects.filter(delete_filter_query).delete()
-
-            serializer = self.get_serializer(data=traits, many=True)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-
-            if settings.EDGE_API_URL:
-                forward_trait_requests(request, request.environment.project.id)
-
-            return Response(serializer.data, status=200)
-
-        except (TypeError, AttributeError) as excinfo:
-            logger.error("Invalid request data: %s" % str(excinfo))
-            return Response(
-                {"detail": "Invalid request data"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        # endpoint allows users to delete existing traits by sending null values
+        # for the trait value
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        if settings.EDGE_API_URL:
+            forward_trait_requests(request, request.environment.project.id)
+
+        return Response(serializer.data, status=200)
@@ -12,7 +12,12 @@ from rest_framework.response import Response
 from rest_framework.schemas import AutoSchema
 
 from app.pagination import CustomPagination, EdgeIdentityPagination
-from edge_api.identities.edge_request_forwarder import forward_identity_request
+from edge_api.identities.edge_request_forwarder import (
+    forward_identity_request,
+    forward_identity_requests,
+)
+from environments.feature_index import get_feature_id_by_name
+from environments.identities.deferred import get_or_defer_identity
 from environments.identities.models import Identity
 from environments.identities.serializers import (
     EdgeIdentitySerializer,
@@ -219,18 +224,22 @@ class SDKIdentities(SDKAPIView):
                 {"detail": "Missing identifier"}
             )  # TODO: add 400 status - will this break the clients?
 
-        identity, _ = (
-            Identity.objects.select_related(
-                "environment",
-                "environment__project",
-                *[
-                    f"environment__{integration['relation_name']}"
-                    for integration in IDENTITY_INTEGRATIONS
-                ],
+        queryset = Identity.objects.select_related(
+            "environment",
+            "environment__project",
+            *[
+                f"environment__{integration['relation_name']}"
+                for integration in IDENTITY_INTEGRATIONS
+            ],
+        ).prefetch_related("identity_traits")
+        if settings.DEFER_IDENTITY_CREATION:
+            identity = get_or_defer_identity(
+                request.environment, identifier, queryset=queryset
+            )
+        else:
+            identity, _ = queryset.get_or_create(
+                identifier=identifier, environment=request.environment
             )
-            .prefetch_related("identity_traits")
-            .get_or_create(identifier=identifier, environment=request.environment)
-        )
         if settings.EDGE_API_URL:
             forward_identity_request(request, request.environment.project.id)
 
@@ -265,12 +274,15 @@ class SDKIdentities(SDKAPIView):
         return Response(response_serializer.data)
 
     def _get_single_feature_state_response(self, identity, feature_name):
-        for feature_state in identity.get_all_feature_states():
-            if feature_state.feature.name == feature_name:
-                serializer = FeatureStateSerializerFull(
-                    feature_state, context={"identity": identity}
-                )
-                return Response(data=serializer.data, status=status.HTTP_200_OK)
+        feature_id = get_feature_id_by_name(
+            identity.environment, feature_name, case_sensitive=True
+        )
+        feature_state = identity.get_feature_state(feature_id) if feature_id else None
+        if feature_state:
+            serializer = FeatureStateSerializerFull(
+                feature_state, context={"identity": identity}
+            )
+            return Response(data=serializer.data, status=status.HTTP_200_OK)
 
         return Response(
             {"detail": "Given feature not found"}, status=status.HTTP_404_NOT_FOUND
@@ -297,3 +309,32 @@ class SDKIdentities(SDKAPIView):
         response = {"flags": serialized_flags.data, "traits": serialized_traits.data}
 
         return Response(data=response, status=status.HTTP_200_OK)
+
+
+class SDKIdentitiesBulk(SDKAPIView):
+    """
+    Identify many identities at once, optionally with traits. Each item in the
+    response matches the response that would be returned by POSTing the item
+    to /identities/, with the addition of the identifier.
+    """
+
+    serializer_class = IdentifyWithTraitsSerializer
+    pagination_class = None  # set here to ensure documentation is correct
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if hasattr(self.request, "environment"):
+            # only set it if the request has the attribute to ensure that the
+            # documentation works correctly still
+            context["environment"] = self.request.environment
+        return context
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        if settings.EDGE_API_URL:
+            forward_identity_requests(request, request.environment.project.id)
+
+        return Response(serializer.data)
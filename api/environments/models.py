@@ -8,7 +8,7 @@ from copy import deepcopy
 import boto3
 from django.conf import settings
 from django.core.cache import caches
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
@@ -62,13 +62,15 @@ class Environment(LifecycleModel):
     @hook(AFTER_CREATE)
     def create_feature_states(self):
         features = self.project.features.all()
-        for feature in features:
-            FeatureState.objects.create(
-                feature=feature,
-                environment=self,
-                identity=None,
-                enabled=feature.default_enabled,
-            )
+        # in a single transaction so that their webhooks are sent together
+        with transaction.atomic():
+            for feature in features:
+                FeatureState.objects.create(
+                    feature=feature,
+                    environment=self,
+                    identity=None,
+                    enabled=feature.default_enabled,
+                )
 
     def __str__(self):
         return "Project %s - Environment %s" % (self.project.name, self.name)
@@ -1,6 +1,13 @@
-from core.constants import BOOLEAN, FLOAT, INTEGER, STRING
+import typing
+
+from django.conf import settings
 from rest_framework import serializers
 
+from environments.identities.deferred import (
+    get_or_create_identities,
+    get_or_create_identity,
+    get_or_defer_identity,
+)
 from environments.identities.models import Identity
 from environments.identities.serializers import (
     IdentifierOnlyIdentitySerializer,
@@ -23,33 +30,89 @@ class SDKCreateUpdateTraitSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         identity = self._get_identity(validated_data["identity"]["identifier"])
-
         trait_key = validated_data["trait_key"]
-        trait_value = validated_data["trait_value"]["value"]
-        trait_value_type = validated_data["trait_value"]["type"]
 
-        value_key = Trait.get_trait_value_key_name(trait_value_type)
+        traits = Trait.objects.upsert_traits(
+            {
+                identity: [
+                    {
+                        "trait_key": trait_key,
+                        "trait_value": validated_data["trait_value"],
+                    }
+                ]
+            }
+        )[identity.id]
+        return next(trait for trait in traits if trait.trait_key == trait_key)
 
-        defaults = {
-            value_key: trait_value,
-            "value_type": trait_value_type
-            if trait_value_type in [FLOAT, INTEGER, BOOLEAN]
-            else STRING,
-        }
+    def _get_identity(self, identifier):
+        # when used with many=True, only get (or create) each identity once
+        identities = self.context.setdefault("identities", {})
+        if identifier not in identities:
+            identity, _ = get_or_create_identity(
+                self.context["environment"], identifier
+            )
+            identity.environment = self.context["environment"]
+            identities[identifier] = identity
+        return identities[identifier]
 
-        return Trait.objects.update_or_create(
-            identity=identity, trait_key=trait_key, defaults=defaults
-        )[0]
 
-    def _get_identity(self, identifier):
-        return Identity.objects.get_or_create(
-            identifier=identifier, environment=self.context["environment"]
-        )[0]
+class SDKBulkCreateUpdateTraitListSerializer(serializers.ListSerializer):
+    """
+    Create, update and delete (given a value of None) the traits of any number of
+    identities using a fixed number of queries.
+    """
+
+    def create(self, validated_data):
+        environment = self.context["environment"]
+
+        identifiers = []
+        trait_data_items_by_identifier = {}
+        for item in validated_data:
+            identifier = item["identity"]["identifier"]
+            if identifier not in trait_data_items_by_identifier:
+                identifiers.append(identifier)
+            trait_data_items_by_identifier.setdefault(identifier, []).append(
+                {"trait_key": item["trait_key"], "trait_value": item["trait_value"]}
+            )
+
+        # only create the identities that have traits to store
+        existing_identities, new_identities = get_or_create_identities(
+            environment,
+            identifiers,
+            create={
+                identifier
+                for identifier, trait_data_items in trait_data_items_by_identifier.items()
+                if any(item["trait_value"] is not None for item in trait_data_items)
+            },
+        )
+        identities = {**existing_identities, **new_identities}
+
+        traits_by_identity_id = Trait.objects.upsert_traits(
+            {
+                identities[identifier]: trait_data_items
+                for identifier, trait_data_items in trait_data_items_by_identifier.items()
+                if identifier in identities
+            }
+        )
+
+        traits = {
+            (trait.identity.identifier, trait.trait_key): trait
+            for identity_traits in traits_by_identity_id.values()
+            for trait in identity_traits
+        }
+        return [
+            traits[(item["identity"]["identifier"], item["trait_key"])]
+            for item in validated_data
+            if (item["identity"]["identifier"], item["trait_key"]) in traits
+        ]
 
 
 class SDKBulkCreateUpdateTraitSerializer(SDKCreateUpdateTraitSerializer):
     trait_value = TraitValueField(allow_null=True)
 
+    class Meta(SDKCreateUpdateTraitSerializer.Meta):
+        list_serializer_class = SDKBulkCreateUpdateTraitListSerializer
+
 
 class IdentitySerializerWithTraitsAndSegments(serializers.Serializer):
     def update(self, instance, validated_data):
@@ -63,22 +126,139 @@ class IdentitySerializerWithTraitsAndSegments(serializers.Serializer):
     segments = SegmentSerializerBasic(many=True)
 
 
+class BulkIdentifyWithTraitsSerializer(serializers.ListSerializer):
+    """
+    Identify many identities in one go with the same semantics as
+    IdentifyWithTraitsSerializer but using a fixed number of queries regardless of
+    the number of identities.
+    """
+
+    max_identities = 100
+
+    def validate(self, attrs):
+        if len(attrs) > self.max_identities:
+            raise serializers.ValidationError(
+                f"Cannot identify more than {self.max_identities} identities at once."
+            )
+
+        identifiers = [item["identifier"] for item in attrs]
+        if len(set(identifiers)) != len(identifiers):
+            raise serializers.ValidationError("Identifiers must be unique.")
+
+        return attrs
+
+    def create(self, validated_data):
+        environment = self.context["environment"]
+        persist_trait_data = environment.project.organisation.persist_trait_data
+
+        existing_identities, new_identities = get_or_create_identities(
+            environment, [item["identifier"] for item in validated_data]
+        )
+
+        traits_by_identity = {}
+        if persist_trait_data:
+            traits_by_identity.update(
+                self._update_traits(
+                    {
+                        existing_identities[item["identifier"]]: item.get("traits", [])
+                        for item in validated_data
+                        if item["identifier"] in existing_identities
+                    }
+                )
+            )
+
+        for item in validated_data:
+            identifier = item["identifier"]
+            if persist_trait_data and identifier in existing_identities:
+                # traits have already been updated above
+                continue
+
+            identity = new_identities.get(identifier) or existing_identities[identifier]
+            traits_by_identity[identity] = identity.generate_traits(
+                item.get("traits", []), persist=False
+            )
+
+        if persist_trait_data:
+            Trait.objects.bulk_create(
+                trait
+                for identity, traits in traits_by_identity.items()
+                if identity.identifier in new_identities
+                for trait in traits
+            )
+
+        flags_by_identity_id = Identity.get_all_feature_states_in_bulk(
+            environment, traits_by_identity
+        )
+
+        identities = {**existing_identities, **new_identities}
+        results = []
+        for item in validated_data:
+            identity = identities[item["identifier"]]
+            results.append(
+                {
+                    "identity": identity,
+                    "traits": traits_by_identity[identity],
+                    "flags": flags_by_identity_id[identity.id],
+                }
+            )
+        return results
+
+    def to_representation(self, data):
+        return [
+            {
+                "identifier": item["identity"].identifier,
+                **IdentifyWithTraitsSerializer(
+                    instance=item, context={"identity": item["identity"]}
+                ).data,
+            }
+            for item in data
+        ]
+
+    def _update_traits(
+        self, trait_data_items_by_identity: typing.Dict[Identity, typing.List[dict]]
+    ) -> typing.Dict[Identity, typing.List[Trait]]:
+        """
+        Equivalent of calling Identity.update_traits for each of the given
+        identities.
+        """
+        traits_by_identity_id = Trait.objects.upsert_traits(
+            trait_data_items_by_identity
+        )
+        return {
+            identity: traits_by_identity_id[identity.id]
+            for identity in trait_data_items_by_identity
+        }
+
+
 class IdentifyWithTraitsSerializer(serializers.Serializer):
     identifier = serializers.CharField(write_only=True, required=True)
     traits = TraitSerializerBasic(required=False, many=True)
     flags = FeatureStateSerializerFull(read_only=True, many=True)
 
+    class Meta:
+        list_serializer_class = BulkIdentifyWithTraitsSerializer
+
     def create(self, validated_data):
         """
         Create the identity with the associated traits
         (optionally store traits if flag set on org)
         """
         environment = self.context["environment"]
-        identity, created = Identity.objects.get_or_create(
-            identifier=validated_data["identifier"], environment=environment
-        )
+        identifier = validated_data["identifier"]
+        persist_trait_data = environment.project.organisation.persist_trait_data
+
+        if not settings.DEFER_IDENTITY_CREATION:
+            identity, created = Identity.objects.get_or_create(
+                identifier=identifier, environment=environment
+            )
+        elif persist_trait_data and validated_data.get("traits"):
+            # the identity must exist to store its traits
+            identity, created = get_or_create_identity(environment, identifier)
+        else:
+            identity = get_or_defer_identity(environment, identifier)
+            created = identity._state.adding
 
-        if not created and environment.project.organisation.persist_trait_data:
+        if not created and persist_trait_data:
             # if this is an update and we're persisting traits, then we need to
             # partially update any traits and return the full list
             return self.update(instance=identity, validated_data=validated_data)
@@ -86,7 +266,7 @@ class IdentifyWithTraitsSerializer(serializers.Serializer):
         # generate traits for the identity and store them if configured to do so
         trait_models = identity.generate_traits(
             validated_data.get("traits", []),
-            persist=environment.project.organisation.persist_trait_data,
+            persist=persist_trait_data,
         )
 
         return {
@@ -105,3 +285,11 @@ class IdentifyWithTraitsSerializer(serializers.Serializer):
             "traits": updated_traits,
             "flags": instance.get_all_feature_states(traits=updated_traits),
         }
+
+
+class EnvironmentDocumentDeltaQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(required=True, min_value=0)
+
+
+class EnvironmentUpdatesQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(required=False, min_value=0)
@@ -1,14 +1,32 @@
-from django.http import HttpRequest
-from flag_engine.django_transform.document_builders import (
-    build_environment_document,
-)
-from rest_framework.exceptions import NotFound
+import json
+import time
+import typing
+
+from django.conf import settings
+from django.http import HttpRequest, StreamingHttpResponse
+from rest_framework.exceptions import NotFound, Throttled
+from rest_framework.renderers import BaseRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
 from environments.authentication import EnvironmentKeyAuthentication
+from environments.documents import (
+    get_environment_document_delta,
+    get_environment_document_response,
+)
 from environments.models import Environment
 from environments.permissions.permissions import EnvironmentKeyPermissions
+from environments.sdk.serializers import (
+    EnvironmentDocumentDeltaQuerySerializer,
+    EnvironmentUpdatesQuerySerializer,
+)
+from environments.updates import (
+    get_environment_updates_broker,
+    get_waiter_slots,
+)
+from environments.versioning import get_environment_version
+from util.views import SDKAPIView
 
 
 class SDKEnvironmentAPIView(APIView):
@@ -19,10 +37,171 @@ class SDKEnvironmentAPIView(APIView):
 
     def get(self, request: HttpRequest) -> Response:
         try:
-            environment = Environment.objects.filter_for_document_builder(
-                api_key=request.environment.api_key
-            ).get()
+            return get_environment_document_response(request, request.environment)
         except Environment.DoesNotExist:
             raise NotFound("Environment does not exist for given key.")
 
-        return Response(build_environment_document(environment))
+
+class SDKEnvironmentDeltaAPIView(APIView):
+    """
+    Get the changes to the environment document since the given version, as
+    returned in the ETag of the environment document (or a previous delta).
+    """
+
+    permission_classes = (EnvironmentKeyPermissions,)
+
+    def get_authenticators(self):
+        return [EnvironmentKeyAuthentication(required_key_prefix="ser.")]
+
+    def get(self, request: HttpRequest) -> Response:
+        query_serializer = EnvironmentDocumentDeltaQuerySerializer(
+            data=request.query_params
+        )
+        query_serializer.is_valid(raise_exception=True)
+
+        try:
+            return Response(
+                get_environment_document_delta(
+                    request.environment, query_serializer.validated_data["since"]
+                )
+            )
+        except Environment.DoesNotExist:
+            raise NotFound("Environment does not exist for given key.")
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    The events are written to the response directly by the view so this is only
+    used for content negotiation and for rendering errors, as JSON.
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
+
+
+class SDKEnvironmentUpdatesAPIView(SDKAPIView):
+    """
+    Wait for the version of the environment to change from the given version.
+
+    Clients that accept `text/event-stream` receive a stream of server sent events,
+    one for each new version, otherwise the request is held open until the version
+    changes (or the request times out) and the current version is returned.
+
+    Streams are only served when ENVIRONMENT_UPDATES_STREAMING is enabled, i.e.
+    under ASGI, as they would hold a synchronous worker past its timeout.
+
+    Only ENVIRONMENT_UPDATES_MAX_WAITERS clients wait in each process at once. Once
+    they are, long polls get the current version straight away and streams are
+    refused.
+    """
+
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+    def get(self, request: HttpRequest):
+        if not settings.ENABLE_ENVIRONMENT_UPDATES:
+            raise NotFound("Environment updates are not enabled.")
+
+        query_serializer = EnvironmentUpdatesQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        since = query_serializer.validated_data.get("since")
+
+        waiter_slots = get_waiter_slots()
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            if not settings.ENVIRONMENT_UPDATES_STREAMING:
+                raise NotFound("Environment update streams are not enabled.")
+            if not waiter_slots.acquire(blocking=False):
+                raise Throttled(
+                    wait=settings.ENVIRONMENT_UPDATES_TIMEOUT_SECONDS,
+                    detail="Too many clients are waiting for updates.",
+                )
+            last_event_id = request.META.get("HTTP_LAST_EVENT_ID", "")
+            if last_event_id.isdigit():
+                since = int(last_event_id)
+            return self._get_stream_response(
+                request.environment, since, waiter_slots.release
+            )
+
+        if since is None or not waiter_slots.acquire(blocking=False):
+            return Response({"version": get_environment_version(request.environment)})
+
+        try:
+            version = get_environment_updates_broker().wait_for_update(
+                request.environment,
+                since=since,
+                timeout=settings.ENVIRONMENT_UPDATES_TIMEOUT_SECONDS,
+            )
+        finally:
+            waiter_slots.release()
+        return Response({"version": version})
+
+    def _get_stream_response(
+        self,
+        environment,
+        since: typing.Optional[int],
+        release: typing.Callable[[], None],
+    ) -> StreamingHttpResponse:
+        response = StreamingHttpResponse(
+            _ClosingIterator(self._stream_versions(environment, since), release),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # stop nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def _stream_versions(
+        self, environment, since: typing.Optional[int]
+    ) -> typing.Iterator[str]:
+        broker = get_environment_updates_broker()
+        if since is None:
+            since = get_environment_version(environment)
+            yield _format_event(since)
+
+        deadline = time.monotonic() + settings.ENVIRONMENT_UPDATES_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            remaining = deadline - time.monotonic()
+            version = broker.wait_for_update(
+                environment,
+                since=since,
+                timeout=min(settings.ENVIRONMENT_UPDATES_TIMEOUT_SECONDS, remaining),
+            )
+            if version > since:
+                since = version
+                yield _format_event(version)
+            else:
+                # comments keep the connection from being closed by proxies
+                yield ": keep-alive\n\n"
+
+
+class _ClosingIterator:
+    """
+    Call `on_close` once, when the response is closed, even if the stream was never
+    iterated (e.g. because the client disconnected first).
+    """
+
+    def __init__(self, iterator: typing.Iterator[str], on_close: typing.Callable):
+        self._iterator = iterator
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._iterator)
+
+    def close(self) -> None:
+        try:
+            self._iterator.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close:
+                on_close()
+
+
+def _format_event(version: int) -> str:
+    data = json.dumps({"version": version})
+    return f"id: {version}\nevent: environment_updated\ndata: {data}\n\n"
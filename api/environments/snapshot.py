@@ -0,0 +1,196 @@
+import threading
+import time
+import typing
+
+from cachetools import LRUCache
+from core.db_routers import use_primary
+from django.conf import settings
+from django.db.models import Prefetch
+
+from environments.models import Environment
+from environments.versioning import get_environment_version
+from features.models import FeatureState
+from features.multivariate.models import MultivariateFeatureStateValue
+from segments.evaluator import (
+    CompiledSegment,
+    compile_segments,
+    get_matching_segments,
+    get_traits_by_key,
+)
+
+if typing.TYPE_CHECKING:
+    from environments.identities.traits.models import Trait
+    from segments.models import Segment
+
+_snapshots = LRUCache(maxsize=settings.ENVIRONMENT_SNAPSHOT_MAX_ENTRIES)
+_snapshots_lock = threading.Lock()
+
+
+def get_feature_states_queryset():
+    return FeatureState.objects.select_related(
+        "feature", "feature_state_value", "feature_segment"
+    ).prefetch_related(
+        Prefetch(
+            "multivariate_feature_state_values",
+            queryset=MultivariateFeatureStateValue.objects.select_related(
+                "multivariate_feature_option"
+            ),
+        )
+    )
+
+
+class EnvironmentSnapshot:
+    """
+    Read only view of everything needed to evaluate the flags for an environment,
+    except for the identity overrides. Instances are shared between requests (and
+    threads) so nothing held here should be modified after the snapshot is built.
+    """
+
+    def __init__(
+        self,
+        environment_id: int,
+        version: typing.Optional[int],
+        environment_feature_states: typing.Dict[int, FeatureState],
+        segment_overrides: typing.Dict[
+            int, typing.List[typing.Tuple[int, FeatureState]]
+        ],
+        segments: typing.Tuple[CompiledSegment, ...],
+    ):
+        self.environment_id = environment_id
+        self.version = version
+        # environment default feature states keyed on feature id
+        self.environment_feature_states = environment_feature_states
+        # (segment id, feature state) pairs keyed on feature id, highest priority first
+        self.segment_overrides = segment_overrides
+        self.segments = segments
+        self.segments_by_id = {segment.id: segment for segment in segments}
+        self.built_at = time.monotonic()
+
+    @property
+    def is_expired(self) -> bool:
+        # some changes (e.g. deleting a segment) don't create an audit log and hence
+        # don't change the environment version so we don't keep snapshots forever
+        max_age = settings.ENVIRONMENT_SNAPSHOT_MAX_AGE_SECONDS
+        return time.monotonic() - self.built_at > max_age
+
+    @classmethod
+    def build(
+        cls, environment: Environment, version: typing.Optional[int]
+    ) -> "EnvironmentSnapshot":
+        environment_feature_states = {}
+        segment_overrides = {}
+
+        feature_states = sorted(
+            get_feature_states_queryset().filter(
+                environment=environment, identity__isnull=True
+            ),
+            key=lambda fs: (
+                fs.feature_segment_id is not None,
+                _get_priority(fs),
+                fs.id,
+            ),
+        )
+        for feature_state in feature_states:
+            if feature_state.feature_segment_id is None:
+                environment_feature_states[feature_state.feature_id] = feature_state
+            else:
+                segment_overrides.setdefault(feature_state.feature_id, []).append(
+                    (feature_state.feature_segment.segment_id, feature_state)
+                )
+
+        return cls(
+            environment_id=environment.id,
+            version=version,
+            environment_feature_states=environment_feature_states,
+            segment_overrides=segment_overrides,
+            segments=compile_segments(environment.project.get_segments_from_cache()),
+        )
+
+    def get_environment_feature_states(self) -> typing.List[FeatureState]:
+        return list(self.environment_feature_states.values())
+
+    def get_segments(
+        self, identity_id: int, traits: typing.Iterable["Trait"]
+    ) -> typing.List["Segment"]:
+        return get_matching_segments(self.segments, identity_id, traits)
+
+    def get_identity_feature_states(
+        self,
+        segment_ids: typing.Collection[int],
+        identity_overrides: typing.Iterable[FeatureState],
+    ) -> typing.Dict[int, FeatureState]:
+        """
+        Get the highest priority feature state for each feature, keyed on feature id,
+        given the ids of the segments an identity belongs to and its overrides.
+        """
+        feature_states = {}
+        for feature_id, feature_state in self.environment_feature_states.items():
+            feature_states[feature_id] = next(
+                (
+                    segment_override
+                    for segment_id, segment_override in self.segment_overrides.get(
+                        feature_id, []
+                    )
+                    if segment_id in segment_ids
+                ),
+                feature_state,
+            )
+
+        for identity_override in identity_overrides:
+            feature_states[identity_override.feature_id] = identity_override
+
+        return feature_states
+
+    def get_identity_feature_state(
+        self,
+        feature_id: int,
+        identity_id: int,
+        traits: typing.Iterable["Trait"],
+        identity_override: typing.Optional[FeatureState] = None,
+    ) -> typing.Optional[FeatureState]:
+        """
+        Get the highest priority feature state for a single feature, only evaluating
+        the segments that override the feature.
+        """
+        environment_feature_state = self.environment_feature_states.get(feature_id)
+        if environment_feature_state is None or identity_override is not None:
+            return identity_override
+
+        traits_by_key = get_traits_by_key(traits)
+        for segment_id, segment_override in self.segment_overrides.get(feature_id, []):
+            segment = self.segments_by_id.get(segment_id)
+            if segment and segment.does_identity_match(identity_id, traits_by_key):
+                return segment_override
+
+        return environment_feature_state
+
+
+def _get_priority(feature_state: FeatureState) -> int:
+    # priority 0 is the highest priority for a feature segment
+    feature_segment = feature_state.feature_segment
+    return feature_segment.priority if feature_segment else 0
+
+
+def get_environment_snapshot(environment: Environment) -> EnvironmentSnapshot:
+    """
+    Get the snapshot for the given environment from worker memory, rebuilding it
+    if the environment has changed since it was built.
+    """
+    version = get_environment_version(environment)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(environment.id)
+
+    if snapshot is None or snapshot.version != version or snapshot.is_expired:
+        # read from the primary, which the version is derived from, so that a
+        # lagging replica can't give an old snapshot the new version
+        with use_primary():
+            snapshot = EnvironmentSnapshot.build(environment, version)
+        with _snapshots_lock:
+            _snapshots[environment.id] = snapshot
+
+    return snapshot
+
+
+def clear_environment_snapshots() -> None:
+    with _snapshots_lock:
+        _snapshots.clear()
@@ -0,0 +1,130 @@
+"""
+Notify clients when the version of an environment changes, so that they can poll
+for flags or environment documents rarely and refresh only when something changed.
+"""
+import threading
+import time
+import typing
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from environments.models import Environment
+from environments.versioning import get_environment_version
+
+
+class BaseEnvironmentUpdatesBroker(ABC):
+    @abstractmethod
+    def publish(self, environment_id: int, version: int) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def wait_for_update(
+        self, environment: Environment, since: int, timeout: float
+    ) -> int:
+        """
+        Block until the version of the environment is greater than `since` or until
+        the timeout (in seconds) expires.
+
+        :return: the current version of the environment
+        """
+        raise NotImplementedError()
+
+
+class InProcessEnvironmentUpdatesBroker(BaseEnvironmentUpdatesBroker):
+    """
+    Broker that only notifies subscribers in the same process as the publisher.
+    Only suitable for tests and single process deployments.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._condition = threading.Condition()
+
+    def publish(self, environment_id: int, version: int) -> None:
+        with self._condition:
+            if version > self._versions.get(environment_id, 0):
+                self._versions[environment_id] = version
+                self._condition.notify_all()
+
+    def wait_for_update(
+        self, environment: Environment, since: int, timeout: float
+    ) -> int:
+        version = get_environment_version(environment)
+        if version > since:
+            return version
+
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._versions.get(environment.id, 0) > since, timeout
+            )
+            return max(version, self._versions.get(environment.id, 0))
+
+
+class PollingEnvironmentUpdatesBroker(BaseEnvironmentUpdatesBroker):
+    """
+    Broker that doesn't need publishing. Subscribers check the (cached) environment
+    version every ENVIRONMENT_UPDATES_POLL_INTERVAL_SECONDS so it works across any
+    number of processes, at the cost of some latency.
+    """
+
+    def publish(self, environment_id: int, version: int) -> None:
+        pass
+
+    def wait_for_update(
+        self, environment: Environment, since: int, timeout: float
+    ) -> int:
+        deadline = time.monotonic() + timeout
+        while True:
+            version = get_environment_version(environment)
+            remaining = deadline - time.monotonic()
+            if version > since or remaining <= 0:
+                return version
+            time.sleep(
+                min(settings.ENVIRONMENT_UPDATES_POLL_INTERVAL_SECONDS, remaining)
+            )
+
+
+def get_environment_updates_broker() -> BaseEnvironmentUpdatesBroker:
+    return _get_broker(settings.ENVIRONMENT_UPDATES_BROKER)
+
+
+def get_waiter_slots() -> threading.BoundedSemaphore:
+    """
+    Get the semaphore that limits the number of clients waiting for updates in this
+    process at once. Slots must be acquired without blocking.
+    """
+    return _get_waiter_slots(settings.ENVIRONMENT_UPDATES_MAX_WAITERS)
+
+
+@lru_cache(maxsize=None)
+def _get_broker(broker_class_path: str) -> BaseEnvironmentUpdatesBroker:
+    return import_string(broker_class_path)()
+
+
+@lru_cache(maxsize=None)
+def _get_waiter_slots(max_waiters: int) -> threading.BoundedSemaphore:
+    return threading.BoundedSemaphore(max_waiters)
+
+
+def publish_environment_versions(
+    environment_ids: typing.Iterable[int], version: int
+) -> None:
+    """
+    Publish the new version of the given environments once the current transaction
+    has been committed, so that subscribers can't see the new version before the
+    changes that produced it.
+    """
+    environment_ids = list(environment_ids)
+    if not environment_ids:
+        return
+
+    def publish():
+        broker = get_environment_updates_broker()
+        for environment_id in environment_ids:
+            broker.publish(environment_id, version)
+
+    transaction.on_commit(publish)
@@ -0,0 +1,77 @@
+import typing
+
+from core.db_routers import use_primary
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max, Q
+
+from audit.models import AuditLog
+from environments.models import Environment
+
+environment_version_cache = caches[settings.ENVIRONMENT_VERSION_CACHE_LOCATION]
+
+
+def get_environment_version(environment: Environment) -> int:
+    """
+    Get the current version of an environment. The version is the id of the latest
+    audit log recorded against the environment, or against its project as a whole,
+    so it increases monotonically whenever features, segments or overrides change.
+    """
+    version = environment_version_cache.get(environment.id)
+
+    if version is None:
+        with use_primary():
+            version = (
+                AuditLog.objects.filter(
+                    Q(environment_id=environment.id)
+                    | Q(project_id=environment.project_id, environment__isnull=True)
+                ).aggregate(version=Max("id"))["version"]
+                or 0
+            )
+        environment_version_cache.set(
+            environment.id, version, timeout=settings.CACHE_ENVIRONMENT_VERSION_SECONDS
+        )
+
+    return version
+
+
+def update_environment_versions(audit_log: AuditLog) -> typing.List[int]:
+    """
+    Update the version of the environments affected by the given audit log, once the
+    current transaction has been committed. If the audit log is only related to a
+    project, all of the project's environments are updated.
+
+    :return: the ids of the affected environments
+    """
+    if audit_log.id is None:
+        # e.g. audit logs created via bulk_create on databases that don't return ids
+        return []
+
+    if audit_log.environment_id:
+        environment_ids = [audit_log.environment_id]
+    elif audit_log.project_id:
+        environment_ids = list(
+            Environment.objects.filter(project_id=audit_log.project_id).values_list(
+                "id", flat=True
+            )
+        )
+    else:
+        return []
+
+    def update_versions():
+        # never move a version backwards in case audit logs are processed out of order
+        current_versions = environment_version_cache.get_many(environment_ids)
+        environment_version_cache.set_many(
+            {
+                environment_id: audit_log.id
+                for environment_id in environment_ids
+                if current_versions.get(environment_id, 0) < audit_log.id
+            },
+            timeout=settings.CACHE_ENVIRONMENT_VERSION_SECONDS,
+        )
+
+    # other requests could otherwise build (and cache) snapshots and documents for the
+    # new version from the data as it was before the changes were committed
+    transaction.on_commit(update_versions)
+    return environment_ids
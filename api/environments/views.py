@@ -6,14 +6,12 @@ import logging
 from django.utils.decorators import method_decorator
 from drf_yasg2 import openapi
 from drf_yasg2.utils import swagger_auto_schema
-from flag_engine.django_transform.document_builders import (
-    build_environment_document,
-)
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from environments.documents import get_environment_document_response
 from environments.permissions.permissions import (
     EnvironmentAdminPermission,
     EnvironmentPermissions,
@@ -201,10 +199,8 @@ class EnvironmentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["GET"], url_path="document")
     def get_document(self, request, api_key: str):
-        environment = Environment.objects.select_related(
-            "project", "project__organisation"
-        ).get(api_key=api_key)
-        return Response(build_environment_document(environment))
+        environment = Environment.objects.get(api_key=api_key)
+        return get_environment_document_response(request, environment)
 
 
 class NestedEnvironmentViewSet(viewsets.GenericViewSet):
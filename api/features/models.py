@@ -9,7 +9,7 @@ from django.core.exceptions import (
     ObjectDoesNotExist,
     ValidationError,
 )
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q, UniqueConstraint
 from django.utils.translation import ugettext_lazy as _
 from django_lifecycle import AFTER_CREATE, BEFORE_CREATE, LifecycleModel, hook
@@ -79,17 +79,19 @@ class Feature(CustomLifecycleModelMixin, models.Model):
 
     @hook(AFTER_CREATE)
     def create_feature_states(self):
-        # create feature states for all environments
+        # create feature states for all environments, in a single transaction so that
+        # their webhooks are sent together
         environments = self.project.environments.all()
-        for env in environments:
-            # unable to bulk create as we need signals
-            FeatureState.objects.create(
-                feature=self,
-                environment=env,
-                identity=None,
-                feature_segment=None,
-                enabled=self.default_enabled,
-            )
+        with transaction.atomic():
+            for env in environments:
+                # unable to bulk create as we need signals
+                FeatureState.objects.create(
+                    feature=self,
+                    environment=env,
+                    identity=None,
+                    feature_segment=None,
+                    enabled=self.default_enabled,
+                )
 
     def validate_unique(self, *args, **kwargs):
         """
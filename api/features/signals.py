@@ -40,5 +40,5 @@ def create_feature_segment_audit_log(
 
 
 @receiver(post_save, sender=FeatureState)
-def trigger_feature_state_change_webhooks_signal(instance, **kwargs):
-    trigger_feature_state_change_webhooks(instance)
+def trigger_feature_state_change_webhooks_signal(instance, created, **kwargs):
+    trigger_feature_state_change_webhooks(instance, created=created)
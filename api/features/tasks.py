@@ -1,10 +1,22 @@
-from threading import Thread
+import functools
+import typing
+import weakref
 
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from simple_history.models import HistoricalRecords
+
+from environments.models import Environment
 from features.models import FeatureState
+from util.util import get_executor
 from webhooks.webhooks import (
     WebhookEventType,
     call_environment_webhooks,
     call_organisation_webhooks,
+    environment_has_webhooks,
+    get_environment_organisation_id,
+    organisation_has_webhooks,
 )
 
 from .models import HistoricalFeatureState
@@ -12,22 +24,170 @@ from .models import HistoricalFeatureState
 date_format = "%Y-%m-%dT%H:%M:%S.%fZ"
 
 
+class _FeatureStateChange:
+    """
+    A change made to a feature state in a transaction.
+    """
+
+    def __init__(
+        self,
+        feature_state: FeatureState,
+        data: dict,
+        event_type: WebhookEventType,
+    ):
+        self.key = (feature_state.id, event_type)
+        self.environment = feature_state.environment
+        self.data = data
+        self.event_type = event_type
+        self.is_committed = False
+
+
+class PendingFeatureStateWebhooks:
+    """
+    The webhook data of the feature states changed in a transaction, which is sent
+    in a single call to the webhooks executor once the transaction is committed.
+    Each feature state is only sent once, with its latest state and the state it
+    had before the transaction.
+
+    Each change registers its own commit callback, so that changes made in a
+    savepoint that is rolled back are dropped along with their callbacks. Django
+    discards those callbacks without calling them, which is noticed when they are
+    garbage collected. The data is sent once every change has either been committed
+    or discarded.
+    """
+
+    def __init__(self):
+        self.changes: typing.List[_FeatureStateChange] = []
+        self.unresolved_count = 0
+
+    def add(
+        self, feature_state: FeatureState, data: dict, event_type: WebhookEventType
+    ) -> None:
+        change = _FeatureStateChange(feature_state, data, event_type)
+        self.changes.append(change)
+        self.unresolved_count += 1
+
+        on_commit = functools.partial(self._commit, change)
+        weakref.finalize(on_commit, self._discard, change).atexit = False
+        transaction.on_commit(on_commit)
+
+    def get_committed_changes(
+        self,
+    ) -> typing.List[typing.Tuple[Environment, dict, WebhookEventType]]:
+        committed_changes = {}
+        for change in self.changes:
+            if not change.is_committed:
+                continue
+
+            data = dict(change.data)
+            if change.key in committed_changes:
+                earlier_data = committed_changes[change.key][1]
+                data.pop("previous_state", None)
+                if earlier_data.get("previous_state"):
+                    data.update(previous_state=earlier_data["previous_state"])
+            committed_changes[change.key] = (
+                change.environment,
+                data,
+                change.event_type,
+            )
+        return list(committed_changes.values())
+
+    def _commit(self, change: _FeatureStateChange) -> None:
+        change.is_committed = True
+        self._resolve()
+
+    def _discard(self, change: _FeatureStateChange) -> None:
+        # also called once the callbacks of committed changes have been run
+        if not change.is_committed:
+            self._resolve()
+
+    def _resolve(self) -> None:
+        self.unresolved_count -= 1
+        if self.unresolved_count:
+            return
+
+        connection = transaction.get_connection()
+        if getattr(connection, "pending_feature_state_webhooks", None) is self:
+            connection.pending_feature_state_webhooks = None
+
+        committed_changes = self.get_committed_changes()
+        if committed_changes:
+            get_executor("webhooks").submit(
+                call_feature_state_change_webhooks, committed_changes
+            )
+
+
 def trigger_feature_state_change_webhooks(
-    instance: FeatureState, event_type: WebhookEventType = WebhookEventType.FLAG_UPDATED
+    instance: FeatureState,
+    event_type: WebhookEventType = WebhookEventType.FLAG_UPDATED,
+    created: bool = False,
 ):
     assert event_type in [WebhookEventType.FLAG_UPDATED, WebhookEventType.FLAG_DELETED]
 
-    history_instance = instance.history.first()
-    timestamp = (
-        history_instance.history_date.strftime(date_format)
-        if history_instance and history_instance.history_date
-        else ""
-    )
-    changed_by = (
-        str(history_instance.history_user)
-        if history_instance and history_instance.history_user
-        else ""
-    )
+    if not (
+        environment_has_webhooks(instance.environment_id)
+        or organisation_has_webhooks(
+            get_environment_organisation_id(instance.environment_id)
+        )
+    ):
+        return
+
+    data = _get_webhook_data(instance, event_type, created)
+    if settings.WEBHOOK_OUTBOX_ENABLED:
+        # only records the events, in the transaction that made the change, to be
+        # delivered in the background
+        call_feature_state_change_webhooks([(instance.environment, data, event_type)])
+    elif transaction.get_connection().in_atomic_block:
+        _get_pending_webhooks().add(instance, data, event_type)
+    else:
+        get_executor("webhooks").submit(
+            call_feature_state_change_webhooks,
+            [(instance.environment, data, event_type)],
+        )
+
+
+def call_feature_state_change_webhooks(
+    changes: typing.List[typing.Tuple[Environment, dict, WebhookEventType]]
+) -> None:
+    for environment, data, event_type in changes:
+        if environment_has_webhooks(environment.id):
+            call_environment_webhooks(environment, data, event_type)
+        organisation = environment.project.organisation
+        if organisation_has_webhooks(organisation.id):
+            call_organisation_webhooks(organisation, data, event_type)
+
+
+def _get_pending_webhooks() -> PendingFeatureStateWebhooks:
+    # the connection is only used by one thread, and its transactions run one at a
+    # time, so it holds the pending webhooks of its current transaction
+    connection = transaction.get_connection()
+    pending_webhooks = getattr(connection, "pending_feature_state_webhooks", None)
+    if pending_webhooks is None:
+        pending_webhooks = PendingFeatureStateWebhooks()
+        connection.pending_feature_state_webhooks = pending_webhooks
+    return pending_webhooks
+
+
+def _get_webhook_data(
+    instance: FeatureState, event_type: WebhookEventType, created: bool
+) -> dict:
+    if created:
+        # the feature state has no history to look up
+        history_instance = None
+        timestamp = timezone.now().strftime(date_format)
+        changed_by = _get_request_user()
+    else:
+        history_instance = instance.history.first()
+        timestamp = (
+            history_instance.history_date.strftime(date_format)
+            if history_instance and history_instance.history_date
+            else ""
+        )
+        changed_by = (
+            str(history_instance.history_user)
+            if history_instance and history_instance.history_user
+            else ""
+        )
 
     new_state = (
         None
@@ -35,22 +195,18 @@ def trigger_feature_state_change_webhooks(
         else _get_feature_state_webhook_data(instance)
     )
     data = {"new_state": new_state, "changed_by": changed_by, "timestamp": timestamp}
-    previous_state = _get_previous_state(history_instance, event_type)
+    previous_state = (
+        _get_previous_state(history_instance, event_type) if not created else None
+    )
     if previous_state:
         data.update(previous_state=previous_state)
-    Thread(
-        target=call_environment_webhooks,
-        args=(instance.environment, data, event_type),
-    ).start()
-
-    Thread(
-        target=call_organisation_webhooks,
-        args=(
-            instance.environment.project.organisation,
-            data,
-            event_type,
-        ),
-    ).start()
+    return data
+
+
+def _get_request_user() -> str:
+    request = getattr(HistoricalRecords.thread, "request", None)
+    user = getattr(request, "user", None)
+    return str(user) if user and user.is_authenticated else ""
 
 
 def _get_previous_state(
@@ -349,7 +349,7 @@ class FeatureStateTest(TestCase):
         feature_state.save()
 
         # Then
-        mock_trigger_webhooks.assert_called_with(feature_state)
+        mock_trigger_webhooks.assert_called_with(feature_state, created=False)
 
 
 @pytest.mark.parametrize("hashed_percentage", (0.0, 0.3, 0.5, 0.8, 0.999999))
@@ -1,18 +1,25 @@
 from unittest import mock
 
 import pytest
+from django.db import transaction
 
-from environments.models import Environment
+from environments.models import Environment, Webhook
 from features.models import Feature, FeatureState
-from features.tasks import trigger_feature_state_change_webhooks
-from organisations.models import Organisation
+from features.tasks import (
+    call_feature_state_change_webhooks,
+    trigger_feature_state_change_webhooks,
+)
+from organisations.models import Organisation, OrganisationWebhook
 from projects.models import Project
+from webhooks.models import WebhookDelivery
 from webhooks.webhooks import WebhookEventType
 
 
 @pytest.mark.django_db
-@mock.patch("features.tasks.Thread")
-def test_trigger_feature_state_change_webhooks(MockThread):
+@mock.patch("features.tasks.get_executor")
+def test_trigger_feature_state_change_webhooks(
+    mock_get_executor, django_capture_on_commit_callbacks
+):
     # Given
     initial_value = "initial"
     new_value = "new"
@@ -30,34 +37,34 @@ def test_trigger_feature_state_change_webhooks(MockThread):
     feature_state.feature_state_value.save()
     feature_state.save()
 
-    MockThread.reset_mock()  # reset mock as it will have been called when setting up the data
+    Webhook.objects.create(url="http://url.1.com", environment=environment)
 
     # When
-    trigger_feature_state_change_webhooks(feature_state)
+    with django_capture_on_commit_callbacks(execute=True):
+        trigger_feature_state_change_webhooks(feature_state)
 
     # Then
-    call_list = MockThread.call_args_list
-
-    environment_webhook_call_args = call_list[0]
-    organisation_webhook_call_args = call_list[1]
+    mock_get_executor.assert_called_once_with("webhooks")
+    function, changes = mock_get_executor.return_value.submit.call_args[0]
+    assert function == call_feature_state_change_webhooks
+    assert len(changes) == 1
 
-    # verify that the data for both calls is the same
-    assert (
-        environment_webhook_call_args[1]["args"][1]
-        == organisation_webhook_call_args[1]["args"][1]
-    )
-
-    data = environment_webhook_call_args[1]["args"][1]
-    event_type = environment_webhook_call_args[1]["args"][2]
+    changed_environment, data, event_type = changes[0]
+    assert changed_environment == environment
     assert data["new_state"]["feature_state_value"] == new_value
     assert data["previous_state"]["feature_state_value"] == initial_value
     assert event_type == WebhookEventType.FLAG_UPDATED
 
 
 @pytest.mark.django_db
-@mock.patch("features.tasks.Thread")
+@mock.patch("features.tasks.get_executor")
 def test_trigger_feature_state_change_webhooks_for_deleted_flag(
-    MockThread, organisation, project, environment, feature
+    mock_get_executor,
+    organisation,
+    project,
+    environment,
+    feature,
+    django_capture_on_commit_callbacks,
 ):
     # Given
     new_value = "new"
@@ -68,23 +75,239 @@ def test_trigger_feature_state_change_webhooks_for_deleted_flag(
     feature_state.feature_state_value.save()
     feature_state.save()
 
-    MockThread.reset_mock()  # reset mock as it will have been called when setting up the data
-    trigger_feature_state_change_webhooks(feature_state, WebhookEventType.FLAG_DELETED)
+    OrganisationWebhook.objects.create(
+        name="Test webhook", url="http://url.1.com", organisation=organisation
+    )
+
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        trigger_feature_state_change_webhooks(
+            feature_state, WebhookEventType.FLAG_DELETED
+        )
 
     # Then
-    call_list = MockThread.call_args_list
+    _, changes = mock_get_executor.return_value.submit.call_args[0]
+    _, data, event_type = changes[0]
+    assert data["new_state"] is None
+    assert data["previous_state"]["feature_state_value"] == new_value
+    assert event_type == WebhookEventType.FLAG_DELETED
 
-    environment_webhook_call_args = call_list[0]
-    organisation_webhook_call_args = call_list[1]
 
-    # verify that the data for both calls is the same
-    assert (
-        environment_webhook_call_args[1]["args"][1]
-        == organisation_webhook_call_args[1]["args"][1]
+@pytest.mark.django_db
+@mock.patch("features.tasks.get_executor")
+def test_trigger_feature_state_change_webhooks_does_nothing_without_webhooks(
+    mock_get_executor,
+    environment,
+    feature,
+    django_capture_on_commit_callbacks,
+    django_assert_num_queries,
+):
+    # Given
+    feature_state = FeatureState.objects.get(feature=feature, environment=environment)
+    # check, and cache, whether the environment and organisation have webhooks
+    trigger_feature_state_change_webhooks(feature_state)
+
+    # a feature state without its environment loaded
+    feature_state = FeatureState.objects.get(id=feature_state.id)
+
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        with django_assert_num_queries(0):
+            trigger_feature_state_change_webhooks(feature_state)
+
+    # Then
+    mock_get_executor.assert_not_called()
+
+
+@pytest.mark.django_db
+@mock.patch("features.tasks.get_executor")
+def test_feature_states_created_with_feature_are_sent_in_one_call(
+    mock_get_executor,
+    organisation,
+    project,
+    django_capture_on_commit_callbacks,
+    mocker,
+):
+    # Given
+    # undo the patch applied by the module level of the views tests
+    mocker.patch(
+        "features.signals.trigger_feature_state_change_webhooks",
+        trigger_feature_state_change_webhooks,
+    )
+    environments = [
+        Environment.objects.create(name=f"Environment {i}", project=project)
+        for i in range(3)
+    ]
+    OrganisationWebhook.objects.create(
+        name="Test webhook", url="http://url.1.com", organisation=organisation
     )
 
-    data = environment_webhook_call_args[1]["args"][1]
-    event_type = environment_webhook_call_args[1]["args"][2]
-    assert data["new_state"] is None
-    assert data["previous_state"]["feature_state_value"] == new_value
-    assert event_type == WebhookEventType.FLAG_DELETED
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        Feature.objects.create(name="Test feature", project=project)
+
+    # Then
+    mock_get_executor.return_value.submit.assert_called_once()
+    _, changes = mock_get_executor.return_value.submit.call_args[0]
+    assert [environment for environment, _, _ in changes] == environments
+    assert all("previous_state" not in data for _, data, _ in changes)
+
+
+@pytest.mark.django_db
+@mock.patch("features.tasks.get_executor")
+def test_changes_made_in_rolled_back_savepoint_are_not_sent(
+    mock_get_executor,
+    organisation,
+    project,
+    environment,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    features = [
+        Feature.objects.create(name=f"Test feature {i}", project=project)
+        for i in range(3)
+    ]
+    feature_states = [
+        FeatureState.objects.get(feature=feature, environment=environment)
+        for feature in features
+    ]
+    Webhook.objects.create(url="http://url.1.com", environment=environment)
+
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            trigger_feature_state_change_webhooks(feature_states[0])
+            try:
+                with transaction.atomic():
+                    trigger_feature_state_change_webhooks(feature_states[1])
+                    raise ValueError()
+            except ValueError:
+                pass
+            trigger_feature_state_change_webhooks(feature_states[2])
+
+    # Then
+    mock_get_executor.return_value.submit.assert_called_once()
+    _, changes = mock_get_executor.return_value.submit.call_args[0]
+    assert [data["new_state"]["feature"]["id"] for _, data, _ in changes] == [
+        features[0].id,
+        features[2].id,
+    ]
+
+
+@pytest.mark.django_db
+@mock.patch("features.tasks.get_executor")
+def test_changes_are_sent_when_the_last_changes_are_rolled_back(
+    mock_get_executor,
+    organisation,
+    project,
+    environment,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    features = [
+        Feature.objects.create(name=f"Test feature {i}", project=project)
+        for i in range(2)
+    ]
+    feature_states = [
+        FeatureState.objects.get(feature=feature, environment=environment)
+        for feature in features
+    ]
+    Webhook.objects.create(url="http://url.1.com", environment=environment)
+
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            trigger_feature_state_change_webhooks(feature_states[0])
+            try:
+                with transaction.atomic():
+                    trigger_feature_state_change_webhooks(feature_states[1])
+                    raise ValueError()
+            except ValueError:
+                pass
+
+    # Then
+    mock_get_executor.return_value.submit.assert_called_once()
+    _, changes = mock_get_executor.return_value.submit.call_args[0]
+    assert [data["new_state"]["feature"]["id"] for _, data, _ in changes] == [
+        features[0].id
+    ]
+
+
+@pytest.mark.django_db
+@mock.patch("features.tasks.get_executor")
+def test_changes_made_in_rolled_back_transaction_are_not_sent(
+    mock_get_executor, organisation, project, environment
+):
+    # Given
+    feature = Feature.objects.create(name="Test feature", project=project)
+    feature_state = FeatureState.objects.get(feature=feature, environment=environment)
+    Webhook.objects.create(url="http://url.1.com", environment=environment)
+
+    # When
+    try:
+        with transaction.atomic():
+            trigger_feature_state_change_webhooks(feature_state)
+            raise ValueError()
+    except ValueError:
+        pass
+
+    # Then
+    mock_get_executor.return_value.submit.assert_not_called()
+    # and the next transaction collects its own changes
+    connection = transaction.get_connection()
+    assert connection.pending_feature_state_webhooks is None
+
+
+@pytest.mark.django_db
+@mock.patch("features.tasks.get_executor")
+def test_webhook_deliveries_are_recorded_in_the_transaction_with_outbox(
+    mock_get_executor,
+    settings,
+    project,
+    environment,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    settings.WEBHOOK_OUTBOX_ENABLED = True
+    settings.WEBHOOK_DELIVER_IN_WEB_PROCESSES = False
+    feature = Feature.objects.create(name="Test feature", project=project)
+    feature_state = FeatureState.objects.get(feature=feature, environment=environment)
+    webhook = Webhook.objects.create(url="http://url.1.com", environment=environment)
+
+    # When
+    with django_capture_on_commit_callbacks() as callbacks:
+        with transaction.atomic():
+            trigger_feature_state_change_webhooks(feature_state)
+
+            # Then
+            delivery = WebhookDelivery.objects.get()
+
+    assert delivery.webhook_id == webhook.id
+    assert delivery.payload["data"]["new_state"]["feature"]["id"] == feature.id
+    assert not callbacks
+    mock_get_executor.assert_not_called()
+
+
+@pytest.mark.django_db
+@mock.patch("features.tasks.call_organisation_webhooks")
+@mock.patch("features.tasks.call_environment_webhooks")
+def test_call_feature_state_change_webhooks_only_calls_existing_webhooks(
+    mock_call_environment_webhooks,
+    mock_call_organisation_webhooks,
+    organisation,
+    environment,
+):
+    # Given
+    Webhook.objects.create(url="http://url.1.com", environment=environment)
+    data = {"new_state": None}
+
+    # When
+    call_feature_state_change_webhooks(
+        [(environment, data, WebhookEventType.FLAG_UPDATED)]
+    )
+
+    # Then
+    mock_call_environment_webhooks.assert_called_once_with(
+        environment, data, WebhookEventType.FLAG_UPDATED
+    )
+    mock_call_organisation_webhooks.assert_not_called()
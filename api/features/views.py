@@ -1,11 +1,17 @@
+import gzip
+import hashlib
 import logging
 import typing
 
 import coreapi
-from app_analytics.influxdb_wrapper import get_multiple_event_list_for_feature
+from app_analytics.usage import get_multiple_event_list_for_feature
+from core.db_routers import use_primary
 from django.conf import settings
 from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
 from drf_yasg2 import openapi
 from drf_yasg2.utils import swagger_auto_schema
 from rest_framework import mixins, status, viewsets
@@ -23,12 +29,20 @@ from audit.models import (
     RelatedObjectType,
 )
 from environments.authentication import EnvironmentKeyAuthentication
+from environments.feature_index import get_feature_id_by_name
+from environments.identities.deferred import get_or_defer_identity
 from environments.identities.models import Identity
 from environments.models import Environment
 from environments.permissions.permissions import (
     EnvironmentKeyPermissions,
     NestedEnvironmentPermissions,
 )
+from environments.snapshot import get_environment_snapshot
+from environments.updates import publish_environment_versions
+from environments.versioning import (
+    get_environment_version,
+    update_environment_versions,
+)
 from webhooks.webhooks import WebhookEventType
 
 from .models import Feature, FeatureState
@@ -118,10 +132,15 @@ class FeatureViewSet(viewsets.ModelViewSet):
         feature_states = list(
             instance.feature_states.filter(identity=None, feature_segment=None)
         )
-        self._create_feature_delete_audit_log(feature_states)
+        project_audit_log = self._create_feature_delete_audit_log(feature_states)
         self._trigger_feature_state_change_webhooks(feature_states)
         instance.delete()
 
+        # bulk_create doesn't send the post_save signals that keep the environment
+        # versions up to date so we need to do it here, after the feature has gone
+        environment_ids = update_environment_versions(project_audit_log)
+        publish_environment_versions(environment_ids, project_audit_log.id)
+
     def _trigger_feature_state_change_webhooks(
         self, feature_states: typing.List[FeatureState]
     ):
@@ -132,7 +151,7 @@ class FeatureViewSet(viewsets.ModelViewSet):
 
     def _create_feature_delete_audit_log(
         self, feature_states: typing.List[FeatureState]
-    ):
+    ) -> AuditLog:
         feature = feature_states[0].feature
         message = FEATURE_DELETED_MESSAGE % feature.name
         project_audit_log = AuditLog(
@@ -155,6 +174,7 @@ class FeatureViewSet(viewsets.ModelViewSet):
                 )
             )
         AuditLog.objects.bulk_create(audit_logs)
+        return project_audit_log
 
     @swagger_auto_schema(
         query_serializer=GetInfluxDataQuerySerializer(),
@@ -461,10 +481,10 @@ class SDKFeatureStates(GenericAPIView):
         }
 
         if "feature" in request.GET:
-            filter_args["feature__name__iexact"] = request.GET["feature"]
-            try:
-                feature_state = FeatureState.objects.get(**filter_args)
-            except FeatureState.DoesNotExist:
+            feature_state = self._get_feature_state(
+                request.environment, request.GET["feature"], filter_args
+            )
+            if not feature_state:
                 return Response(
                     {"detail": "Given feature not found"},
                     status=status.HTTP_404_NOT_FOUND,
@@ -472,21 +492,113 @@ class SDKFeatureStates(GenericAPIView):
 
             return Response(self.get_serializer(feature_state).data)
 
-        if settings.CACHE_FLAGS_SECONDS > 0:
-            data = self._get_flags_from_cache(filter_args, request.environment)
+        if settings.CACHE_FLAGS_RESPONSE_SECONDS > 0:
+            return self._get_rendered_flags_response(request, filter_args)
+
+        return Response(self._get_flags_data(request.environment, filter_args))
+
+    def _get_feature_state(self, environment, feature_name, filter_args):
+        feature_id = get_feature_id_by_name(environment, feature_name)
+        if feature_id is None:
+            return None
+
+        if settings.ENABLE_ENVIRONMENT_SNAPSHOTS:
+            return get_environment_snapshot(environment).environment_feature_states.get(
+                feature_id
+            )
+
+        return (
+            FeatureState.objects.select_related("feature", "feature_state_value")
+            .filter(feature_id=feature_id, **filter_args)
+            .first()
+        )
+
+    def _get_flags_data(self, environment, filter_args):
+        if settings.ENABLE_ENVIRONMENT_SNAPSHOTS:
+            return self._get_flags_from_snapshot(environment)
+        elif settings.CACHE_FLAGS_SECONDS > 0:
+            return self._get_flags_from_cache(filter_args, environment)
+
+        return self.get_serializer(
+            # ignore disabled Flags when project hide_disabled_flags is enabled
+            FeatureState.objects.filter(**filter_args)
+            .exclude(
+                feature__project__hide_disabled_flags=True,
+                enabled=False,
+            )
+            .select_related("feature", "feature_state_value"),
+            many=True,
+        ).data
+
+    def _get_rendered_flags_response(self, request, filter_args):
+        """
+        Serve the flags for the environment from a cached, pre-rendered response
+        body so that repeated requests for the same version of the environment
+        don't need to hit the database or the renderer. Clients that send back the
+        ETag they were given get a 304 while the environment is unchanged.
+        """
+        rendered_flags = self._get_rendered_flags(request.environment, filter_args)
+        etag = rendered_flags["etag"]
+        gzipped_content = rendered_flags["gzipped_content"]
+
+        # the ETag is weak as it is shared by the gzipped and uncompressed content,
+        # so it is compared using the weak comparison
+        if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        if etag in if_none_match or etag[2:] in if_none_match:
+            response = HttpResponseNotModified()
         else:
-            data = self.get_serializer(
-                # ignore disabled Flags when project hide_disabled_flags is enabled
-                FeatureState.objects.filter(**filter_args)
-                .exclude(
-                    feature__project__hide_disabled_flags=True,
-                    enabled=False,
+            accepts_gzip = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+            response = HttpResponse(
+                gzipped_content
+                if gzipped_content and accepts_gzip
+                else rendered_flags["content"],
+                content_type="application/json",
+            )
+            if gzipped_content and accepts_gzip:
+                response["Content-Encoding"] = "gzip"
+
+        response["ETag"] = etag
+        if gzipped_content:
+            patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    def _get_rendered_flags(self, environment, filter_args) -> dict:
+        version = get_environment_version(environment)
+        cache_key = f"rendered-flags-{environment.id}-{version}"
+
+        rendered_flags = flags_cache.get(cache_key)
+        if rendered_flags is None:
+            # read from the primary, which the version is derived from, so that a
+            # lagging replica can't cache old flags under the new version
+            with use_primary():
+                content = JSONRenderer().render(
+                    self._get_flags_data(environment, filter_args)
                 )
-                .select_related("feature", "feature_state_value"),
-                many=True,
-            ).data
+            # some changes don't update the environment version (e.g. toggling
+            # hide_disabled_flags on the project) so the content hash is included
+            # to guarantee that the ETag changes whenever the content does
+            content_hash = hashlib.md5(content).hexdigest()[:16]
+            rendered_flags = {
+                "etag": f'W/"{version}-{content_hash}"',
+                "content": content,
+                "gzipped_content": gzip.compress(content)
+                if settings.COMPRESS_FLAGS_RESPONSE
+                else None,
+            }
+            flags_cache.set(
+                cache_key, rendered_flags, settings.CACHE_FLAGS_RESPONSE_SECONDS
+            )
 
-        return Response(data)
+        return rendered_flags
+
+    def _get_flags_from_snapshot(self, environment):
+        feature_states = get_environment_snapshot(
+            environment
+        ).get_environment_feature_states()
+        if environment.project.hide_disabled_flags:
+            # ignore disabled Flags when project hide_disabled_flags is enabled
+            feature_states = [fs for fs in feature_states if fs.enabled]
+        return self.get_serializer(feature_states, many=True).data
 
     def _get_flags_from_cache(self, filter_args, environment):
         data = flags_cache.get(environment.api_key)
@@ -506,9 +618,12 @@ class SDKFeatureStates(GenericAPIView):
         return data
 
     def _get_flags_response_with_identifier(self, request, identifier):
-        identity, _ = Identity.objects.get_or_create(
-            identifier=identifier, environment=request.environment
-        )
+        if settings.DEFER_IDENTITY_CREATION:
+            identity = get_or_defer_identity(request.environment, identifier)
+        else:
+            identity, _ = Identity.objects.get_or_create(
+                identifier=identifier, environment=request.environment
+            )
 
         kwargs = {
             "identity": identity,
@@ -3,9 +3,11 @@ import logging
 import typing
 
 import requests
+from django.conf import settings
 
 from environments.identities.models import Identity
 from features.models import FeatureState
+from integrations.common.batching import get_integrations_session
 from integrations.common.wrapper import AbstractBaseIdentityIntegrationWrapper
 
 from .models import AmplitudeConfiguration
@@ -23,11 +25,29 @@ class AmplitudeWrapper(AbstractBaseIdentityIntegrationWrapper):
     def _identify_user(self, user_data: dict) -> None:
         payload = {"api_key": self.api_key, "identification": json.dumps([user_data])}
 
-        response = requests.post(self.url, data=payload)
+        response = requests.post(
+            self.url,
+            data=payload,
+            timeout=settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS,
+        )
         logger.debug(
             "Sent event to Amplitude. Response code was: %s" % response.status_code
         )
 
+    def identify_users(self, users_data: typing.List[dict]) -> None:
+        payload = {"api_key": self.api_key, "identification": json.dumps(users_data)}
+
+        response = get_integrations_session().post(
+            self.url,
+            data=payload,
+            timeout=settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS,
+        )
+        logger.debug(
+            "Sent %d users to Amplitude. Response code was: %s",
+            len(users_data),
+            response.status_code,
+        )
+
     def generate_user_data(
         self, identity: Identity, feature_states: typing.List[FeatureState]
     ) -> dict:
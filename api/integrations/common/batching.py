@@ -0,0 +1,143 @@
+"""
+Batching of the calls made to identity integrations. When BATCH_IDENTITY_INTEGRATIONS
+is set, the identities returned by the identities endpoint are collected for each
+configured integration, rather than being sent straight away. Every
+INTEGRATIONS_IDENTIFY_FLUSH_INTERVAL_SECONDS (or as soon as an integration has
+INTEGRATIONS_IDENTIFY_BATCH_SIZE identities waiting) only the latest flags of each
+identity are sent, using the batch API of the integration where it has one.
+"""
+import logging
+import threading
+import typing
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+
+from util.util import PeriodicFlusher
+
+if typing.TYPE_CHECKING:
+    from environments.identities.models import Identity
+    from features.models import FeatureState
+    from integrations.common.wrapper import (
+        AbstractBaseIdentityIntegrationWrapper,
+    )
+
+logger = logging.getLogger(__name__)
+
+# the integration (relation name) and id of its configuration
+IntegrationKey = typing.Tuple[str, int]
+
+
+class IdentifyBatcher:
+    """
+    Collect the identities to send to each integration, keeping only the latest call
+    for each identity, and send them from a background thread. Identities added
+    while `max_pending` others are waiting are dropped so that an unavailable
+    integration can't exhaust the memory of the process. Identities still waiting
+    when the process exits are sent before it does.
+    """
+
+    def __init__(self, flush_interval: float, batch_size: int, max_pending: int):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped_count = 0
+
+        self._wrapper_factories: typing.Dict[IntegrationKey, typing.Callable] = {}
+        self._pending: typing.Dict[
+            IntegrationKey,
+            typing.Dict[int, typing.Tuple["Identity", typing.List["FeatureState"]]],
+        ] = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._flusher = PeriodicFlusher(
+            self.flush, flush_interval, name="identity-integrations"
+        )
+
+    def add(
+        self,
+        key: IntegrationKey,
+        get_wrapper: typing.Callable[[], "AbstractBaseIdentityIntegrationWrapper"],
+        identity: "Identity",
+        feature_states: typing.List["FeatureState"],
+    ) -> bool:
+        """
+        Queue the identity to be sent to the integration, replacing any call for the
+        same identity that is still waiting. The wrapper used to send it is created,
+        by calling `get_wrapper`, when the batch is sent.
+
+        :return: False if the identity has been dropped
+        """
+        self._flusher.start()
+        with self._lock:
+            pending = self._pending.setdefault(key, {})
+            if identity.id not in pending:
+                if self._pending_count >= self.max_pending:
+                    self.dropped_count += 1
+                    logger.warning(
+                        "Too many identities waiting to be sent to integrations, "
+                        "dropping identity %d.",
+                        identity.id,
+                    )
+                    return False
+                self._pending_count += 1
+
+            pending[identity.id] = (identity, feature_states)
+            self._wrapper_factories[key] = get_wrapper
+            is_full = len(pending) >= self.batch_size
+
+        if is_full:
+            self._flusher.wake()
+        return True
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            wrapper_factories, self._wrapper_factories = self._wrapper_factories, {}
+            self._pending_count = 0
+
+        for key, identities in pending.items():
+            try:
+                self._send(wrapper_factories[key](), list(identities.values()))
+            except Exception:
+                logger.exception(
+                    "Failed to send %d identities to %s.", len(identities), key[0]
+                )
+
+    def _send(
+        self,
+        wrapper: "AbstractBaseIdentityIntegrationWrapper",
+        identities: typing.List[typing.Tuple["Identity", typing.List["FeatureState"]]],
+    ) -> None:
+        users_data = [
+            wrapper.generate_user_data(identity=identity, feature_states=feature_states)
+            for identity, feature_states in identities
+        ]
+        for start in range(0, len(users_data), self.batch_size):
+            end = start + self.batch_size
+            wrapper.identify_users(users_data[start:end])
+
+
+def get_identify_batcher() -> IdentifyBatcher:
+    return _get_identify_batcher(
+        settings.INTEGRATIONS_IDENTIFY_FLUSH_INTERVAL_SECONDS,
+        settings.INTEGRATIONS_IDENTIFY_BATCH_SIZE,
+        settings.INTEGRATIONS_IDENTIFY_MAX_PENDING,
+    )
+
+
+def get_integrations_session() -> requests.Session:
+    return _get_integrations_session()
+
+
+@lru_cache(maxsize=None)
+def _get_identify_batcher(
+    flush_interval: float, batch_size: int, max_pending: int
+) -> IdentifyBatcher:
+    return IdentifyBatcher(flush_interval, batch_size, max_pending)
+
+
+@lru_cache(maxsize=None)
+def _get_integrations_session() -> requests.Session:
+    # batches are sent by a single thread, so a connection to each host is enough
+    return requests.Session()
@@ -13,7 +13,7 @@ class AbstractBaseEventIntegrationWrapper(ABC):
     def _track_event(self, event: dict) -> None:
         raise NotImplementedError()
 
-    @postpone
+    @postpone(queue_name="integrations")
     def track_event_async(self, event: dict) -> None:
         self._track_event(event)
 
@@ -27,10 +27,18 @@ class AbstractBaseIdentityIntegrationWrapper(ABC):
     def _identify_user(self, user_data: dict) -> None:
         raise NotImplementedError()
 
-    @postpone
+    @postpone(queue_name="integrations")
     def identify_user_async(self, data: dict) -> None:
         self._identify_user(data)
 
+    def identify_users(self, users_data: typing.List[dict]) -> None:
+        """
+        Send the data of many users. Integrations with a batch API override this to
+        send them in a single request.
+        """
+        for user_data in users_data:
+            self._identify_user(user_data)
+
     @abstractmethod
     def generate_user_data(
         self, identity: "Identity", feature_states: typing.List["FeatureState"]
@@ -2,9 +2,11 @@ import logging
 import typing
 
 import requests
+from django.conf import settings
 
 from environments.identities.models import Identity
 from features.models import FeatureState
+from integrations.common.batching import get_integrations_session
 from integrations.common.wrapper import AbstractBaseIdentityIntegrationWrapper
 
 from .models import HeapConfiguration
@@ -20,9 +22,30 @@ class HeapWrapper(AbstractBaseIdentityIntegrationWrapper):
         self.url = f"{HEAP_API_URL}/api/track"
 
     def _identify_user(self, user_data: dict) -> None:
-        response = requests.post(self.url, json=user_data)
+        response = requests.post(
+            self.url,
+            json=user_data,
+            timeout=settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS,
+        )
         logger.debug("Sent event to Heap. Response code was: %s" % response.status_code)
 
+    def identify_users(self, users_data: typing.List[dict]) -> None:
+        # the bulk form of the track endpoint takes the app id once, for all events
+        events = [
+            {key: value for key, value in user_data.items() if key != "app_id"}
+            for user_data in users_data
+        ]
+        response = get_integrations_session().post(
+            self.url,
+            json={"app_id": self.api_key, "events": events},
+            timeout=settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS,
+        )
+        logger.debug(
+            "Sent %d events to Heap. Response code was: %s",
+            len(events),
+            response.status_code,
+        )
+
     def generate_user_data(
         self, identity: Identity, feature_states: typing.List[FeatureState]
     ) -> dict:
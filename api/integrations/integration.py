@@ -1,4 +1,9 @@
+from functools import partial
+
+from django.conf import settings
+
 from integrations.amplitude.amplitude import AmplitudeWrapper
+from integrations.common.batching import get_identify_batcher
 from integrations.heap.heap import HeapWrapper
 from integrations.mixpanel.mixpanel import MixpanelWrapper
 from integrations.rudderstack.rudderstack import RudderstackWrapper
@@ -20,6 +25,15 @@ def identify_integrations(identity, all_feature_states):
         config = getattr(identity.environment, integration.get("relation_name"), None)
         if config:
             wrapper = integration.get("wrapper")
+            if settings.BATCH_IDENTITY_INTEGRATIONS:
+                get_identify_batcher().add(
+                    (integration.get("relation_name"), config.id),
+                    partial(wrapper, config),
+                    identity,
+                    all_feature_states,
+                )
+                continue
+
             wrapper_instance = wrapper(config)
             user_data = wrapper_instance.generate_user_data(
                 identity=identity, feature_states=all_feature_states
@@ -3,9 +3,11 @@ import logging
 import typing
 
 import requests
+from django.conf import settings
 
 from environments.identities.models import Identity
 from features.models import FeatureState
+from integrations.common.batching import get_integrations_session
 from integrations.common.wrapper import AbstractBaseIdentityIntegrationWrapper
 
 from .models import MixpanelConfiguration
@@ -29,13 +31,33 @@ class MixpanelWrapper(AbstractBaseIdentityIntegrationWrapper):
 
     def _identify_user(self, user_data: dict) -> None:
         data = {"data": json.dumps(user_data)}
-        response = requests.post(self.url, headers=self.headers, data=data)
+        response = requests.post(
+            self.url,
+            headers=self.headers,
+            data=data,
+            timeout=settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS,
+        )
 
         logger.debug(
             "Sent event to Mixpanel. Response code was: %s" % response.status_code
         )
         logger.debug("Sent event to Mixpanel. Body code was: %s" % response.content)
 
+    def identify_users(self, users_data: typing.List[dict]) -> None:
+        # the engage endpoint accepts a list of profile updates
+        data = {"data": json.dumps(users_data)}
+        response = get_integrations_session().post(
+            self.url,
+            headers=self.headers,
+            data=data,
+            timeout=settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS,
+        )
+        logger.debug(
+            "Sent %d users to Mixpanel. Response code was: %s",
+            len(users_data),
+            response.status_code,
+        )
+
     def generate_user_data(
         self, identity: Identity, feature_states: typing.List[FeatureState]
     ) -> dict:
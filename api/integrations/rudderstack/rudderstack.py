@@ -1,5 +1,6 @@
 import logging
 import typing
+from functools import lru_cache
 
 import rudder_analytics
 
@@ -14,12 +15,20 @@ logger = logging.getLogger(__name__)
 
 class RudderstackWrapper(AbstractBaseIdentityIntegrationWrapper):
     def __init__(self, config: RudderstackConfiguration):
+        self.api_key = config.api_key
+        self.base_url = config.base_url
         rudder_analytics.write_key = config.api_key
         rudder_analytics.data_plane_url = config.base_url
 
     def _identify_user(self, user_data: dict) -> None:
         rudder_analytics.identify(**user_data)
 
+    def identify_users(self, users_data: typing.List[dict]) -> None:
+        client = get_batching_client(self.api_key, self.base_url)
+        for user_data in users_data:
+            client.identify(**user_data)
+        client.flush()
+
     def generate_user_data(
         self, identity: Identity, feature_states: typing.List[FeatureState]
     ) -> dict:
@@ -35,3 +44,9 @@ class RudderstackWrapper(AbstractBaseIdentityIntegrationWrapper):
             "user_id": identity.identifier,
             "traits": feature_properties,
         }
+
+
+@lru_cache(maxsize=None)
+def get_batching_client(api_key: str, base_url: str) -> rudder_analytics.Client:
+    # unlike the module level client, there is one of these for each configuration
+    return rudder_analytics.Client(api_key, host=base_url)
@@ -1,5 +1,6 @@
 import logging
 import typing
+from functools import lru_cache
 
 from analytics.client import Client as SegmentClient
 from environments.identities.models import Identity
@@ -13,13 +14,20 @@ logger = logging.getLogger(__name__)
 
 class SegmentWrapper(AbstractBaseIdentityIntegrationWrapper):
     def __init__(self, config: SegmentConfiguration):
-        api_key = config.api_key
-        self.analytics = SegmentClient(write_key=api_key, sync_mode=True)
+        self.api_key = config.api_key
+        self.analytics = SegmentClient(write_key=self.api_key, sync_mode=True)
 
     def _identify_user(self, data: dict) -> None:
         self.analytics.identify(**data)
         logger.debug("Sent event to Segment.")
 
+    def identify_users(self, users_data: typing.List[dict]) -> None:
+        client = get_batching_client(self.api_key)
+        for user_data in users_data:
+            client.identify(**user_data)
+        client.flush()
+        logger.debug("Sent %d users to Segment.", len(users_data))
+
     def generate_user_data(
         self, identity: Identity, feature_states: typing.List[FeatureState]
     ) -> dict:
@@ -35,3 +43,9 @@ class SegmentWrapper(AbstractBaseIdentityIntegrationWrapper):
             "user_id": identity.identifier,
             "traits": feature_properties,
         }
+
+
+@lru_cache(maxsize=None)
+def get_batching_client(api_key: str) -> SegmentClient:
+    # the client queues calls and sends them, in batches, from its own thread
+    return SegmentClient(write_key=api_key)
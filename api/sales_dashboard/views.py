@@ -1,6 +1,8 @@
 import json
 
-from app_analytics.influxdb_wrapper import (
+from app_analytics.usage import (
+    ORGANISATION_USAGE_RANGES,
+    TOP_ORGANISATIONS_QUERIES,
     get_event_list_for_organisation,
     get_events_for_organisation,
     get_top_organisations,
@@ -60,8 +62,8 @@ class OrganisationList(ListView):
         # Annotate the queryset with the organisations usage for the given time periods
         # and order the queryset with it. Note: this is done as late as possible to
         # reduce the impact of the query.
-        if settings.INFLUXDB_TOKEN:
-            for date_range, limit in (("30d", ""), ("7d", ""), ("24h", "100")):
+        if settings.ANALYTICS_ENABLED:
+            for date_range, limit in TOP_ORGANISATIONS_QUERIES:
                 key = f"num_{date_range}_calls"
                 org_calls = get_top_organisations(date_range, limit)
                 if org_calls:
@@ -147,17 +149,15 @@ def organisation_info(request, organisation_id):
         "flags": mark_safe(json.dumps(event_list["flags"])),
         "labels": mark_safe(json.dumps(labels)),
         "api_calls": {
-            # TODO: this could probably be reduced to a single influx request
-            #  rather than 3
             range_: get_events_for_organisation(organisation_id, date_range=range_)
-            for range_ in ("24h", "7d", "30d")
+            for range_ in ORGANISATION_USAGE_RANGES
         },
         "identity_count_dict": identity_count_dict,
         "identity_migration_status_dict": identity_migration_status_dict,
     }
 
-    # If self hosted and running without an Influx DB data store, we dont want to/cant show usage
-    if settings.INFLUXDB_TOKEN:
+    # If self hosted and running without an analytics data store, we dont want to/cant show usage
+    if settings.ANALYTICS_ENABLED:
         event_list, labels = get_event_list_for_organisation(organisation_id)
         context["event_list"] = event_list
         context["traits"] = mark_safe(json.dumps(event_list["traits"]))
@@ -14,6 +14,15 @@ function serve() {
              --access-logfile $ACCESS_LOG_LOCATION \
              app.wsgi
 }
+function serve_asgi() {
+    gunicorn --bind 0.0.0.0:8000 \
+             --worker-class uvicorn.workers.UvicornWorker \
+             --worker-tmp-dir /dev/shm \
+             --timeout ${GUNICORN_TIMEOUT:-30} \
+             --workers ${GUNICORN_WORKERS:-3} \
+             --access-logfile $ACCESS_LOG_LOCATION \
+             app.asgi:application
+}
 function migrate_identities(){
     python manage.py migrate_to_edge $1
 }
@@ -21,6 +30,8 @@ if [ "$1" == "migrate" ]; then
     migrate
 elif [ "$1" == "serve" ]; then
     serve
+elif [ "$1" == "serve-asgi" ]; then
+    serve_asgi
 elif [ "$1" == "migrate_identities" ]; then
     migrate_identities $2
 elif [ "$1" == "migrate-and-serve" ]; then
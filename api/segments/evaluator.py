@@ -0,0 +1,485 @@
+"""
+Compiles segments into immutable, pre-typed predicate trees so that identities can
+be evaluated against them without touching the ORM or re-parsing condition values
+on every call.
+"""
+import operator
+import re
+import typing
+from dataclasses import dataclass, field
+
+from core.constants import BOOLEAN, FLOAT, INTEGER
+from django.conf import settings
+
+from environments.identities.helpers import (
+    get_hashed_percentage_for_object_ids,
+    get_hashed_percentages_for_object_ids,
+)
+from projects.models import project_segments_cache
+from segments.models import (
+    CONTAINS,
+    EQUAL,
+    GREATER_THAN,
+    GREATER_THAN_INCLUSIVE,
+    LESS_THAN,
+    LESS_THAN_INCLUSIVE,
+    NOT_CONTAINS,
+    NOT_EQUAL,
+    PERCENTAGE_SPLIT,
+    REGEX,
+    Condition,
+    Segment,
+    SegmentRule,
+)
+
+if typing.TYPE_CHECKING:
+    from environments.identities.traits.models import Trait
+    from projects.models import Project
+
+TraitsByKey = typing.Mapping[str, "Trait"]
+# the hashed percentage of an identity for each (identity dependent) segment id
+HashedPercentages = typing.Mapping[int, float]
+
+_NUMERIC_OPERATORS = {
+    EQUAL: operator.eq,
+    GREATER_THAN: operator.gt,
+    GREATER_THAN_INCLUSIVE: operator.ge,
+    LESS_THAN: operator.lt,
+    LESS_THAN_INCLUSIVE: operator.le,
+    NOT_EQUAL: operator.ne,
+}
+_BOOLEAN_OPERATORS = {EQUAL: operator.eq, NOT_EQUAL: operator.ne}
+_STRING_OPERATORS = {
+    EQUAL: operator.eq,
+    NOT_EQUAL: operator.ne,
+    CONTAINS: lambda value, operand: operand in value,
+    NOT_CONTAINS: lambda value, operand: operand not in value,
+}
+
+
+def _parse_or_none(parse_func: typing.Callable, value: str) -> typing.Any:
+    try:
+        return parse_func(value)
+    except ValueError:
+        return None
+
+
+def _parse_boolean(value: str) -> typing.Optional[bool]:
+    if value in ("False", "false", "0"):
+        return False
+    elif value in ("True", "true", "1"):
+        return True
+    return None
+
+
+def _compile_regex(value: str) -> typing.Optional[typing.Pattern]:
+    try:
+        return re.compile(value)
+    except re.error:
+        return None
+
+
+@dataclass(frozen=True)
+class CompiledCondition:
+    """
+    A condition with its operand parsed once for each of the trait value types it
+    can be compared against. An operand of None means the condition value could not
+    be parsed as that type and hence the condition can never match it.
+    """
+
+    operator: str
+    property: typing.Optional[str]
+    segment_id: typing.Optional[int]
+    integer_operand: typing.Optional[int] = None
+    float_operand: typing.Optional[float] = None
+    boolean_operand: typing.Optional[bool] = None
+    string_operand: typing.Optional[str] = None
+    regex: typing.Optional[typing.Pattern] = None
+    percentage: typing.Optional[float] = None
+
+    @classmethod
+    def from_condition(
+        cls, condition: Condition, segment_id: typing.Optional[int]
+    ) -> "CompiledCondition":
+        value = str(condition.value)
+
+        if condition.operator == PERCENTAGE_SPLIT:
+            float_value = _parse_or_none(float, value)
+            return cls(
+                operator=condition.operator,
+                property=condition.property,
+                segment_id=segment_id,
+                percentage=float_value / 100.0 if float_value is not None else None,
+            )
+
+        return cls(
+            operator=condition.operator,
+            property=condition.property,
+            segment_id=segment_id,
+            integer_operand=_parse_or_none(int, value),
+            float_operand=_parse_or_none(float, value),
+            boolean_operand=_parse_boolean(value),
+            string_operand=value,
+            regex=_compile_regex(value) if condition.operator == REGEX else None,
+        )
+
+    @property
+    def is_identity_dependent(self) -> bool:
+        return self.operator == PERCENTAGE_SPLIT
+
+    def does_identity_match(
+        self,
+        identity_id: int,
+        traits: TraitsByKey,
+        hashed_percentages: HashedPercentages = None,
+    ) -> bool:
+        if self.operator == PERCENTAGE_SPLIT:
+            if self.percentage is None:
+                return False
+            hashed_percentage = (hashed_percentages or {}).get(self.segment_id)
+            if hashed_percentage is None:
+                hashed_percentage = get_hashed_percentage_for_object_ids(
+                    object_ids=[self.segment_id, identity_id]
+                )
+            return hashed_percentage <= self.percentage
+
+        trait = traits.get(self.property)
+        if trait is None:
+            return False
+
+        if trait.value_type == INTEGER:
+            return self._compare(
+                _NUMERIC_OPERATORS, trait.integer_value, self.integer_operand
+            )
+        elif trait.value_type == FLOAT:
+            return self._compare(
+                _NUMERIC_OPERATORS, trait.float_value, self.float_operand
+            )
+        elif trait.value_type == BOOLEAN:
+            return self._compare(
+                _BOOLEAN_OPERATORS, trait.boolean_value, self.boolean_operand
+            )
+        elif self.operator == REGEX:
+            return (
+                self.regex is not None
+                and self.regex.match(trait.string_value) is not None
+            )
+        return self._compare(_STRING_OPERATORS, trait.string_value, self.string_operand)
+
+    def _compare(
+        self,
+        operators: typing.Mapping[str, typing.Callable],
+        value: typing.Any,
+        operand: typing.Any,
+    ) -> bool:
+        compare = operators.get(self.operator)
+        if compare is None or operand is None:
+            return False
+        return compare(value, operand)
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    type: str
+    conditions: typing.Tuple[CompiledCondition, ...]
+    rules: typing.Tuple["CompiledRule", ...]
+
+    @classmethod
+    def from_rule(
+        cls, rule: SegmentRule, segment_id: typing.Optional[int]
+    ) -> "CompiledRule":
+        return cls(
+            type=rule.type,
+            conditions=tuple(
+                CompiledCondition.from_condition(condition, segment_id)
+                for condition in rule.conditions.all()
+            ),
+            rules=tuple(
+                cls.from_rule(child_rule, segment_id) for child_rule in rule.rules.all()
+            ),
+        )
+
+    @property
+    def is_identity_dependent(self) -> bool:
+        return any(
+            condition.is_identity_dependent for condition in self.conditions
+        ) or any(rule.is_identity_dependent for rule in self.rules)
+
+    def does_identity_match(
+        self,
+        identity_id: int,
+        traits: TraitsByKey,
+        hashed_percentages: HashedPercentages = None,
+    ) -> bool:
+        return self._do_conditions_match(
+            identity_id, traits, hashed_percentages
+        ) and all(
+            rule.does_identity_match(identity_id, traits, hashed_percentages)
+            for rule in self.rules
+        )
+
+    def _do_conditions_match(
+        self,
+        identity_id: int,
+        traits: TraitsByKey,
+        hashed_percentages: typing.Optional[HashedPercentages],
+    ) -> bool:
+        if not self.conditions:
+            return True
+
+        matches = (
+            condition.does_identity_match(identity_id, traits, hashed_percentages)
+            for condition in self.conditions
+        )
+        if self.type == SegmentRule.ALL_RULE:
+            return all(matches)
+        elif self.type == SegmentRule.ANY_RULE:
+            return any(matches)
+        elif self.type == SegmentRule.NONE_RULE:
+            return not any(matches)
+
+        return False
+
+
+@dataclass(frozen=True)
+class CompiledSegment:
+    id: int
+    rules: typing.Tuple[CompiledRule, ...]
+    # keep a reference to the model so that callers can be handed back the segment
+    # objects they expect, but exclude it from equality / hashing
+    segment: Segment = field(compare=False, repr=False)
+
+    @classmethod
+    def from_segment(cls, segment: Segment) -> "CompiledSegment":
+        return cls(
+            id=segment.id,
+            rules=tuple(
+                CompiledRule.from_rule(rule, segment.id) for rule in segment.rules.all()
+            ),
+            segment=segment,
+        )
+
+    @property
+    def is_identity_dependent(self) -> bool:
+        """
+        Whether the result depends on the identity itself (i.e. via a percentage
+        split) rather than only on its traits.
+        """
+        return any(rule.is_identity_dependent for rule in self.rules)
+
+    def does_identity_match(
+        self,
+        identity_id: int,
+        traits: TraitsByKey,
+        hashed_percentages: HashedPercentages = None,
+    ) -> bool:
+        """
+        :param hashed_percentages: the hashed percentages of the identity for
+            percentage splits, keyed on segment id, see get_hashed_percentages.
+            Any that aren't given are calculated when needed.
+        """
+        return bool(self.rules) and all(
+            rule.does_identity_match(identity_id, traits, hashed_percentages)
+            for rule in self.rules
+        )
+
+
+def get_traits_by_key(traits: typing.Iterable["Trait"]) -> typing.Dict[str, "Trait"]:
+    """
+    Index the given traits by key. If a key is duplicated (which is only possible for
+    traits that aren't persisted), the first trait wins to match the behaviour of the
+    previous linear search.
+    """
+    traits_by_key = {}
+    for trait in traits:
+        traits_by_key.setdefault(trait.trait_key, trait)
+    return traits_by_key
+
+
+def compile_segments(
+    segments: typing.Iterable[Segment],
+) -> typing.Tuple[CompiledSegment, ...]:
+    return tuple(CompiledSegment.from_segment(segment) for segment in segments)
+
+
+def get_compiled_segments_from_cache(
+    project: "Project",
+) -> typing.Tuple[CompiledSegment, ...]:
+    """
+    Get the compiled segments for a project, respecting the same cache timeout as
+    the project segments themselves.
+    """
+    cache_key = f"compiled-segments-{project.id}"
+    compiled_segments = project_segments_cache.get(cache_key)
+
+    if compiled_segments is None:
+        compiled_segments = compile_segments(project.get_segments_from_cache())
+        project_segments_cache.set(
+            cache_key,
+            compiled_segments,
+            timeout=settings.CACHE_PROJECT_SEGMENTS_SECONDS,
+        )
+
+    return compiled_segments
+
+
+def get_compiled_segment(segment: Segment) -> CompiledSegment:
+    """
+    Get the compiled version of the given segment, from the compiled segments of its
+    project when they are cached.
+    """
+    if settings.CACHE_PROJECT_SEGMENTS_SECONDS > 0:
+        for compiled_segment in get_compiled_segments_from_cache(segment.project):
+            if compiled_segment.id == segment.id:
+                return compiled_segment
+
+    # e.g. the segment has been created since the project's segments were cached
+    return CompiledSegment.from_segment(segment)
+
+
+def get_compiled_rule(rule: SegmentRule) -> CompiledRule:
+    """
+    Get the compiled version of the given rule, cached with the same timeout as the
+    project segments.
+    """
+    return project_segments_cache.get_or_set(
+        f"compiled-segment-rule-{rule.id}",
+        lambda: _compile_rule(rule),
+        timeout=settings.CACHE_PROJECT_SEGMENTS_SECONDS,
+    )
+
+
+def get_compiled_condition(condition: Condition) -> CompiledCondition:
+    """
+    Get the compiled version of the given condition, cached with the same timeout as
+    the project segments.
+    """
+    return project_segments_cache.get_or_set(
+        f"compiled-segment-condition-{condition.id}",
+        lambda: _compile_condition(condition),
+        timeout=settings.CACHE_PROJECT_SEGMENTS_SECONDS,
+    )
+
+
+def get_matching_segments(
+    compiled_segments: typing.Iterable[CompiledSegment],
+    identity_id: int,
+    traits: typing.Iterable["Trait"],
+) -> typing.List[Segment]:
+    compiled_segments = tuple(compiled_segments)
+    traits_by_key = get_traits_by_key(traits)
+    hashed_percentages = get_hashed_percentages(compiled_segments, [identity_id])[
+        identity_id
+    ]
+    return [
+        compiled_segment.segment
+        for compiled_segment in compiled_segments
+        if compiled_segment.does_identity_match(
+            identity_id, traits_by_key, hashed_percentages
+        )
+    ]
+
+
+def get_matching_segments_in_bulk(
+    compiled_segments: typing.Iterable[CompiledSegment],
+    traits_by_identity_id: typing.Mapping[int, typing.Iterable["Trait"]],
+) -> typing.Dict[int, typing.List[Segment]]:
+    """
+    Get the matching segments for many identities at once, keyed on identity id.
+    Segments that only depend on traits are evaluated once per distinct set of
+    traits, rather than once per identity.
+    """
+    compiled_segments = tuple(compiled_segments)
+    identity_dependent_segment_ids = {
+        cs.id for cs in compiled_segments if cs.is_identity_dependent
+    }
+    hashed_percentages_by_identity_id = get_hashed_percentages(
+        compiled_segments, list(traits_by_identity_id)
+    )
+
+    trait_only_matches_by_signature = {}
+    matching_segments = {}
+    for identity_id, traits in traits_by_identity_id.items():
+        traits_by_key = get_traits_by_key(traits)
+
+        signature = _get_traits_signature(traits_by_key)
+        trait_only_matches = trait_only_matches_by_signature.get(signature)
+        if trait_only_matches is None:
+            trait_only_matches = trait_only_matches_by_signature[signature] = {
+                cs.id
+                for cs in compiled_segments
+                if cs.id not in identity_dependent_segment_ids
+                and cs.does_identity_match(identity_id, traits_by_key)
+            }
+
+        matching_segments[identity_id] = [
+            cs.segment
+            for cs in compiled_segments
+            if cs.id in trait_only_matches
+            or (
+                cs.id in identity_dependent_segment_ids
+                and cs.does_identity_match(
+                    identity_id,
+                    traits_by_key,
+                    hashed_percentages_by_identity_id[identity_id],
+                )
+            )
+        ]
+
+    return matching_segments
+
+
+def get_hashed_percentages(
+    compiled_segments: typing.Iterable[CompiledSegment],
+    identity_ids: typing.Iterable[int],
+) -> typing.Dict[int, typing.Dict[int, float]]:
+    """
+    Get the hashed percentages used by the percentage splits of the given segments
+    for each of the given identities, in a single batch.
+
+    :return: the hashed percentage for each identity dependent segment id, keyed on
+        identity id
+    """
+    identity_ids = list(identity_ids)
+    segment_ids = [cs.id for cs in compiled_segments if cs.is_identity_dependent]
+    object_ids_list = [
+        (segment_id, identity_id)
+        for identity_id in identity_ids
+        for segment_id in segment_ids
+    ]
+    values = iter(get_hashed_percentages_for_object_ids(object_ids_list))
+    return {
+        identity_id: {segment_id: next(values) for segment_id in segment_ids}
+        for identity_id in identity_ids
+    }
+
+
+def _compile_rule(rule: SegmentRule) -> CompiledRule:
+    # the segment is only needed to seed the hash of percentage split conditions, so
+    # it is only looked up (by walking up the parent rules) for rules that have them
+    compiled_rule = CompiledRule.from_rule(rule, segment_id=None)
+    if not compiled_rule.is_identity_dependent:
+        return compiled_rule
+    return CompiledRule.from_rule(rule, segment_id=_get_segment_id(rule))
+
+
+def _compile_condition(condition: Condition) -> CompiledCondition:
+    segment_id = (
+        _get_segment_id(condition.rule)
+        if condition.operator == PERCENTAGE_SPLIT
+        else None
+    )
+    return CompiledCondition.from_condition(condition, segment_id=segment_id)
+
+
+def _get_segment_id(rule: SegmentRule) -> int:
+    return rule.segment_id or rule.get_segment().id
+
+
+def _get_traits_signature(traits_by_key: TraitsByKey) -> typing.Tuple:
+    return tuple(
+        sorted(
+            (key, trait.value_type, trait.get_trait_value())
+            for key, trait in traits_by_key.items()
+        )
+    )
@@ -1,13 +1,8 @@
-import re
 import typing
 
-from core.constants import BOOLEAN, FLOAT, INTEGER
 from django.core.exceptions import ValidationError
 from django.db import models
 
-from environments.identities.helpers import (
-    get_hashed_percentage_for_object_ids,
-)
 from projects.models import Project
 
 if typing.TYPE_CHECKING:
@@ -43,9 +38,13 @@ class Segment(models.Model):
     def does_identity_match(
         self, identity: "Identity", traits: typing.List["Trait"] = None
     ) -> bool:
-        rules = self.rules.all()
-        return rules.count() > 0 and all(
-            rule.does_identity_match(identity, traits) for rule in rules
+        # imported here to avoid a circular import since the evaluator is built
+        # on top of the models in this module
+        from segments.evaluator import get_compiled_segment, get_traits_by_key
+
+        traits = identity.identity_traits.all() if traits is None else traits
+        return get_compiled_segment(self).does_identity_match(
+            identity.id, get_traits_by_key(traits)
         )
 
 
@@ -83,29 +82,11 @@ class SegmentRule(models.Model):
     def does_identity_match(
         self, identity: "Identity", traits: typing.List["Trait"] = None
     ) -> bool:
-        matches_conditions = False
-        conditions = self.conditions.all()
-
-        if conditions.count() == 0:
-            matches_conditions = True
-        elif self.type == self.ALL_RULE:
-            matches_conditions = all(
-                condition.does_identity_match(identity, traits)
-                for condition in conditions
-            )
-        elif self.type == self.ANY_RULE:
-            matches_conditions = any(
-                condition.does_identity_match(identity, traits)
-                for condition in conditions
-            )
-        elif self.type == self.NONE_RULE:
-            matches_conditions = not any(
-                condition.does_identity_match(identity, traits)
-                for condition in conditions
-            )
+        from segments.evaluator import get_compiled_rule, get_traits_by_key
 
-        return matches_conditions and all(
-            rule.does_identity_match(identity, traits) for rule in self.rules.all()
+        traits = identity.identity_traits.all() if traits is None else traits
+        return get_compiled_rule(self).does_identity_match(
+            identity.id, get_traits_by_key(traits)
         )
 
     def get_segment(self):
@@ -154,106 +135,19 @@ class Condition(models.Model):
     def does_identity_match(
         self, identity: "Identity", traits: typing.List["Trait"] = None
     ) -> bool:
+        from segments.evaluator import (
+            get_compiled_condition,
+            get_traits_by_key,
+        )
+
+        compiled_condition = get_compiled_condition(self)
         if self.operator == PERCENTAGE_SPLIT:
-            return self._check_percentage_split_operator(identity)
+            # the traits are not needed at all for percentage splits
+            return compiled_condition.does_identity_match(identity.id, {})
 
         # we allow passing in traits to handle when they aren't
         # persisted for certain organisations
         traits = identity.identity_traits.all() if traits is None else traits
-
-        for trait in traits:
-            if trait.trait_key == self.property:
-                if trait.value_type == INTEGER:
-                    return self.check_integer_value(trait.integer_value)
-                if trait.value_type == FLOAT:
-                    return self.check_float_value(trait.float_value)
-                elif trait.value_type == BOOLEAN:
-                    return self.check_boolean_value(trait.boolean_value)
-                else:
-                    return self.check_string_value(trait.string_value)
-
-    def _check_percentage_split_operator(self, identity):
-        try:
-            float_value = float(self.value) / 100.0
-        except ValueError:
-            return False
-
-        segment = self.rule.get_segment()
-        return (
-            get_hashed_percentage_for_object_ids(object_ids=[segment.id, identity.id])
-            <= float_value
+        return compiled_condition.does_identity_match(
+            identity.id, get_traits_by_key(traits)
         )
-
-    def check_integer_value(self, value: int) -> bool:
-        try:
-            int_value = int(str(self.value))
-        except ValueError:
-            return False
-
-        if self.operator == EQUAL:
-            return value == int_value
-        elif self.operator == GREATER_THAN:
-            return value > int_value
-        elif self.operator == GREATER_THAN_INCLUSIVE:
-            return value >= int_value
-        elif self.operator == LESS_THAN:
-            return value < int_value
-        elif self.operator == LESS_THAN_INCLUSIVE:
-            return value <= int_value
-        elif self.operator == NOT_EQUAL:
-            return value != int_value
-
-        return False
-
-    def check_float_value(self, value: float) -> bool:
-        try:
-            float_value = float(str(self.value))
-        except ValueError:
-            return False
-
-        if self.operator == EQUAL:
-            return value == float_value
-        elif self.operator == GREATER_THAN:
-            return value > float_value
-        elif self.operator == GREATER_THAN_INCLUSIVE:
-            return value >= float_value
-        elif self.operator == LESS_THAN:
-            return value < float_value
-        elif self.operator == LESS_THAN_INCLUSIVE:
-            return value <= float_value
-        elif self.operator == NOT_EQUAL:
-            return value != float_value
-
-        return False
-
-    def check_boolean_value(self, value: bool) -> bool:
-        if self.value in ("False", "false", "0"):
-            bool_value = False
-        elif self.value in ("True", "true", "1"):
-            bool_value = True
-        else:
-            return False
-
-        if self.operator == EQUAL:
-            return value == bool_value
-        elif self.operator == NOT_EQUAL:
-            return value != bool_value
-
-        return False
-
-    def check_string_value(self, value: str) -> bool:
-        try:
-            str_value = str(self.value)
-        except ValueError:
-            return False
-
-        if self.operator == EQUAL:
-            return value == str_value
-        elif self.operator == NOT_EQUAL:
-            return value != str_value
-        elif self.operator == CONTAINS:
-            return str_value in value
-        elif self.operator == NOT_CONTAINS:
-            return str_value not in value
-        elif self.operator == REGEX:
-            return re.compile(str(self.value)).match(value) is not None
@@ -0,0 +1,265 @@
+import pytest
+from core.constants import BOOLEAN, FLOAT, INTEGER, STRING
+
+from environments.identities.helpers import (
+    get_hashed_percentage_for_object_ids,
+)
+from environments.identities.traits.models import Trait
+from segments import evaluator as segments_evaluator
+from segments.evaluator import (
+    CompiledCondition,
+    CompiledSegment,
+    compile_segments,
+    get_compiled_segments_from_cache,
+    get_hashed_percentages,
+    get_matching_segments,
+    get_matching_segments_in_bulk,
+    get_traits_by_key,
+)
+from segments.models import (
+    CONTAINS,
+    EQUAL,
+    GREATER_THAN,
+    GREATER_THAN_INCLUSIVE,
+    LESS_THAN,
+    NOT_CONTAINS,
+    NOT_EQUAL,
+    PERCENTAGE_SPLIT,
+    REGEX,
+    Condition,
+    Segment,
+    SegmentRule,
+)
+
+
+def _trait(value_type, **value_kwargs):
+    return Trait(trait_key="key", value_type=value_type, **value_kwargs)
+
+
+@pytest.mark.parametrize(
+    "operator, condition_value, trait, expected_result",
+    (
+        (EQUAL, "5", _trait(INTEGER, integer_value=5), True),
+        (GREATER_THAN, "5", _trait(INTEGER, integer_value=5), False),
+        (GREATER_THAN_INCLUSIVE, "5", _trait(INTEGER, integer_value=5), True),
+        (LESS_THAN, "5", _trait(INTEGER, integer_value=4), True),
+        (CONTAINS, "5", _trait(INTEGER, integer_value=5), False),
+        (EQUAL, "not-an-int", _trait(INTEGER, integer_value=5), False),
+        (GREATER_THAN, "1.5", _trait(FLOAT, float_value=2.0), True),
+        (EQUAL, "1.5", _trait(FLOAT, float_value=1.5), True),
+        (EQUAL, "true", _trait(BOOLEAN, boolean_value=True), True),
+        (NOT_EQUAL, "0", _trait(BOOLEAN, boolean_value=True), True),
+        (EQUAL, "yes", _trait(BOOLEAN, boolean_value=True), False),
+        (EQUAL, "foo", _trait(STRING, string_value="foo"), True),
+        (NOT_EQUAL, "foo", _trait(STRING, string_value="foo"), False),
+        (CONTAINS, "oo", _trait(STRING, string_value="foo"), True),
+        (NOT_CONTAINS, "oo", _trait(STRING, string_value="foo"), False),
+        (REGEX, r"[a-z]+\d", _trait(STRING, string_value="foo1"), True),
+        (REGEX, r"\d+", _trait(STRING, string_value="foo"), False),
+        (REGEX, r"[invalid", _trait(STRING, string_value="[invalid"), False),
+        (GREATER_THAN, "foo", _trait(STRING, string_value="goo"), False),
+    ),
+)
+def test_compiled_condition_matches_trait_value(
+    operator, condition_value, trait, expected_result
+):
+    # Given
+    condition = Condition(operator=operator, property="key", value=condition_value)
+
+    # When
+    compiled_condition = CompiledCondition.from_condition(condition, segment_id=None)
+
+    # Then
+    assert (
+        compiled_condition.does_identity_match(1, get_traits_by_key([trait]))
+        is expected_result
+    )
+
+
+def test_compiled_condition_does_not_match_missing_trait():
+    # Given
+    condition = Condition(operator=EQUAL, property="key", value="foo")
+    compiled_condition = CompiledCondition.from_condition(condition, segment_id=None)
+
+    # Then
+    assert compiled_condition.does_identity_match(1, {}) is False
+
+
+def test_compiled_percentage_split_condition_uses_segment_and_identity_ids(mocker):
+    # Given
+    mock_get_hashed_percentage = mocker.patch(
+        "segments.evaluator.get_hashed_percentage_for_object_ids", return_value=0.2
+    )
+    condition = Condition(operator=PERCENTAGE_SPLIT, value="30")
+    compiled_condition = CompiledCondition.from_condition(condition, segment_id=10)
+
+    # When
+    result = compiled_condition.does_identity_match(20, {})
+
+    # Then
+    assert result is True
+    mock_get_hashed_percentage.assert_called_once_with(object_ids=[10, 20])
+
+
+def test_get_traits_by_key_keeps_first_trait_for_duplicate_keys():
+    # Given
+    first_trait = _trait(STRING, string_value="first")
+    second_trait = _trait(STRING, string_value="second")
+
+    # Then
+    assert get_traits_by_key([first_trait, second_trait]) == {"key": first_trait}
+
+
+def test_get_matching_segments_returns_segments_in_order(project, identity):
+    # Given
+    matching_segment = Segment.objects.create(name="matching", project=project)
+    rule = SegmentRule.objects.create(
+        segment=matching_segment, type=SegmentRule.ANY_RULE
+    )
+    Condition.objects.create(rule=rule, property="age", operator=EQUAL, value="20")
+    Condition.objects.create(rule=rule, property="age", operator=EQUAL, value="21")
+    nested_rule = SegmentRule.objects.create(rule=rule, type=SegmentRule.NONE_RULE)
+    Condition.objects.create(
+        rule=nested_rule, property="plan", operator=EQUAL, value="free"
+    )
+
+    not_matching_segment = Segment.objects.create(name="not matching", project=project)
+    rule = SegmentRule.objects.create(
+        segment=not_matching_segment, type=SegmentRule.ALL_RULE
+    )
+    Condition.objects.create(rule=rule, property="age", operator=LESS_THAN, value="18")
+
+    # a segment without any rules should never match
+    Segment.objects.create(name="empty", project=project)
+
+    traits = [
+        Trait(trait_key="age", value_type=INTEGER, integer_value=21),
+        Trait(trait_key="plan", value_type=STRING, string_value="paid"),
+    ]
+
+    # When
+    segments = get_matching_segments(
+        compile_segments(project.get_segments_from_cache()),
+        identity_id=identity.id,
+        traits=traits,
+    )
+
+    # Then
+    assert segments == [matching_segment]
+
+
+def test_get_matching_segments_does_not_query_the_database(
+    project, identity, django_assert_num_queries
+):
+    # Given
+    segment = Segment.objects.create(name="segment", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=rule, property="age", operator=EQUAL, value="21")
+    compiled_segments = compile_segments(project.get_segments_from_cache())
+    traits = [Trait(trait_key="age", value_type=INTEGER, integer_value=21)]
+
+    # When
+    with django_assert_num_queries(0):
+        segments = get_matching_segments(compiled_segments, identity.id, traits)
+
+    # Then
+    assert segments == [segment]
+
+
+def test_get_compiled_segments_from_cache_uses_cache(project, settings, mocker):
+    # Given
+    settings.CACHE_PROJECT_SEGMENTS_SECONDS = 60
+    mock_cache = mocker.patch("segments.evaluator.project_segments_cache")
+    cached_segments = compile_segments([])
+    mock_cache.get.return_value = cached_segments
+
+    # When
+    compiled_segments = get_compiled_segments_from_cache(project)
+
+    # Then
+    assert compiled_segments is cached_segments
+    mock_cache.set.assert_not_called()
+
+
+def test_get_matching_segments_in_bulk_evaluates_segments_once_per_trait_set(
+    project, environment, mocker
+):
+    # Given
+    segment = Segment.objects.create(name="segment", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=rule, property="age", operator=EQUAL, value="21")
+
+    percentage_segment = Segment.objects.create(name="percentage", project=project)
+    rule = SegmentRule.objects.create(
+        segment=percentage_segment, type=SegmentRule.ALL_RULE
+    )
+    Condition.objects.create(rule=rule, operator=PERCENTAGE_SPLIT, value="100")
+
+    compiled_segments = compile_segments(project.get_segments_from_cache())
+    matching_spy = mocker.spy(CompiledSegment, "does_identity_match")
+
+    traits_by_identity_id = {
+        1: [Trait(trait_key="age", value_type=INTEGER, integer_value=21)],
+        2: [Trait(trait_key="age", value_type=INTEGER, integer_value=21)],
+        3: [Trait(trait_key="age", value_type=INTEGER, integer_value=30)],
+    }
+
+    # When
+    segments = get_matching_segments_in_bulk(compiled_segments, traits_by_identity_id)
+
+    # Then
+    assert segments == {
+        1: [segment, percentage_segment],
+        2: [segment, percentage_segment],
+        3: [percentage_segment],
+    }
+    # the trait based segment is evaluated once for each distinct set of traits
+    # and the percentage split segment is evaluated once for each identity
+    assert matching_spy.call_count == 2 + 3
+
+
+def test_get_matching_segments_hashes_percentage_splits_in_one_batch(
+    project, identity, mocker
+):
+    # Given
+    percentage_segments = []
+    for value in ("0", "100"):
+        segment = Segment.objects.create(name=f"{value}%", project=project)
+        rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+        Condition.objects.create(rule=rule, operator=PERCENTAGE_SPLIT, value=value)
+        percentage_segments.append(segment)
+    compiled_segments = compile_segments(project.get_segments_from_cache())
+
+    batch_spy = mocker.spy(segments_evaluator, "get_hashed_percentages_for_object_ids")
+    scalar_spy = mocker.spy(segments_evaluator, "get_hashed_percentage_for_object_ids")
+
+    # When
+    segments = get_matching_segments(compiled_segments, identity.id, [])
+
+    # Then
+    assert segments == [percentage_segments[1]]
+    batch_spy.assert_called_once_with(
+        [(segment.id, identity.id) for segment in percentage_segments]
+    )
+    scalar_spy.assert_not_called()
+
+
+def test_get_hashed_percentages_are_keyed_on_identity_and_segment(project):
+    # Given
+    segment = Segment.objects.create(name="percentage", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=rule, operator=PERCENTAGE_SPLIT, value="50")
+    # a segment that doesn't depend on the identity
+    Segment.objects.create(name="empty", project=project)
+    compiled_segments = compile_segments(project.get_segments_from_cache())
+
+    # When
+    hashed_percentages = get_hashed_percentages(compiled_segments, [1, 2])
+
+    # Then
+    assert hashed_percentages == {
+        identity_id: {
+            segment.id: get_hashed_percentage_for_object_ids([segment.id, identity_id])
+        }
+        for identity_id in (1, 2)
+    }
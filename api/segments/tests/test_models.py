@@ -1,12 +1,21 @@
 from unittest import TestCase, mock
 
 import pytest
+from core.constants import INTEGER
 
 from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
 from environments.models import Environment
 from organisations.models import Organisation
 from projects.models import Project
-from segments.models import PERCENTAGE_SPLIT, Condition, Segment, SegmentRule
+from segments.evaluator import get_compiled_rule
+from segments.models import (
+    EQUAL,
+    PERCENTAGE_SPLIT,
+    Condition,
+    Segment,
+    SegmentRule,
+)
 
 
 @pytest.mark.django_db
@@ -83,7 +92,7 @@ class ConditionTest(TestCase):
             segment=self.segment, type=SegmentRule.ALL_RULE
         )
 
-    @mock.patch("segments.models.get_hashed_percentage_for_object_ids")
+    @mock.patch("segments.evaluator.get_hashed_percentage_for_object_ids")
     def test_percentage_split_calculation_divides_value_by_100_before_comparison(
         self, mock_get_hashed_percentage_for_object_ids
     ):
@@ -98,3 +107,66 @@ class ConditionTest(TestCase):
 
         # Then
         assert not res
+
+
+def test_segment_does_identity_match_uses_cached_compiled_segment(
+    project, identity, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_PROJECT_SEGMENTS_SECONDS = 60
+    segment = Segment.objects.create(name="segment", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=rule, property="age", operator=EQUAL, value="21")
+    traits = [Trait(trait_key="age", value_type=INTEGER, integer_value=21)]
+    assert segment.does_identity_match(identity, traits)
+
+    # When
+    with django_assert_num_queries(0):
+        result = segment.does_identity_match(identity, traits)
+
+    # Then
+    assert result is True
+
+
+def test_nested_rule_does_identity_match_uses_cached_compiled_rule(
+    project, identity, settings, django_assert_num_queries, mocker
+):
+    # Given
+    settings.CACHE_PROJECT_SEGMENTS_SECONDS = 60
+    mocker.patch(
+        "segments.evaluator.get_hashed_percentage_for_object_ids", return_value=0.1
+    )
+    segment = Segment.objects.create(name="segment", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    nested_rule = SegmentRule.objects.create(rule=rule, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=nested_rule, operator=PERCENTAGE_SPLIT, value=50)
+    nested_rule = SegmentRule.objects.get(id=nested_rule.id)
+    assert nested_rule.does_identity_match(identity, [])
+
+    # When
+    with django_assert_num_queries(0):
+        result = nested_rule.does_identity_match(identity, [])
+
+    # Then
+    assert result is True
+    assert get_compiled_rule(nested_rule).conditions[0].segment_id == segment.id
+
+
+def test_condition_does_identity_match_uses_cached_compiled_condition(
+    project, identity, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_PROJECT_SEGMENTS_SECONDS = 60
+    segment = Segment.objects.create(name="segment", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    condition = Condition.objects.create(
+        rule=rule, operator=PERCENTAGE_SPLIT, value=100
+    )
+    assert condition.does_identity_match(identity)
+
+    # When
+    with django_assert_num_queries(0):
+        result = condition.does_identity_match(identity)
+
+    # Then
+    assert result is True
@@ -5,8 +5,9 @@ from projects.models import Project
 
 
 @pytest.fixture()
-def mock_dynamo_env_table(mocker):
-    return mocker.patch("audit.signals.dynamo_env_table")
+def mock_dynamo_env_table(mocker, settings):
+    settings.DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS = 0
+    return mocker.patch("environments.dynamodb.environment_sync.dynamo_env_table")
 
 
 @pytest.fixture()
@@ -1,17 +1,21 @@
 import json
 
+import pytest
+from django.db import transaction
 from flag_engine.django_transform.document_builders import (
     build_environment_document,
 )
 
 from audit.models import AuditLog
 from audit.signals import send_environments_to_dynamodb
+from environments.dynamodb.environment_sync import EnvironmentDocumentSyncer
 
 
 def test_send_env_to_dynamodb_from_audit_log_with_environment(
     dynamo_enabled_project,
     dynamo_enabled_project_environment_one,
     mock_dynamo_env_table,
+    django_capture_on_commit_callbacks,
 ):
     # Given
     audit_log = AuditLog.objects.create(
@@ -22,7 +26,8 @@ def test_send_env_to_dynamodb_from_audit_log_with_environment(
     batch_writer_context_manager = batch_writer.__enter__.return_value
 
     # When
-    send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
+    with django_capture_on_commit_callbacks(execute=True):
+        send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
 
     # Then
     batch_writer_context_manager.put_item.assert_called_once_with(
@@ -35,6 +40,7 @@ def test_send_env_to_dynamodb_from_audit_log_with_project(
     dynamo_enabled_project_environment_one,
     dynamo_enabled_project_environment_two,
     mock_dynamo_env_table,
+    django_capture_on_commit_callbacks,
 ):
     # Given
     audit_log = AuditLog.objects.create(project=dynamo_enabled_project)
@@ -43,7 +49,8 @@ def test_send_env_to_dynamodb_from_audit_log_with_project(
     batch_writer_context_manager = batch_writer.__enter__.return_value
 
     # When
-    send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
+    with django_capture_on_commit_callbacks(execute=True):
+        send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
 
     # Then
     # put item is called twice
@@ -70,6 +77,7 @@ def test_send_env_to_dynamodb_from_audit_log_with_environment_and_project(
     dynamo_enabled_project,
     dynamo_enabled_project_environment_one,
     mock_dynamo_env_table,
+    django_capture_on_commit_callbacks,
 ):
     # Given
     audit_log = AuditLog.objects.create(
@@ -81,9 +89,79 @@ def test_send_env_to_dynamodb_from_audit_log_with_environment_and_project(
     batch_writer_context_manager = batch_writer.__enter__.return_value
 
     # When
-    send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
+    with django_capture_on_commit_callbacks(execute=True):
+        send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
 
     # Then
     batch_writer_context_manager.put_item.assert_called_once_with(
         Item=build_environment_document(dynamo_enabled_project_environment_one)
     )
+
+
+def test_send_env_to_dynamodb_builds_each_document_once_per_sync(
+    dynamo_enabled_project,
+    dynamo_enabled_project_environment_one,
+    dynamo_enabled_project_environment_two,
+    mock_dynamo_env_table,
+    django_capture_on_commit_callbacks,
+    mocker,
+    settings,
+):
+    # Given
+    settings.DYNAMODB_ENVIRONMENT_SYNC_INTERVAL_SECONDS = 5
+    mocker.patch(
+        "environments.dynamodb.environment_sync.get_environment_document_sync_flusher"
+    )
+    syncer = EnvironmentDocumentSyncer()
+    mocker.patch(
+        "environments.dynamodb.environment_sync.get_environment_document_syncer",
+        return_value=syncer,
+    )
+    mock_dynamo_env_table.reset_mock()
+    batch_writer_context_manager = (
+        mock_dynamo_env_table.batch_writer.return_value.__enter__.return_value
+    )
+
+    # a bulk edit of many flags in both environments
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            for _ in range(10):
+                AuditLog.objects.create(
+                    environment=dynamo_enabled_project_environment_one
+                )
+                AuditLog.objects.create(project=dynamo_enabled_project)
+
+    # When
+    synced_count = syncer.sync()
+
+    # Then
+    assert synced_count == 2
+    mock_dynamo_env_table.batch_writer.assert_called_once()
+    assert batch_writer_context_manager.put_item.call_count == 2
+
+    metrics = syncer.get_metrics()
+    assert metrics["dirty"] == 0
+    assert metrics["synced"] == 2
+    assert metrics["max_lag_seconds"] > 0
+
+
+@pytest.mark.django_db
+def test_environment_document_syncer_keeps_environments_dirty_if_sync_fails(
+    dynamo_enabled_project_environment_one, mock_dynamo_env_table
+):
+    # Given
+    syncer = EnvironmentDocumentSyncer()
+    syncer.mark_dirty(environment_ids=[dynamo_enabled_project_environment_one.id])
+    mock_dynamo_env_table.batch_writer.side_effect = Exception("Unavailable")
+
+    # When
+    with pytest.raises(Exception):
+        syncer.sync()
+
+    # Then
+    assert syncer.get_metrics()["dirty"] == 1
+    assert syncer.get_metrics()["failed"] == 1
+
+    # and the environment is written by the next sync
+    mock_dynamo_env_table.batch_writer.side_effect = None
+    assert syncer.sync() == 1
@@ -0,0 +1,206 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from core.db_routers import (
+    LAG,
+    PRIMARY_DATABASE_ALIAS,
+    ReplicaRouter,
+    ReplicaSelector,
+    use_primary,
+    use_replicas,
+)
+from core.middleware.replicas import replica_routing_middleware
+from django.db import OperationalError
+
+from environments.models import Environment
+
+
+@pytest.fixture()
+def replica_selector(mocker):
+    selector = ReplicaSelector(["replica_1", "replica_2"])
+    mocker.patch("core.db_routers.get_replica_selector", return_value=selector)
+    return selector
+
+
+@pytest.fixture()
+def mock_get_replication_lag(mocker):
+    return mocker.patch("core.db_routers._get_replication_lag", return_value=0.0)
+
+
+def test_replica_router_reads_from_primary_outside_of_use_replicas(
+    replica_selector, mock_get_replication_lag
+):
+    assert ReplicaRouter().db_for_read(Environment) == PRIMARY_DATABASE_ALIAS
+
+
+def test_replica_router_reads_from_replicas_in_turn(
+    replica_selector, mock_get_replication_lag
+):
+    # Given
+    router = ReplicaRouter()
+
+    # When
+    with use_replicas():
+        aliases = [router.db_for_read(Environment) for _ in range(4)]
+
+    # Then
+    assert aliases == ["replica_1", "replica_2", "replica_1", "replica_2"]
+
+
+def test_replica_router_reads_from_primary_after_a_write(
+    replica_selector, mock_get_replication_lag
+):
+    # Given
+    router = ReplicaRouter()
+
+    with use_replicas():
+        # When
+        write_alias = router.db_for_write(Environment)
+        read_alias = router.db_for_read(Environment)
+
+    # Then
+    assert write_alias == read_alias == PRIMARY_DATABASE_ALIAS
+
+    # and the next request can read from the replicas again
+    with use_replicas():
+        assert router.db_for_read(Environment) != PRIMARY_DATABASE_ALIAS
+
+
+def test_replica_router_reads_from_primary_inside_use_primary(
+    replica_selector, mock_get_replication_lag
+):
+    # Given
+    router = ReplicaRouter()
+
+    with use_replicas():
+        # When
+        with use_primary():
+            primary_alias = router.db_for_read(Environment)
+        replica_alias = router.db_for_read(Environment)
+
+    # Then
+    assert primary_alias == PRIMARY_DATABASE_ALIAS
+    assert replica_alias != PRIMARY_DATABASE_ALIAS
+
+
+def test_replica_selector_skips_unavailable_and_lagging_replicas(mocker):
+    # Given
+    lags = {"replica_1": OperationalError(), "replica_2": 10.0, "replica_3": 1.0}
+
+    def get_lag(alias):
+        lag = lags[alias]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    mocker.patch("core.db_routers._get_replication_lag", side_effect=get_lag)
+    selector = ReplicaSelector(list(lags), max_lag_seconds=5.0)
+
+    # When
+    aliases = {selector.get_replica() for _ in range(3)}
+
+    # Then
+    assert aliases == {"replica_3"}
+
+
+def test_replica_selector_returns_none_if_no_replicas_are_healthy(mocker):
+    # Given
+    mocker.patch("core.db_routers._get_replication_lag", side_effect=OperationalError())
+    selector = ReplicaSelector(["replica_1"])
+
+    # When / Then
+    assert selector.get_replica() is None
+
+
+def test_replica_selector_chooses_the_replica_with_the_least_lag(mocker):
+    # Given
+    lags = {"replica_1": 2.0, "replica_2": 0.5}
+    mocker.patch("core.db_routers._get_replication_lag", side_effect=lags.get)
+    selector = ReplicaSelector(list(lags), strategy=LAG)
+
+    # When / Then
+    assert selector.get_replica() == "replica_2"
+
+
+def test_replica_selector_only_checks_health_once_per_interval(mocker):
+    # Given
+    mock_get_replication_lag = mocker.patch(
+        "core.db_routers._get_replication_lag", return_value=0.0
+    )
+    selector = ReplicaSelector(["replica_1"], health_check_interval=60)
+
+    # When
+    for _ in range(3):
+        selector.get_replica()
+
+    # Then
+    mock_get_replication_lag.assert_called_once_with("replica_1")
+
+
+@pytest.mark.django_db
+def test_replica_selector_measures_lag_of_database():
+    # Given - the primary, which is never behind itself
+    selector = ReplicaSelector([PRIMARY_DATABASE_ALIAS])
+
+    # When / Then
+    assert selector.get_replica() == PRIMARY_DATABASE_ALIAS
+
+
+@pytest.mark.parametrize(
+    "method, meta, expected_alias",
+    (
+        ("GET", {"HTTP_X_ENVIRONMENT_KEY": "key"}, "replica_1"),
+        ("POST", {"HTTP_X_ENVIRONMENT_KEY": "key"}, PRIMARY_DATABASE_ALIAS),
+        ("GET", {"HTTP_AUTHORIZATION": "Token token"}, PRIMARY_DATABASE_ALIAS),
+    ),
+)
+def test_replica_routing_middleware_only_uses_replicas_for_read_only_sdk_requests(
+    mocker, method, meta, expected_alias
+):
+    # Given
+    mocker.patch(
+        "core.db_routers.get_replica_selector",
+        return_value=ReplicaSelector(["replica_1"]),
+    )
+    mocker.patch("core.db_routers._get_replication_lag", return_value=0.0)
+
+    def get_response(request):
+        return ReplicaRouter().db_for_read(Environment)
+
+    middleware = replica_routing_middleware(get_response)
+    request = mock.MagicMock(method=method, META=meta)
+
+    # When
+    alias = middleware(request)
+
+    # Then
+    assert alias == expected_alias
+
+
+@pytest.mark.parametrize(
+    "method, expected_alias", (("GET", "replica_1"), ("POST", PRIMARY_DATABASE_ALIAS))
+)
+def test_replica_routing_middleware_uses_replicas_for_async_requests(
+    mocker, method, expected_alias
+):
+    # Given
+    mocker.patch(
+        "core.db_routers.get_replica_selector",
+        return_value=ReplicaSelector(["replica_1"]),
+    )
+    mocker.patch("core.db_routers._get_replication_lag", return_value=0.0)
+
+    async def get_response(request):
+        return ReplicaRouter().db_for_read(Environment)
+
+    middleware = replica_routing_middleware(get_response)
+    request = mock.MagicMock(method=method, META={"HTTP_X_ENVIRONMENT_KEY": "key"})
+
+    # When
+    alias = async_to_sync(middleware)(request)
+
+    # Then
+    assert asyncio.iscoroutinefunction(middleware)
+    assert alias == expected_alias
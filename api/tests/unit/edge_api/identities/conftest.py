@@ -1,11 +1,13 @@
 import pytest
 
+from edge_api.identities.edge_request_forwarder import migration_status_cache
+
 
 @pytest.fixture()
-def forwarder_dynamo_wrapper(mocker):
-    return mocker.patch(
-        "edge_api.identities.edge_request_forwarder.DynamoIdentityWrapper"
-    )
+def forwarder_identity_migrator(mocker, settings):
+    settings.PROJECT_METADATA_TABLE_NAME_DYNAMO = "project_metadata"
+    migration_status_cache.clear()
+    return mocker.patch("edge_api.identities.edge_request_forwarder.IdentityMigrator")
 
 
 @pytest.fixture()
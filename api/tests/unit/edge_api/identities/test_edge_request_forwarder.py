@@ -1,46 +1,50 @@
 import json
+import logging
+import socket
 
 import pytest
 from core.constants import FLAGSMITH_SIGNATURE_HEADER
 
 from edge_api.identities.edge_request_forwarder import (
+    forward_identity_request,
     forward_identity_request_sync,
+    forward_trait_request,
     forward_trait_request_sync,
+    forward_trait_requests_sync,
 )
+from util.util import BoundedExecutor
 
 
 @pytest.mark.parametrize(
     "forwarder_function", [forward_identity_request_sync, forward_trait_request_sync]
 )
 def test_forwarder_sync_function_makes_no_request_if_migration_is_not_yet_done(
-    mocker, rf, forwarder_dynamo_wrapper, forwarder_function
+    mocker, rf, forwarder_identity_migrator, forwarder_function
 ):
     # Given
     request = rf.get("/url")
     project_id = 1
 
-    mocked_requests = mocker.patch(
-        "edge_api.identities.edge_request_forwarder.requests"
-    )
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
 
-    mocked_migration_done = mocker.MagicMock(return_value=False)
-    forwarder_dynamo_wrapper.return_value.is_migration_done = mocked_migration_done
+    forwarder_identity_migrator.return_value.is_migration_done = False
 
     # When
     forwarder_function(request, project_id)
 
     # Then
-    assert mocked_requests.mock_calls == []
+    assert mocked_session.mock_calls == []
 
-    forwarder_dynamo_wrapper.assert_called_with()
-    mocked_migration_done.assert_called_with(project_id)
+    forwarder_identity_migrator.assert_called_once_with(project_id)
 
 
 def test_forward_identity_request_sync_makes_correct_get_request(
     mocker,
     rf,
     forward_enable_settings,
-    forwarder_dynamo_wrapper,
+    forwarder_identity_migrator,
 ):
     # Given
     project_id = 1
@@ -49,29 +53,31 @@ def test_forward_identity_request_sync_makes_correct_get_request(
     api_key = "test_api_key"
     request = rf.get("/identities", query_params, HTTP_X_Environment_key=api_key)
 
-    mocked_requests = mocker.patch(
-        "edge_api.identities.edge_request_forwarder.requests"
-    )
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
 
-    mocked_migration_done = mocker.MagicMock(return_value=True)
-    forwarder_dynamo_wrapper.return_value.is_migration_done = mocked_migration_done
+    forwarder_identity_migrator.return_value.is_migration_done = True
 
     # When
     forward_identity_request_sync(request, project_id)
 
     # Then
-    args, kwargs = mocked_requests.get.call_args
+    args, kwargs = mocked_session.get.call_args
     assert args[0] == forward_enable_settings.EDGE_API_URL + "identities/"
     assert kwargs["params"] == query_params
+    assert (
+        kwargs["timeout"]
+        == forward_enable_settings.EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS
+    )
     assert kwargs["headers"]["X-Environment-Key"] == api_key
     assert kwargs["headers"][FLAGSMITH_SIGNATURE_HEADER]
 
-    forwarder_dynamo_wrapper.assert_called_with()
-    mocked_migration_done.assert_called_with(project_id)
+    forwarder_identity_migrator.assert_called_once_with(project_id)
 
 
 def test_forward_identity_request_sync_makes_correct_post_request(
-    mocker, rf, forward_enable_settings, forwarder_dynamo_wrapper
+    mocker, rf, forward_enable_settings, forwarder_identity_migrator
 ):
     # Given
     project_id = 1
@@ -81,30 +87,28 @@ def test_forward_identity_request_sync_makes_correct_post_request(
     request = rf.post("/identities", HTTP_X_Environment_key=api_key)
     request.data = request_data
 
-    mocked_requests = mocker.patch(
-        "edge_api.identities.edge_request_forwarder.requests"
-    )
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
 
-    mocked_migration_done = mocker.MagicMock(return_value=True)
-    forwarder_dynamo_wrapper.return_value.is_migration_done = mocked_migration_done
+    forwarder_identity_migrator.return_value.is_migration_done = True
 
     # When
     forward_identity_request_sync(request, project_id)
 
     # Then
-    args, kwargs = mocked_requests.post.call_args
+    args, kwargs = mocked_session.post.call_args
     assert args[0] == forward_enable_settings.EDGE_API_URL + "identities/"
 
     assert kwargs["data"] == json.dumps(request_data)
     assert kwargs["headers"]["X-Environment-Key"] == api_key
     assert kwargs["headers"][FLAGSMITH_SIGNATURE_HEADER]
 
-    forwarder_dynamo_wrapper.assert_called_with()
-    mocked_migration_done.assert_called_with(project_id)
+    forwarder_identity_migrator.assert_called_once_with(project_id)
 
 
 def test_forward_trait_request_sync_makes_correct_post_request_when_payload_is_none(
-    mocker, rf, forward_enable_settings, forwarder_dynamo_wrapper
+    mocker, rf, forward_enable_settings, forwarder_identity_migrator
 ):
     # Given
     project_id = 1
@@ -116,30 +120,28 @@ def test_forward_trait_request_sync_makes_correct_post_request_when_payload_is_n
     api_key = "test_api_key"
     request = rf.post("/traits", HTTP_X_Environment_key=api_key)
     request.data = request_data
-    mocked_requests = mocker.patch(
-        "edge_api.identities.edge_request_forwarder.requests"
-    )
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
 
-    mocked_migration_done = mocker.MagicMock(return_value=True)
-    forwarder_dynamo_wrapper.return_value.is_migration_done = mocked_migration_done
+    forwarder_identity_migrator.return_value.is_migration_done = True
 
     # When
     forward_trait_request_sync(request, project_id, payload=None)
 
     # Then
-    args, kwargs = mocked_requests.post.call_args
+    args, kwargs = mocked_session.post.call_args
     assert args[0] == forward_enable_settings.EDGE_API_URL + "traits/"
 
     assert kwargs["data"] == json.dumps(request_data)
     assert kwargs["headers"]["X-Environment-Key"] == api_key
     assert kwargs["headers"][FLAGSMITH_SIGNATURE_HEADER]
 
-    forwarder_dynamo_wrapper.assert_called_with()
-    mocked_migration_done.assert_called_with(project_id)
+    forwarder_identity_migrator.assert_called_once_with(project_id)
 
 
 def test_forward_trait_request_sync_uses_payload_over_request_data_if_not_none(
-    mocker, rf, forward_enable_settings, forwarder_dynamo_wrapper
+    mocker, rf, forward_enable_settings, forwarder_identity_migrator
 ):
     # Given
     project_id = 1
@@ -154,22 +156,178 @@ def test_forward_trait_request_sync_uses_payload_over_request_data_if_not_none(
     request = rf.post("/traits", HTTP_X_Environment_key=api_key)
     request.data = request_data
 
-    mocked_migration_done = mocker.MagicMock(return_value=True)
-    forwarder_dynamo_wrapper.return_value.is_migration_done = mocked_migration_done
+    forwarder_identity_migrator.return_value.is_migration_done = True
 
-    mocked_requests = mocker.patch(
-        "edge_api.identities.edge_request_forwarder.requests"
-    )
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
     # When
     forward_trait_request_sync(request, project_id, payload)
 
     # Then
-    args, kwargs = mocked_requests.post.call_args
+    args, kwargs = mocked_session.post.call_args
     assert args[0] == forward_enable_settings.EDGE_API_URL + "traits/"
 
     assert kwargs["data"] == json.dumps(payload)
     assert kwargs["headers"]["X-Environment-Key"] == api_key
     assert kwargs["headers"][FLAGSMITH_SIGNATURE_HEADER]
 
-    forwarder_dynamo_wrapper.assert_called_with()
-    mocked_migration_done.assert_called_with(project_id)
+    forwarder_identity_migrator.assert_called_once_with(project_id)
+
+
+def test_forward_trait_request_sync_forwards_empty_payload(
+    mocker, rf, forward_enable_settings, forwarder_identity_migrator
+):
+    # Given
+    project_id = 1
+    request = rf.post("/traits", HTTP_X_Environment_key="test_api_key")
+    request.data = {"key": "value"}
+
+    forwarder_identity_migrator.return_value.is_migration_done = True
+
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
+
+    # When
+    forward_trait_request_sync(request, project_id, payload={})
+
+    # Then
+    assert mocked_session.post.call_args[1]["data"] == json.dumps({})
+
+
+def test_migration_status_is_cached(
+    mocker, rf, forward_enable_settings, forwarder_identity_migrator
+):
+    # Given
+    project_id = 1
+    request = rf.get("/identities", {"identifier": "test_123"})
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
+    forwarder_identity_migrator.return_value.is_migration_done = True
+
+    # When
+    forward_identity_request_sync(request, project_id)
+    forward_identity_request_sync(request, project_id)
+
+    # Then
+    assert mocked_session.get.call_count == 2
+    forwarder_identity_migrator.assert_called_once_with(project_id)
+
+
+@pytest.mark.parametrize(
+    "forward_traits_in_bulk, expected_calls",
+    (
+        (
+            False,
+            [
+                ("post", "traits/", {"trait_key": "key_1"}),
+                ("post", "traits/", {"trait_key": "key_2"}),
+                ("post", "traits/", {"trait_key": "key_3"}),
+            ],
+        ),
+        (
+            True,
+            [
+                (
+                    "put",
+                    "traits/bulk/",
+                    [{"trait_key": "key_1"}, {"trait_key": "key_3"}],
+                ),
+                ("put", "traits/bulk/", [{"trait_key": "key_2"}]),
+            ],
+        ),
+    ),
+)
+def test_forward_trait_requests_sync_forwards_all_traits(
+    mocker,
+    rf,
+    forward_enable_settings,
+    forwarder_identity_migrator,
+    forward_traits_in_bulk,
+    expected_calls,
+):
+    # Given
+    forward_enable_settings.EDGE_FORWARD_TRAITS_IN_BULK = forward_traits_in_bulk
+    forwarder_identity_migrator.return_value.is_migration_done = True
+
+    request = rf.put("/traits/bulk")
+    request.data = [
+        {"identity": {"identifier": "user_1"}, "trait_key": "key_1"},
+        {"identity": {"identifier": "user_2"}, "trait_key": "key_2"},
+        {"identity": {"identifier": "user_1"}, "trait_key": "key_3"},
+    ]
+    mocked_session = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_session"
+    ).return_value
+
+    # When
+    forward_trait_requests_sync(request, 1)
+
+    # Then
+    calls = [
+        (name, args[0], json.loads(kwargs["data"]))
+        for name, args, kwargs in mocked_session.mock_calls
+    ]
+
+    def _strip_identity(payload):
+        if isinstance(payload, list):
+            return [_strip_identity(item) for item in payload]
+        return {k: v for k, v in payload.items() if k != "identity"}
+
+    assert [(name, url, _strip_identity(payload)) for name, url, payload in calls] == [
+        (name, forward_enable_settings.EDGE_API_URL + path, payload)
+        for name, path, payload in expected_calls
+    ]
+
+
+def test_forward_trait_request_is_run_by_the_edge_request_executor(mocker, rf):
+    # Given
+    request = rf.post("/traits")
+    mocked_executor = mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_request_executor"
+    ).return_value
+
+    # When
+    forward_trait_request(request, 1)
+
+    # Then
+    mocked_executor.submit.assert_called_once_with(
+        forward_trait_request_sync, request, 1, None
+    )
+
+
+def test_forwarded_request_to_unresponsive_edge_api_times_out_and_is_logged(
+    mocker, rf, forward_enable_settings, forwarder_identity_migrator, caplog
+):
+    # Given - an edge api that accepts connections but never responds
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    forward_enable_settings.EDGE_API_URL = "http://127.0.0.1:%d/" % (
+        server.getsockname()[1]
+    )
+    forward_enable_settings.EDGE_REQUEST_FORWARDER_TIMEOUT_SECONDS = 0.1
+    forwarder_identity_migrator.return_value.is_migration_done = True
+
+    executor = BoundedExecutor(
+        max_workers=1, max_queue_size=10, name="edge-request-forwarder"
+    )
+    mocker.patch(
+        "edge_api.identities.edge_request_forwarder.get_edge_request_executor",
+        return_value=executor,
+    )
+    request = rf.get("/identities", {"identifier": "test_123"})
+
+    # When
+    with caplog.at_level(logging.ERROR, logger="util.util"):
+        for _ in range(2):
+            forward_identity_request(request, 1)
+        finished = executor.shutdown(timeout=5)
+    server.close()
+
+    # Then - the worker has been freed for the next request
+    assert finished
+    assert executor.get_metrics()["failed"] == 2
+    assert "Read timed out" in caplog.text
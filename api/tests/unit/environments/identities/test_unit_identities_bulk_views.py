@@ -0,0 +1,167 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+from environments.sdk.serializers import BulkIdentifyWithTraitsSerializer
+from features.models import FeatureSegment, FeatureState
+
+bulk_url = reverse("api-v1:sdk-identities-bulk")
+single_url = reverse("api-v1:sdk-identities")
+
+
+@pytest.fixture()
+def sdk_client(api_client, environment):
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    return api_client
+
+
+def _post(client, url, data):
+    return client.post(url, data=json.dumps(data), content_type="application/json")
+
+
+@pytest.mark.parametrize("persist_trait_data", (True, False))
+@pytest.mark.parametrize("enable_snapshots", (True, False))
+def test_bulk_identify_matches_single_identify(
+    sdk_client,
+    settings,
+    organisation,
+    environment,
+    identity,
+    trait,
+    feature,
+    multivariate_feature,
+    identity_matching_segment,
+    persist_trait_data,
+    enable_snapshots,
+):
+    # Given
+    settings.ENABLE_ENVIRONMENT_SNAPSHOTS = enable_snapshots
+    organisation.persist_trait_data = persist_trait_data
+    organisation.save()
+
+    feature_segment = FeatureSegment.objects.create(
+        feature=feature, segment=identity_matching_segment, environment=environment
+    )
+    FeatureState.objects.create(
+        feature=feature,
+        environment=environment,
+        feature_segment=feature_segment,
+        enabled=True,
+    )
+    FeatureState.objects.create(
+        feature=multivariate_feature,
+        environment=environment,
+        identity=identity,
+        enabled=True,
+    )
+
+    data = [
+        {
+            "identifier": identity.identifier,
+            "traits": [{"trait_key": "age", "trait_value": 21}],
+        },
+        {
+            "identifier": "new_identity",
+            "traits": [
+                {"trait_key": trait.trait_key, "trait_value": trait.trait_value}
+            ],
+        },
+        {"identifier": "new_identity_without_traits"},
+    ]
+
+    # When
+    response = _post(sdk_client, bulk_url, data)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()
+    assert [result["identifier"] for result in results] == [
+        item["identifier"] for item in data
+    ]
+
+    for item, result in zip(data, results):
+        single_response = _post(sdk_client, single_url, item)
+        assert single_response.status_code == status.HTTP_200_OK
+        assert {"identifier": item["identifier"], **single_response.json()} == result
+
+
+def test_bulk_identify_uses_a_fixed_number_of_queries(
+    sdk_client, environment, feature, identity_matching_segment
+):
+    # Given
+    def _get_data(count):
+        return [
+            {
+                "identifier": f"identity_{count}_{i}",
+                "traits": [{"trait_key": "key1", "trait_value": "value1"}],
+            }
+            for i in range(count)
+        ]
+
+    # a request to warm up any caches
+    _post(sdk_client, bulk_url, _get_data(1))
+
+    # When
+    with CaptureQueriesContext(connection) as single_identity_queries:
+        _post(sdk_client, bulk_url, _get_data(2))
+    with CaptureQueriesContext(connection) as many_identities_queries:
+        response = _post(sdk_client, bulk_url, _get_data(20))
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert len(many_identities_queries) == len(single_identity_queries)
+    assert Identity.objects.filter(environment=environment).count() == 23
+    assert Trait.objects.filter(identity__environment=environment).count() == 23
+
+
+def test_bulk_identify_updates_existing_traits(sdk_client, identity, trait):
+    # Given
+    data = [
+        {
+            "identifier": identity.identifier,
+            "traits": [
+                {"trait_key": trait.trait_key, "trait_value": 10},
+                {"trait_key": "new_key", "trait_value": True},
+            ],
+        }
+    ]
+
+    # When
+    response = _post(sdk_client, bulk_url, data)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    new_trait = identity.identity_traits.get(trait_key="new_key")
+    assert response.json()[0]["traits"] == [
+        {"id": trait.id, "trait_key": trait.trait_key, "trait_value": 10},
+        {"id": new_trait.id, "trait_key": "new_key", "trait_value": True},
+    ]
+    trait.refresh_from_db()
+    assert trait.trait_value == 10
+    assert identity.identity_traits.count() == 2
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        [{"identifier": "duplicate"}, {"identifier": "duplicate"}],
+        [
+            {"identifier": f"identity_{i}"}
+            for i in range(BulkIdentifyWithTraitsSerializer.max_identities + 1)
+        ],
+        {"identifier": "not_a_list"},
+    ),
+)
+def test_bulk_identify_returns_400_for_invalid_data(sdk_client, environment, data):
+    # When
+    response = _post(sdk_client, bulk_url, data)
+
+    # Then
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not Identity.objects.filter(environment=environment).exists()
@@ -0,0 +1,153 @@
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.deferred import (
+    DeferredIdentityWriter,
+    _reserve_identity_id,
+)
+from environments.identities.models import Identity
+
+url = reverse("api-v1:sdk-identities")
+
+
+@pytest.fixture()
+def sdk_client(api_client, environment):
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    return api_client
+
+
+@pytest.fixture()
+def identity_writer(settings, mocker):
+    settings.DEFER_IDENTITY_CREATION = True
+    writer = DeferredIdentityWriter(flush_interval=60, batch_size=100)
+    # flush from the test rather than from a background thread
+    mocker.patch.object(writer._flusher, "start")
+    mocker.patch(
+        "environments.identities.deferred.get_identity_writer", return_value=writer
+    )
+    return writer
+
+
+def test_identify_new_identity_is_created_by_the_identity_writer(
+    sdk_client, environment, multivariate_feature, identity_writer
+):
+    # Given
+    identifier = "new_identity"
+
+    # When
+    response = sdk_client.get(url, data={"identifier": identifier})
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert not Identity.objects.filter(identifier=identifier).exists()
+
+    # and the identity is created, with the same flags, once the writer is flushed
+    identity_writer.flush()
+    assert Identity.objects.filter(identifier=identifier).count() == 1
+    assert sdk_client.get(url, data={"identifier": identifier}).json() == (
+        response.json()
+    )
+
+
+def test_identify_new_identity_returns_same_identity_until_it_is_created(
+    sdk_client, environment, identity_writer
+):
+    # When
+    for _ in range(2):
+        sdk_client.get(url, data={"identifier": "new_identity"})
+
+    # Then
+    pending_identity = identity_writer.get_pending(environment, "new_identity")
+    assert pending_identity.id is not None
+
+    identity_writer.flush()
+    assert Identity.objects.get(identifier="new_identity").id == pending_identity.id
+
+
+def test_identify_with_traits_creates_identity_using_reserved_id(
+    sdk_client, organisation, environment, identity_writer
+):
+    # Given
+    organisation.persist_trait_data = True
+    organisation.save()
+
+    sdk_client.get(url, data={"identifier": "new_identity"})
+    pending_identity = identity_writer.get_pending(environment, "new_identity")
+
+    data = {
+        "identifier": "new_identity",
+        "traits": [{"trait_key": "key", "trait_value": "value"}],
+    }
+
+    # When
+    response = sdk_client.post(
+        url, data=json.dumps(data), content_type="application/json"
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    identity = Identity.objects.get(identifier="new_identity")
+    assert identity.id == pending_identity.id
+    assert identity.identity_traits.get().trait_value == "value"
+
+    # and flushing the writer ignores the identity that now exists
+    identity_writer.flush()
+    assert Identity.objects.filter(identifier="new_identity").count() == 1
+
+
+@pytest.mark.parametrize("persist_trait_data", (True, False))
+def test_identify_without_persisting_traits_defers_identity_creation(
+    sdk_client, organisation, environment, identity_writer, persist_trait_data
+):
+    # Given
+    organisation.persist_trait_data = persist_trait_data
+    organisation.save()
+
+    data = {"identifier": "new_identity"}
+    if not persist_trait_data:
+        data["traits"] = [{"trait_key": "key", "trait_value": "value"}]
+
+    # When
+    response = sdk_client.post(
+        url, data=json.dumps(data), content_type="application/json"
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert [
+        {"trait_key": trait["trait_key"], "trait_value": trait["trait_value"]}
+        for trait in response.json()["traits"]
+    ] == data.get("traits", [])
+    assert not Identity.objects.filter(identifier="new_identity").exists()
+    assert identity_writer.get_pending(environment, "new_identity")
+
+
+def test_identity_writer_ignores_identities_that_already_exist(
+    environment, identity, identity_writer
+):
+    # Given
+    identity_writer.add(
+        Identity(
+            id=_reserve_identity_id(),
+            environment=environment,
+            identifier=identity.identifier,
+        )
+    )
+    identity_writer.add(Identity(environment=environment, identifier="new_identity"))
+
+    # When
+    identity_writer.flush()
+
+    # Then
+    assert set(
+        Identity.objects.filter(environment=environment).values_list(
+            "identifier", flat=True
+        )
+    ) == {identity.identifier, "new_identity"}
+    assert identity_writer.get_pending(environment, "new_identity") is None
+
+    # and the identity that already existed is counted as a conflict
+    assert identity_writer.conflict_count == 1
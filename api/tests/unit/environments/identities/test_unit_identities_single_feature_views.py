@@ -0,0 +1,106 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.models import Identity
+from features.models import Feature, FeatureSegment, FeatureState
+from segments.evaluator import CompiledSegment
+from segments.models import EQUAL, Condition, Segment, SegmentRule
+
+url = reverse("api-v1:sdk-identities")
+
+
+@pytest.fixture()
+def sdk_client(api_client, environment):
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    return api_client
+
+
+@pytest.mark.parametrize("enable_snapshots", (True, False))
+def test_get_single_feature_only_evaluates_segments_overriding_the_feature(
+    sdk_client,
+    settings,
+    project,
+    environment,
+    identity,
+    trait,
+    feature,
+    identity_matching_segment,
+    mocker,
+    enable_snapshots,
+):
+    # Given
+    settings.ENABLE_ENVIRONMENT_SNAPSHOTS = enable_snapshots
+
+    other_feature = Feature.objects.create(name="other_feature", project=project)
+    other_segment = Segment.objects.create(name="other_segment", project=project)
+    rule = SegmentRule.objects.create(segment=other_segment, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=rule, property="foo", operator=EQUAL, value="bar")
+
+    for feature_, segment in (
+        (feature, identity_matching_segment),
+        (other_feature, other_segment),
+    ):
+        feature_segment = FeatureSegment.objects.create(
+            feature=feature_, segment=segment, environment=environment
+        )
+        FeatureState.objects.create(
+            feature=feature_,
+            environment=environment,
+            feature_segment=feature_segment,
+            enabled=True,
+        )
+
+    matching_spy = mocker.spy(CompiledSegment, "does_identity_match")
+
+    # When
+    response = sdk_client.get(
+        url, data={"identifier": identity.identifier, "feature": feature.name}
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["feature"]["id"] == feature.id
+    assert response.json()["enabled"] is True
+    assert matching_spy.call_count == 1
+
+
+@pytest.mark.parametrize("enable_snapshots", (True, False))
+def test_get_single_feature_returns_identity_override(
+    sdk_client, settings, environment, identity, feature, enable_snapshots
+):
+    # Given
+    settings.ENABLE_ENVIRONMENT_SNAPSHOTS = enable_snapshots
+    FeatureState.objects.create(
+        feature=feature, environment=environment, identity=identity, enabled=True
+    )
+
+    # When
+    response = sdk_client.get(
+        url, data={"identifier": identity.identifier, "feature": feature.name}
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["enabled"] is True
+
+
+@pytest.mark.parametrize(
+    "feature_name, hide_disabled_flags",
+    (("Test Feature1", True), ("test feature1", False), ("unknown", False)),
+)
+def test_get_single_feature_returns_404_if_feature_not_found(
+    sdk_client, project, identity, feature, feature_name, hide_disabled_flags
+):
+    # Given
+    project.hide_disabled_flags = hide_disabled_flags
+    project.save()
+
+    # When
+    response = sdk_client.get(
+        url, data={"identifier": identity.identifier, "feature": feature_name}
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert Identity.objects.filter(identifier=identity.identifier).exists()
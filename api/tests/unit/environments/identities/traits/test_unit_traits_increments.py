@@ -0,0 +1,196 @@
+import pytest
+from core.constants import INTEGER
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.models import Identity
+from environments.identities.traits import increments
+from environments.identities.traits.increments import TraitIncrementBuffer
+from environments.identities.traits.models import Trait
+
+url = reverse("api-v1:sdk-traits-increment-value")
+
+
+@pytest.fixture()
+def sdk_client(api_client, environment):
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    return api_client
+
+
+@pytest.fixture()
+def counter_trait(identity):
+    return Trait.objects.create(
+        identity=identity, trait_key="page_views", value_type=INTEGER, integer_value=5
+    )
+
+
+@pytest.fixture()
+def increment_buffer(settings, mocker):
+    settings.BUFFER_TRAIT_INCREMENTS = True
+    buffer = TraitIncrementBuffer(flush_interval=60)
+    # flush from the test rather than from a background thread
+    mocker.patch.object(buffer._flusher, "start")
+    mocker.patch(
+        "environments.identities.traits.serializers.get_trait_increment_buffer",
+        return_value=buffer,
+    )
+    return buffer
+
+
+def _increment(client, identity, trait_key, increment_by):
+    data = {
+        "identifier": identity.identifier,
+        "trait_key": trait_key,
+        "increment_by": increment_by,
+    }
+    return client.post(url, data=data)
+
+
+def test_increment_value_adds_to_value_in_database(
+    sdk_client, identity, counter_trait, mocker
+):
+    # Given - another request increments the trait after this one has read it
+    increment_integer_values = Trait.objects.increment_integer_values
+
+    def increment_concurrently(increments):
+        Trait.objects.filter(id=counter_trait.id).update(integer_value=10)
+        return increment_integer_values(increments)
+
+    mocker.patch.object(
+        Trait.objects, "increment_integer_values", side_effect=increment_concurrently
+    )
+
+    # When
+    response = _increment(sdk_client, identity, counter_trait.trait_key, 2)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["trait_value"] == 12
+    counter_trait.refresh_from_db()
+    assert counter_trait.integer_value == 12
+
+
+def test_increment_value_returns_400_for_non_integer_trait(sdk_client, identity, trait):
+    # When
+    response = _increment(sdk_client, identity, trait.trait_key, 1)
+
+    # Then
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_buffered_increments_are_projected_and_written_on_flush(
+    sdk_client, identity, counter_trait, increment_buffer
+):
+    # When
+    responses = [
+        _increment(sdk_client, identity, counter_trait.trait_key, increment_by)
+        for increment_by in (1, 2, 3)
+    ]
+
+    # Then
+    assert [r.json()["trait_value"] for r in responses] == [6, 8, 11]
+    counter_trait.refresh_from_db()
+    assert counter_trait.integer_value == 5
+
+    # and the increments are written in one go when the buffer is flushed
+    increment_buffer.flush()
+    counter_trait.refresh_from_db()
+    assert counter_trait.integer_value == 11
+
+
+def test_buffered_increment_creates_identity_and_trait(
+    sdk_client, environment, increment_buffer
+):
+    # Given
+    identity = Identity(identifier="new_identity", environment=environment)
+
+    # When
+    response = _increment(sdk_client, identity, "page_views", 1)
+    increment_buffer.flush()
+
+    # Then
+    assert response.json() == {
+        "identifier": "new_identity",
+        "trait_key": "page_views",
+        "trait_value": 1,
+    }
+    trait = Trait.objects.get(identity__identifier="new_identity")
+    assert trait.integer_value == 1
+
+
+def test_flush_includes_increments_made_by_other_processes(
+    environment, identity, counter_trait, mocker
+):
+    # Given
+    buffer = TraitIncrementBuffer(flush_interval=60)
+    mocker.patch.object(buffer._flusher, "start")
+    buffer.increment(environment, identity.identifier, counter_trait.trait_key, 1)
+    buffer.increment(environment, identity.identifier, counter_trait.trait_key, 1)
+    Trait.objects.filter(id=counter_trait.id).update(integer_value=100)
+
+    # When
+    buffer.flush()
+    trait = buffer.increment(
+        environment, identity.identifier, counter_trait.trait_key, 1
+    )
+
+    # Then
+    assert trait.integer_value == 103
+
+
+def test_flush_keeps_increments_if_write_fails(
+    environment, identity, counter_trait, mocker
+):
+    # Given
+    buffer = TraitIncrementBuffer(flush_interval=60)
+    mocker.patch.object(buffer._flusher, "start")
+    buffer.increment(environment, identity.identifier, counter_trait.trait_key, 2)
+    mocker.patch.object(
+        Trait.objects, "increment_integer_values", side_effect=Exception("error")
+    )
+
+    # When
+    with pytest.raises(Exception):
+        buffer.flush()
+
+    # Then
+    mocker.stopall()
+    buffer.flush()
+    counter_trait.refresh_from_db()
+    assert counter_trait.integer_value == 7
+
+
+def test_increment_is_not_lost_if_flush_runs_while_trait_is_read(
+    environment, identity, counter_trait, mocker
+):
+    # Given
+    buffer = TraitIncrementBuffer(flush_interval=60)
+    mocker.patch.object(buffer._flusher, "start")
+    get_or_create_counter_trait = increments.get_or_create_counter_trait
+    calls = []
+
+    def increment_and_flush_concurrently(*args):
+        trait = get_or_create_counter_trait(*args)
+        calls.append(trait)
+        if len(calls) == 1:
+            # another request increments the trait, and the buffer is flushed,
+            # after this one looked for its counter but before it added to it
+            buffer.increment(*args, 1)
+            buffer.flush()
+        return trait
+
+    mocker.patch(
+        "environments.identities.traits.increments.get_or_create_counter_trait",
+        side_effect=increment_and_flush_concurrently,
+    )
+
+    # When
+    trait = buffer.increment(
+        environment, identity.identifier, counter_trait.trait_key, 1
+    )
+    buffer.flush()
+
+    # Then
+    assert trait.integer_value == 7
+    counter_trait.refresh_from_db()
+    assert counter_trait.integer_value == 7
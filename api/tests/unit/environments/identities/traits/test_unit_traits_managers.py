@@ -0,0 +1,120 @@
+import pytest
+from core.constants import INTEGER, STRING
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from environments.identities.models import Identity
+from environments.identities.traits.exceptions import TraitPersistenceError
+from environments.identities.traits.models import Trait
+
+
+def _get_trait_data_items(count, prefix="key"):
+    return [{"trait_key": f"{prefix}_{i}", "trait_value": i} for i in range(count)]
+
+
+def test_upsert_traits_creates_updates_and_deletes_traits(identity, trait):
+    # Given
+    other_trait = Trait.objects.create(
+        identity=identity, trait_key="other", string_value="untouched"
+    )
+    deleted_trait = Trait.objects.create(
+        identity=identity, trait_key="deleted", string_value="value"
+    )
+    trait_data_items = [
+        {"trait_key": trait.trait_key, "trait_value": 10},
+        {"trait_key": deleted_trait.trait_key, "trait_value": None},
+        {"trait_key": "new", "trait_value": "new_value"},
+    ]
+
+    # When
+    traits = Trait.objects.upsert_traits({identity: trait_data_items})[identity.id]
+
+    # Then
+    assert [(t.trait_key, t.value_type, t.trait_value) for t in traits] == [
+        (trait.trait_key, INTEGER, 10),
+        (other_trait.trait_key, STRING, "untouched"),
+        ("new", STRING, "new_value"),
+    ]
+    assert traits[0].id == trait.id
+    assert traits[0].string_value is None
+    assert [t.id for t in traits] == list(
+        identity.identity_traits.values_list("id", flat=True)
+    )
+
+
+def test_upsert_traits_uses_the_last_value_of_a_duplicated_key(identity):
+    # When
+    traits = Trait.objects.upsert_traits(
+        {
+            identity: [
+                {"trait_key": "key", "trait_value": "first"},
+                {"trait_key": "key", "trait_value": "last"},
+            ]
+        }
+    )[identity.id]
+
+    # Then
+    assert [(t.trait_key, t.trait_value) for t in traits] == [("key", "last")]
+
+
+def test_upsert_traits_uses_a_fixed_number_of_queries(environment):
+    # Given
+    identities = [
+        Identity.objects.create(identifier=f"identity_{i}", environment=environment)
+        for i in range(2)
+    ]
+    for identity in identities:
+        Trait.objects.upsert_traits({identity: _get_trait_data_items(10)})
+
+    def _get_data(trait_count):
+        return {
+            identity: [
+                *_get_trait_data_items(trait_count),
+                *_get_trait_data_items(trait_count, prefix="new"),
+                {"trait_key": f"key_{trait_count}", "trait_value": None},
+            ]
+            for identity in identities
+        }
+
+    # When
+    with CaptureQueriesContext(connection) as few_traits_queries:
+        Trait.objects.upsert_traits(_get_data(1))
+    with CaptureQueriesContext(connection) as many_traits_queries:
+        traits_by_identity_id = Trait.objects.upsert_traits(_get_data(8))
+
+    # Then
+    assert len(many_traits_queries) == len(few_traits_queries) == 2
+    for identity in identities:
+        assert [trait.id for trait in traits_by_identity_id[identity.id]] == list(
+            identity.identity_traits.values_list("id", flat=True)
+        )
+        assert not identity.identity_traits.filter(trait_key="key_8").exists()
+
+
+def test_upsert_traits_raises_error_if_organisation_does_not_persist_traits(
+    organisation, identity
+):
+    # Given
+    organisation.persist_trait_data = False
+    organisation.save()
+    identity.environment.project.organisation = organisation
+
+    # When
+    with pytest.raises(TraitPersistenceError):
+        Trait.objects.upsert_traits({identity: _get_trait_data_items(1)})
+
+    # Then
+    assert not identity.identity_traits.exists()
+
+
+def test_trait_save_checks_organisation_in_a_single_query(identity):
+    # Given
+    trait = Trait(identity_id=identity.id, trait_key="key", string_value="value")
+
+    # When
+    with CaptureQueriesContext(connection) as queries:
+        trait.save()
+
+    # Then
+    # one query to check the organisation and one to insert the trait
+    assert len(queries) == 2
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+
+url = reverse("api-v1:sdk-traits-bulk-create")
+
+
+@pytest.fixture()
+def sdk_client(api_client, environment):
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    return api_client
+
+
+def _get_trait_data(identifier, trait_key, trait_value):
+    return {
+        "identity": {"identifier": identifier},
+        "trait_key": trait_key,
+        "trait_value": trait_value,
+    }
+
+
+def _bulk_create(client, data):
+    return client.put(url, data=json.dumps(data), content_type="application/json")
+
+
+def test_bulk_create_traits_for_many_identities(sdk_client, identity, trait):
+    # Given
+    data = [
+        _get_trait_data(identity.identifier, trait.trait_key, None),
+        _get_trait_data(identity.identifier, "updated", 1),
+        _get_trait_data("new_identity", "created", True),
+        _get_trait_data("deleted_only_identity", "key", None),
+    ]
+
+    # When
+    response = _bulk_create(sdk_client, data)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [
+        _get_trait_data(identity.identifier, "updated", 1),
+        _get_trait_data("new_identity", "created", True),
+    ]
+
+    assert not Trait.objects.filter(id=trait.id).exists()
+    assert Trait.objects.get(identity=identity, trait_key="updated").trait_value == 1
+    assert Trait.objects.get(identity__identifier="new_identity").trait_value is True
+
+    # and an identity is not created only to delete its traits
+    assert not Identity.objects.filter(identifier="deleted_only_identity").exists()
+
+
+def test_bulk_create_traits_uses_fixed_number_of_queries(sdk_client, identity):
+    # Given
+    def get_data(identity_count):
+        return [
+            _get_trait_data(identifier, f"key_{i}", i)
+            for identifier in [identity.identifier]
+            + [f"identity_{identity_count}_{i}" for i in range(identity_count)]
+            for i in range(5)
+        ]
+
+    # the environment is cached by the first request
+    _bulk_create(sdk_client, get_data(identity_count=1))
+
+    # When
+    with CaptureQueriesContext(connection) as few_queries:
+        _bulk_create(sdk_client, get_data(identity_count=2))
+    with CaptureQueriesContext(connection) as many_queries:
+        response = _bulk_create(sdk_client, get_data(identity_count=20))
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 105
+    assert len(many_queries) == len(few_queries)
@@ -46,13 +46,20 @@ def test_get_environment_document(
     url = reverse("api-v1:environment-document")
 
     # When
-    with django_assert_num_queries(11):
+    # 11 queries to build the document and 1 to get the environment version
+    with django_assert_num_queries(12):
         response = client.get(url)
 
     # Then
     assert response.status_code == status.HTTP_200_OK
     assert response.json()
 
+    # and the document is served from the cache until the environment changes, so
+    # the only query is to authenticate the request
+    with django_assert_num_queries(1):
+        cached_response = client.get(url)
+    assert cached_response.json() == response.json()
+
 
 def test_get_environment_document_fails_with_invalid_key(
     organisation_one, organisation_one_project_one
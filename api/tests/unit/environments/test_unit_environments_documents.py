@@ -0,0 +1,289 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from core.db_routers import use_replicas
+from django.urls import reverse
+from rest_framework import status
+
+from audit.models import AuditLog
+from environments.documents import get_versioned_environment_document
+from environments.models import EnvironmentAPIKey
+from features.models import Feature, FeatureSegment, FeatureState
+from segments.models import Segment
+
+url = reverse("api-v1:environment-document")
+
+
+@pytest.fixture()
+def server_side_client(api_client, organisation_one_project_one_environment_one):
+    api_key = EnvironmentAPIKey.objects.create(
+        environment=organisation_one_project_one_environment_one
+    )
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=api_key.key)
+    return api_client
+
+
+@pytest.fixture()
+def lagging_replica(settings, mocker):
+    # any query routed to the replica fails as the alias isn't configured
+    settings.DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+    mocker.patch(
+        "core.db_routers.get_replica_selector",
+        return_value=mocker.MagicMock(get_replica=lambda: "lagging_replica"),
+    )
+    with use_replicas():
+        yield
+
+
+def test_get_environment_document_returns_304_if_etag_matches(
+    server_side_client,
+    organisation_one_project_one_feature_one,
+    settings,
+    django_assert_num_queries,
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    first_response = server_side_client.get(url)
+
+    # When
+    # the document, and environment version, are cached so the only query is to
+    # authenticate the request
+    with django_assert_num_queries(1):
+        response = server_side_client.get(
+            url, HTTP_IF_NONE_MATCH=first_response["ETag"]
+        )
+
+    # Then
+    assert first_response.status_code == status.HTTP_200_OK
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == first_response["ETag"]
+
+
+def test_get_environment_document_ignores_if_modified_since(
+    server_side_client,
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+):
+    # Given
+    AuditLog.objects.create(
+        project=organisation_one_project_one,
+        environment=organisation_one_project_one_environment_one,
+        log="Feature state updated",
+    )
+    first_response = server_side_client.get(url)
+
+    # When
+    # changes such as deleting a segment don't change the environment version, so
+    # the document has no reliable modification date
+    response = server_side_client.get(
+        url, HTTP_IF_MODIFIED_SINCE="Sat, 01 Jan 2050 00:00:00 GMT"
+    )
+
+    # Then
+    assert "Last-Modified" not in first_response
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_get_environment_document_returns_new_document_when_environment_changes(
+    server_side_client,
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    settings,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    first_response = server_side_client.get(url)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Feature.objects.create(name="new_feature", project=organisation_one_project_one)
+        AuditLog.objects.create(
+            project=organisation_one_project_one, log="New feature created"
+        )
+
+    # When
+    response = server_side_client.get(url, HTTP_IF_NONE_MATCH=first_response["ETag"])
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != first_response["ETag"]
+    assert [fs["feature"]["name"] for fs in response.json()["feature_states"]] == [
+        "new_feature"
+    ]
+
+
+def test_get_versioned_environment_document_uses_cache(
+    organisation_one_project_one_environment_one,
+    settings,
+    django_assert_num_queries,
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    environment = organisation_one_project_one_environment_one
+    first_document = get_versioned_environment_document(environment)
+
+    # When
+    with django_assert_num_queries(0):
+        document = get_versioned_environment_document(environment)
+
+    # Then
+    assert document == first_document
+
+
+def test_get_versioned_environment_document_is_built_from_the_primary(
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_feature_one,
+    lagging_replica,
+):
+    # When
+    versioned_document = get_versioned_environment_document(
+        organisation_one_project_one_environment_one
+    )
+
+    # Then
+    assert len(versioned_document.document["feature_states"]) == 1
+
+
+delta_url = reverse("api-v1:environment-document-delta")
+
+
+@pytest.fixture()
+def since_version(
+    mocker, organisation_one_project_one, organisation_one_project_one_environment_one
+):
+    # only consider changes made after the audit log for the version is created
+    mocker.patch("environments.documents.DELTA_HISTORY_MARGIN", timedelta(0))
+    return AuditLog.objects.create(
+        project=organisation_one_project_one,
+        environment=organisation_one_project_one_environment_one,
+        log="Feature state updated",
+    ).id
+
+
+@pytest.mark.parametrize("since", (0, 10000000))
+def test_get_environment_document_delta_returns_full_document_for_unknown_version(
+    server_side_client, organisation_one_project_one_feature_one, since
+):
+    # When
+    response = server_side_client.get(delta_url, data={"since": since})
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["full_document"] is True
+    assert len(response.json()["document"]["feature_states"]) == 1
+
+
+def test_get_environment_document_delta_returns_full_document_for_old_version(
+    server_side_client,
+    organisation_one_project_one_feature_one,
+    since_version,
+    settings,
+):
+    # Given
+    settings.ENVIRONMENT_DOCUMENT_DELTA_MAX_AGE_SECONDS = 0
+
+    # When
+    response = server_side_client.get(delta_url, data={"since": since_version})
+
+    # Then
+    assert response.json()["full_document"] is True
+
+
+def test_get_environment_document_delta_returns_changed_feature_states(
+    server_side_client,
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_feature_one,
+    since_version,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    changed_feature = Feature.objects.create(
+        name="changed_feature", project=organisation_one_project_one
+    )
+    feature_state = FeatureState.objects.get(
+        feature=changed_feature, environment=environment
+    )
+    feature_state.enabled = True
+    feature_state.save()
+
+    deleted_feature = Feature.objects.create(
+        name="deleted_feature", project=organisation_one_project_one
+    )
+    deleted_feature_id = deleted_feature.id
+    deleted_feature.delete()
+
+    # When
+    response = server_side_client.get(delta_url, data={"since": since_version})
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    delta = response.json()
+    assert delta["full_document"] is False
+    assert delta["version"] >= since_version
+    assert delta["api_key"] == environment.api_key
+    assert delta["project"]["id"] == organisation_one_project_one.id
+    assert [fs["feature"]["id"] for fs in delta["feature_states"]] == [
+        changed_feature.id
+    ]
+    assert delta["feature_states"][0]["enabled"] is True
+    assert delta["deleted_feature_ids"] == [deleted_feature_id]
+    assert delta["segments"] == []
+
+
+def test_get_environment_document_delta_returns_changed_segments(
+    server_side_client,
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_feature_one,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    project = organisation_one_project_one
+    environment = organisation_one_project_one_environment_one
+    unchanged_segment = Segment.objects.create(name="unchanged", project=project)
+    segment = Segment.objects.create(name="segment", project=project)
+
+    since_response = server_side_client.get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        since_version = AuditLog.objects.create(
+            project=project, environment=environment, log="Feature state updated"
+        ).id
+
+    with django_capture_on_commit_callbacks(execute=True):
+        feature_segment = FeatureSegment.objects.create(
+            feature=organisation_one_project_one_feature_one,
+            segment=segment,
+            environment=environment,
+        )
+        FeatureState.objects.create(
+            feature=organisation_one_project_one_feature_one,
+            feature_segment=feature_segment,
+            environment=environment,
+            enabled=True,
+        )
+
+    # When
+    with mock.patch("environments.documents.DELTA_HISTORY_MARGIN", timedelta(0)):
+        response = server_side_client.get(delta_url, data={"since": since_version})
+
+    # Then
+    assert since_response.status_code == status.HTTP_200_OK
+    delta = response.json()
+    # creating the feature segment creates an audit log for the feature
+    assert [fs["feature"]["id"] for fs in delta["feature_states"]] == [
+        organisation_one_project_one_feature_one.id
+    ]
+    assert [s["id"] for s in delta["segments"]] == [segment.id]
+    assert delta["segments"][0]["feature_states"][0]["enabled"] is True
+    assert set(delta["segment_ids"]) == {segment.id, unchanged_segment.id}
+
+
+def test_get_environment_document_delta_requires_since(server_side_client):
+    # When
+    response = server_side_client.get(delta_url)
+
+    # Then
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,218 @@
+import pytest
+from core.db_routers import use_replicas
+from django.urls import reverse
+from rest_framework import status
+
+from audit.models import AuditLog
+from environments.identities.models import Identity
+from environments.identities.traits.models import Trait
+from environments.snapshot import (
+    EnvironmentSnapshot,
+    clear_environment_snapshots,
+    get_environment_snapshot,
+)
+from environments.versioning import environment_version_cache
+from features.models import Feature, FeatureSegment, FeatureState
+from segments.models import EQUAL, Condition, Segment, SegmentRule
+
+
+@pytest.fixture(autouse=True)
+def clear_snapshots():
+    clear_environment_snapshots()
+    environment_version_cache.clear()
+    yield
+    clear_environment_snapshots()
+    environment_version_cache.clear()
+
+
+@pytest.fixture()
+def lagging_replica(settings, mocker):
+    # any query routed to the replica fails as the alias isn't configured
+    settings.DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+    mocker.patch(
+        "core.db_routers.get_replica_selector",
+        return_value=mocker.MagicMock(get_replica=lambda: "lagging_replica"),
+    )
+    with use_replicas():
+        yield
+
+
+@pytest.fixture()
+def segment_factory(organisation_one_project_one):
+    def _create_segment(name, trait_key, trait_value):
+        segment = Segment.objects.create(
+            name=name, project=organisation_one_project_one
+        )
+        rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+        Condition.objects.create(
+            rule=rule, property=trait_key, operator=EQUAL, value=trait_value
+        )
+        return segment
+
+    return _create_segment
+
+
+def _create_segment_override(feature, segment, environment, enabled):
+    feature_segment = FeatureSegment.objects.create(
+        feature=feature, segment=segment, environment=environment
+    )
+    return FeatureState.objects.create(
+        feature=feature,
+        environment=environment,
+        feature_segment=feature_segment,
+        enabled=enabled,
+    )
+
+
+@pytest.mark.parametrize("enable_snapshots", (True, False))
+def test_identity_get_all_feature_states_resolves_priorities(
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    segment_factory,
+    settings,
+    enable_snapshots,
+):
+    # Given
+    settings.ENABLE_ENVIRONMENT_SNAPSHOTS = enable_snapshots
+    project = organisation_one_project_one
+    environment = organisation_one_project_one_environment_one
+
+    default_feature = Feature.objects.create(name="default", project=project)
+    segment_feature = Feature.objects.create(name="segment", project=project)
+    identity_feature = Feature.objects.create(name="identity", project=project)
+
+    identity = Identity.objects.create(identifier="identity", environment=environment)
+    Trait.objects.create(identity=identity, trait_key="plan", string_value="paid")
+
+    first_segment = segment_factory("first", "plan", "paid")
+    second_segment = segment_factory("second", "plan", "paid")
+    not_matching_segment = segment_factory("not matching", "plan", "free")
+
+    # the first segment override created for a feature has the highest priority
+    _create_segment_override(segment_feature, first_segment, environment, True)
+    _create_segment_override(segment_feature, second_segment, environment, False)
+    _create_segment_override(default_feature, not_matching_segment, environment, True)
+
+    _create_segment_override(identity_feature, first_segment, environment, False)
+    FeatureState.objects.create(
+        feature=identity_feature,
+        environment=environment,
+        identity=identity,
+        enabled=True,
+    )
+
+    # When
+    feature_states = identity.get_all_feature_states()
+
+    # Then
+    enabled_by_feature_name = {
+        feature_state.feature.name: feature_state.enabled
+        for feature_state in feature_states
+    }
+    assert enabled_by_feature_name == {
+        "default": False,
+        "segment": True,
+        "identity": True,
+    }
+
+
+def test_get_environment_snapshot_is_rebuilt_when_environment_version_changes(
+    organisation_one_project_one_environment_one,
+    mocker,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    build_spy = mocker.spy(EnvironmentSnapshot, "build")
+
+    # When
+    first_snapshot = get_environment_snapshot(environment)
+    second_snapshot = get_environment_snapshot(environment)
+    with django_capture_on_commit_callbacks(execute=True):
+        AuditLog.objects.create(environment=environment)
+    third_snapshot = get_environment_snapshot(environment)
+
+    # Then
+    assert first_snapshot is second_snapshot
+    assert third_snapshot is not first_snapshot
+    assert build_spy.call_count == 2
+
+
+def test_snapshot_built_before_commit_is_not_cached_under_new_version(
+    organisation_one_project_one_environment_one,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    old_snapshot = get_environment_snapshot(environment)
+
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        audit_log = AuditLog.objects.create(environment=environment)
+        # e.g. built by another request before the changes are committed
+        uncommitted_snapshot = get_environment_snapshot(environment)
+
+    new_snapshot = get_environment_snapshot(environment)
+
+    # Then
+    assert uncommitted_snapshot is old_snapshot
+    assert uncommitted_snapshot.version != audit_log.id
+    assert new_snapshot is not old_snapshot
+    assert new_snapshot.version == audit_log.id
+
+
+def test_get_environment_snapshot_is_built_from_the_primary(
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_feature_one,
+    lagging_replica,
+):
+    # When
+    snapshot = get_environment_snapshot(organisation_one_project_one_environment_one)
+
+    # Then
+    assert list(snapshot.environment_feature_states) == [
+        organisation_one_project_one_feature_one.id
+    ]
+
+
+def test_get_environment_snapshot_is_rebuilt_when_expired(
+    organisation_one_project_one_environment_one, settings
+):
+    # Given
+    settings.ENVIRONMENT_SNAPSHOT_MAX_AGE_SECONDS = -1
+    environment = organisation_one_project_one_environment_one
+
+    # When
+    first_snapshot = get_environment_snapshot(environment)
+    second_snapshot = get_environment_snapshot(environment)
+
+    # Then
+    assert first_snapshot is not second_snapshot
+
+
+def test_sdk_flags_are_served_from_snapshot(
+    api_client,
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_feature_one,
+    settings,
+    django_assert_max_num_queries,
+):
+    # Given
+    settings.ENABLE_ENVIRONMENT_SNAPSHOTS = True
+    environment = organisation_one_project_one_environment_one
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    url = reverse("api-v1:flags")
+
+    # populate the snapshot and the environment cache
+    api_client.get(url)
+
+    # When
+    with django_assert_max_num_queries(0):
+        response = api_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 1
+    assert response.json()[0]["feature"]["id"] == (
+        organisation_one_project_one_feature_one.id
+    )
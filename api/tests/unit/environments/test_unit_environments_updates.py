@@ -0,0 +1,358 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.db import connections
+from django.urls import reverse
+from rest_framework import status
+
+from audit.models import AuditLog
+from environments.updates import (
+    InProcessEnvironmentUpdatesBroker,
+    PollingEnvironmentUpdatesBroker,
+    get_environment_updates_broker,
+    get_waiter_slots,
+)
+from environments.versioning import get_environment_version
+
+url = reverse("api-v1:environment-updates")
+
+
+@pytest.fixture()
+def in_process_broker(settings):
+    settings.ENVIRONMENT_UPDATES_BROKER = (
+        "environments.updates.InProcessEnvironmentUpdatesBroker"
+    )
+    return get_environment_updates_broker()
+
+
+@pytest.fixture()
+def sdk_client(api_client, organisation_one_project_one_environment_one, settings):
+    settings.ENABLE_ENVIRONMENT_UPDATES = True
+    settings.ENVIRONMENT_UPDATES_STREAMING = True
+    api_client.credentials(
+        HTTP_X_ENVIRONMENT_KEY=organisation_one_project_one_environment_one.api_key
+    )
+    return api_client
+
+
+def test_in_process_broker_wait_for_update_returns_published_version(
+    organisation_one_project_one_environment_one,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    broker = InProcessEnvironmentUpdatesBroker()
+    since = get_environment_version(environment)
+
+    publisher = threading.Timer(0.1, broker.publish, args=(environment.id, since + 1))
+    publisher.start()
+
+    # When
+    version = broker.wait_for_update(environment, since=since, timeout=5)
+
+    # Then
+    publisher.join()
+    assert version == since + 1
+
+
+def test_in_process_broker_wait_for_update_returns_current_version_on_timeout(
+    organisation_one_project_one_environment_one,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    broker = InProcessEnvironmentUpdatesBroker()
+    since = get_environment_version(environment)
+
+    # an update for another environment
+    broker.publish(environment.id + 1, since + 1)
+
+    # When
+    version = broker.wait_for_update(environment, since=since, timeout=0.1)
+
+    # Then
+    assert version == since
+
+
+def test_polling_broker_wait_for_update_polls_environment_version(
+    organisation_one_project_one_environment_one, settings, mocker
+):
+    # Given
+    settings.ENVIRONMENT_UPDATES_POLL_INTERVAL_SECONDS = 0.01
+    mock_get_environment_version = mocker.patch(
+        "environments.updates.get_environment_version", side_effect=[1, 1, 2]
+    )
+
+    # When
+    version = PollingEnvironmentUpdatesBroker().wait_for_update(
+        organisation_one_project_one_environment_one, since=1, timeout=5
+    )
+
+    # Then
+    assert version == 2
+    assert mock_get_environment_version.call_count == 3
+
+
+def test_creating_audit_log_publishes_environment_version_on_commit(
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    mocker,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    mock_broker = mocker.patch(
+        "environments.updates.get_environment_updates_broker"
+    ).return_value
+
+    # When
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        audit_log = AuditLog.objects.create(
+            project=organisation_one_project_one, log="Feature created"
+        )
+        mock_broker.publish.assert_not_called()
+
+    for callback in callbacks:
+        callback()
+
+    # Then
+    mock_broker.publish.assert_called_once_with(
+        organisation_one_project_one_environment_one.id, audit_log.id
+    )
+
+
+def test_environment_updates_returns_current_version_without_since(
+    sdk_client, organisation_one_project_one, in_process_broker
+):
+    # Given
+    audit_log = AuditLog.objects.create(
+        project=organisation_one_project_one, log="Feature created"
+    )
+
+    # When
+    response = sdk_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"version": audit_log.id}
+
+
+def test_environment_updates_waits_for_new_version(
+    sdk_client,
+    organisation_one_project_one_environment_one,
+    in_process_broker,
+    settings,
+):
+    # Given
+    settings.ENVIRONMENT_UPDATES_TIMEOUT_SECONDS = 5
+    environment = organisation_one_project_one_environment_one
+    since = get_environment_version(environment)
+
+    publisher = threading.Timer(
+        0.1, in_process_broker.publish, args=(environment.id, since + 1)
+    )
+    publisher.start()
+
+    # When
+    response = sdk_client.get(url, data={"since": since})
+
+    # Then
+    publisher.join()
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"version": since + 1}
+
+
+def test_environment_updates_streams_events(
+    sdk_client,
+    organisation_one_project_one_environment_one,
+    in_process_broker,
+    settings,
+):
+    # Given
+    settings.ENVIRONMENT_UPDATES_TIMEOUT_SECONDS = 1
+    settings.ENVIRONMENT_UPDATES_STREAM_MAX_SECONDS = 1
+    environment = organisation_one_project_one_environment_one
+    since = get_environment_version(environment)
+    in_process_broker.publish(environment.id, since + 1)
+
+    # When
+    response = sdk_client.get(
+        url, HTTP_ACCEPT="text/event-stream", HTTP_LAST_EVENT_ID=str(since)
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == "text/event-stream"
+    events = b"".join(response.streaming_content).decode("utf-8").split("\n\n")
+    response.close()
+    assert events[0] == (
+        f"id: {since + 1}\n"
+        "event: environment_updated\n"
+        f'data: {{"version": {since + 1}}}'
+    )
+    assert events[1:] == [": keep-alive", ""]
+
+
+def test_environment_updates_returns_404_when_not_enabled(sdk_client, settings):
+    # Given
+    settings.ENABLE_ENVIRONMENT_UPDATES = False
+
+    # When
+    response = sdk_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_environment_updates_refuses_streams_when_streaming_is_not_enabled(
+    sdk_client, in_process_broker, settings
+):
+    # Given
+    settings.ENVIRONMENT_UPDATES_STREAMING = False
+
+    # When
+    response = sdk_client.get(url, HTTP_ACCEPT="text/event-stream")
+
+    # Then
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert get_waiter_slots().acquire(blocking=False)
+    get_waiter_slots().release()
+
+
+def test_environment_updates_does_not_wait_when_too_many_clients_are_waiting(
+    sdk_client,
+    organisation_one_project_one_environment_one,
+    in_process_broker,
+    settings,
+    mocker,
+):
+    # Given
+    settings.ENVIRONMENT_UPDATES_MAX_WAITERS = 1
+    settings.ENVIRONMENT_UPDATES_TIMEOUT_SECONDS = 5
+    since = get_environment_version(organisation_one_project_one_environment_one)
+    wait_for_update = mocker.spy(in_process_broker, "wait_for_update")
+
+    waiter_slots = get_waiter_slots()
+    waiter_slots.acquire(blocking=False)
+
+    # When
+    try:
+        response = sdk_client.get(url, data={"since": since})
+    finally:
+        waiter_slots.release()
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"version": since}
+    wait_for_update.assert_not_called()
+
+
+def test_environment_updates_refuses_streams_when_too_many_clients_are_waiting(
+    sdk_client, in_process_broker, settings
+):
+    # Given
+    settings.ENVIRONMENT_UPDATES_MAX_WAITERS = 1
+    waiter_slots = get_waiter_slots()
+    waiter_slots.acquire(blocking=False)
+
+    # When
+    try:
+        response = sdk_client.get(url, HTTP_ACCEPT="text/event-stream")
+    finally:
+        waiter_slots.release()
+
+    # Then
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def test_environment_updates_stream_releases_its_slot_when_closed(
+    sdk_client, in_process_broker, settings
+):
+    # Given
+    settings.ENVIRONMENT_UPDATES_MAX_WAITERS = 1
+    response = sdk_client.get(url, HTTP_ACCEPT="text/event-stream")
+    assert response.status_code == status.HTTP_200_OK
+
+    # When
+    response.close()
+
+    # Then
+    waiter_slots = get_waiter_slots()
+    assert waiter_slots.acquire(blocking=False)
+    waiter_slots.release()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_environment_updates_stream_does_not_block_other_asgi_requests(
+    organisation_one_project_one_environment_one, settings, mocker
+):
+    # Given
+    from app.asgi import application
+
+    settings.ENABLE_ENVIRONMENT_UPDATES = True
+    settings.ENVIRONMENT_UPDATES_STREAMING = True
+    settings.ENVIRONMENT_UPDATES_TIMEOUT_SECONDS = 1
+    settings.ENVIRONMENT_UPDATES_STREAM_MAX_SECONDS = 1
+    settings.ENVIRONMENT_UPDATES_POLL_INTERVAL_SECONDS = 0.1
+    settings.ALLOWED_HOSTS = ["*"]
+    streaming_executor = ThreadPoolExecutor(max_workers=1)
+    mocker.patch("app.asgi.get_streaming_executor", return_value=streaming_executor)
+    headers = [
+        (b"host", b"localhost"),
+        (
+            b"x-environment-key",
+            organisation_one_project_one_environment_one.api_key.encode(),
+        ),
+    ]
+
+    async def get(path, extra_headers=()):
+        communicator = ApplicationCommunicator(
+            application,
+            {
+                "type": "http",
+                "method": "GET",
+                "path": path,
+                "query_string": b"",
+                "headers": [*headers, *extra_headers],
+            },
+        )
+        await communicator.send_input({"type": "http.request"})
+        return communicator
+
+    async def read_body(communicator, timeout):
+        body = b""
+        while True:
+            message = await communicator.receive_output(timeout)
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return body
+
+    async def stream_and_get_version():
+        stream = await get(str(url), [(b"accept", b"text/event-stream")])
+        start = await stream.receive_output(5)
+        first_event = await stream.receive_output(5)
+
+        # the stream is now waiting for the next version, in the polling broker
+        version = await get(str(url))
+        await version.receive_output(0.5)
+        version_body = await read_body(version, 0.5)
+
+        rest_of_stream = await read_body(stream, 5)
+        return start, first_event["body"], version_body, rest_of_stream
+
+    # When
+    try:
+        start, first_event, version_body, rest_of_stream = async_to_sync(
+            stream_and_get_version
+        )()
+    finally:
+        streaming_executor.submit(connections.close_all).result()
+        streaming_executor.shutdown()
+
+    # Then
+    since = get_environment_version(organisation_one_project_one_environment_one)
+    assert start["status"] == status.HTTP_200_OK
+    assert first_event.startswith(f"id: {since}\n".encode())
+    assert json.loads(version_body) == {"version": since}
+    assert rest_of_stream == b": keep-alive\n\n"
@@ -0,0 +1,97 @@
+import pytest
+
+from audit.models import AuditLog
+from environments.models import Environment
+from environments.versioning import (
+    environment_version_cache,
+    get_environment_version,
+    update_environment_versions,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_environment_version_cache():
+    environment_version_cache.clear()
+    yield
+    environment_version_cache.clear()
+
+
+def test_get_environment_version_returns_latest_relevant_audit_log_id(
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_environment_two,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    AuditLog.objects.create(environment=environment)
+    project_audit_log = AuditLog.objects.create(project=organisation_one_project_one)
+    # an audit log for another environment in the same project
+    AuditLog.objects.create(environment=organisation_one_project_one_environment_two)
+    environment_version_cache.clear()
+
+    # When
+    version = get_environment_version(environment)
+
+    # Then
+    assert version == project_audit_log.id
+
+
+def test_get_environment_version_returns_0_when_no_audit_logs(
+    organisation_one_project_one_environment_one,
+):
+    assert get_environment_version(organisation_one_project_one_environment_one) == 0
+
+
+def test_get_environment_version_uses_cache(
+    organisation_one_project_one_environment_one, django_assert_num_queries
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    environment_version_cache.set(environment.id, 10)
+
+    # When
+    with django_assert_num_queries(0):
+        version = get_environment_version(environment)
+
+    # Then
+    assert version == 10
+
+
+def test_creating_audit_log_for_project_updates_all_environment_versions(
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_environment_two,
+    django_capture_on_commit_callbacks,
+):
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        audit_log = AuditLog.objects.create(project=organisation_one_project_one)
+
+        # Then
+        # the versions aren't updated until the changes have been committed
+        assert (
+            environment_version_cache.get_many(
+                Environment.objects.filter(
+                    project=organisation_one_project_one
+                ).values_list("id", flat=True)
+            )
+            == {}
+        )
+
+    for environment in Environment.objects.filter(project=organisation_one_project_one):
+        assert environment_version_cache.get(environment.id) == audit_log.id
+
+
+def test_update_environment_versions_does_not_move_version_backwards(
+    organisation_one_project_one_environment_one,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    older_audit_log = AuditLog.objects.create(environment=environment)
+    newer_audit_log = AuditLog.objects.create(environment=environment)
+
+    # When
+    update_environment_versions(older_audit_log)
+
+    # Then
+    assert get_environment_version(environment) == newer_audit_log.id
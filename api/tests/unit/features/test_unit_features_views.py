@@ -0,0 +1,139 @@
+import gzip
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from audit.models import AuditLog
+from features.models import FeatureState
+
+url = reverse("api-v1:flags")
+
+
+@pytest.fixture()
+def sdk_client(api_client, organisation_one_project_one_environment_one, settings):
+    settings.CACHE_FLAGS_RESPONSE_SECONDS = 60
+    api_client.credentials(
+        HTTP_X_ENVIRONMENT_KEY=organisation_one_project_one_environment_one.api_key
+    )
+    return api_client
+
+
+def test_sdk_flags_returns_304_if_etag_matches(
+    sdk_client, organisation_one_project_one_feature_one, django_assert_num_queries
+):
+    # Given
+    first_response = sdk_client.get(url)
+    etag = first_response["ETag"]
+
+    # When
+    with django_assert_num_queries(0):
+        response = sdk_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert first_response.status_code == status.HTTP_200_OK
+    assert len(first_response.json()) == 1
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+    assert not response.content
+
+
+def test_sdk_flags_returns_new_etag_when_environment_changes(
+    sdk_client,
+    organisation_one_project_one,
+    organisation_one_project_one_environment_one,
+    organisation_one_project_one_feature_one,
+    django_capture_on_commit_callbacks,
+):
+    # Given
+    environment = organisation_one_project_one_environment_one
+    first_response = sdk_client.get(url)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        FeatureState.objects.filter(environment=environment).update(enabled=True)
+        AuditLog.objects.create(
+            project=organisation_one_project_one,
+            environment=environment,
+            log="Feature state updated",
+        )
+
+    # When
+    response = sdk_client.get(url, HTTP_IF_NONE_MATCH=first_response["ETag"])
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != first_response["ETag"]
+    assert response.json()[0]["enabled"] is True
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected_content_encoding",
+    (("gzip, deflate", "gzip"), ("", None)),
+)
+def test_sdk_flags_response_is_compressed_if_configured_and_accepted(
+    sdk_client,
+    organisation_one_project_one_feature_one,
+    settings,
+    accept_encoding,
+    expected_content_encoding,
+):
+    # Given
+    settings.COMPRESS_FLAGS_RESPONSE = True
+    uncompressed_content = sdk_client.get(url, HTTP_ACCEPT_ENCODING="").content
+
+    # When
+    response = sdk_client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.get("Content-Encoding") == expected_content_encoding
+    assert "Accept-Encoding" in response["Vary"]
+    # the gzipped and uncompressed content share a weak ETag
+    assert response["ETag"].startswith('W/"')
+
+    content = response.content
+    if expected_content_encoding == "gzip":
+        content = gzip.decompress(content)
+    assert content == uncompressed_content
+
+
+def test_sdk_flags_returns_304_for_strong_form_of_etag(
+    sdk_client, organisation_one_project_one_feature_one, settings
+):
+    # Given
+    settings.COMPRESS_FLAGS_RESPONSE = True
+    etag = sdk_client.get(url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+
+    # When
+    # e.g. from a client that drops the weak indicator
+    response = sdk_client.get(url, HTTP_IF_NONE_MATCH=etag[2:])
+
+    # Then
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+    assert "Accept-Encoding" in response["Vary"]
+
+
+@pytest.mark.parametrize("enable_snapshots", (True, False))
+def test_sdk_flags_returns_single_feature_by_case_insensitive_name(
+    sdk_client, organisation_one_project_one_feature_one, settings, enable_snapshots
+):
+    # Given
+    settings.ENABLE_ENVIRONMENT_SNAPSHOTS = enable_snapshots
+    feature = organisation_one_project_one_feature_one
+
+    # When
+    response = sdk_client.get(url, data={"feature": feature.name.upper()})
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["feature"]["id"] == feature.id
+
+
+def test_sdk_flags_returns_404_for_unknown_feature(sdk_client):
+    # When
+    response = sdk_client.get(url, data={"feature": "unknown"})
+
+    # Then
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,183 @@
+import json
+
+import pytest
+
+from environments.identities.models import Identity
+from integrations.amplitude.amplitude import AmplitudeWrapper
+from integrations.amplitude.models import AmplitudeConfiguration
+from integrations.common.batching import IdentifyBatcher
+from integrations.heap.heap import HeapWrapper
+from integrations.heap.models import HeapConfiguration
+from integrations.integration import identify_integrations
+from integrations.mixpanel.mixpanel import MixpanelWrapper
+from integrations.mixpanel.models import MixpanelConfiguration
+
+
+@pytest.fixture()
+def batcher(mocker):
+    mocker.patch("integrations.common.batching.PeriodicFlusher")
+    return IdentifyBatcher(flush_interval=5, batch_size=2, max_pending=3)
+
+
+def test_identify_integrations_adds_identity_to_batcher_when_batching_enabled(
+    mocker, settings, environment, identity
+):
+    # Given
+    settings.BATCH_IDENTITY_INTEGRATIONS = True
+    mock_get_identify_batcher = mocker.patch(
+        "integrations.integration.get_identify_batcher"
+    )
+    mock_identify_user_async = mocker.patch(
+        "integrations.amplitude.amplitude.AmplitudeWrapper.identify_user_async"
+    )
+    config = AmplitudeConfiguration.objects.create(
+        api_key="abc-123", environment=environment
+    )
+    feature_states = identity.get_all_feature_states()
+
+    # When
+    identify_integrations(identity, feature_states)
+
+    # Then
+    mock_identify_user_async.assert_not_called()
+    key, get_wrapper, *args = mock_get_identify_batcher.return_value.add.call_args[0]
+    assert key == ("amplitude_config", config.id)
+    assert get_wrapper().api_key == "abc-123"
+    assert args == [identity, feature_states]
+
+
+def test_identify_batcher_sends_latest_call_for_each_identity_in_batches(
+    mocker, batcher
+):
+    # Given
+    wrapper = mocker.MagicMock()
+    wrapper.generate_user_data.side_effect = lambda identity, feature_states: (
+        identity.identifier,
+        feature_states,
+    )
+    identities = [Identity(id=i, identifier=f"identity-{i}") for i in range(3)]
+
+    batcher.add(("integration_config", 1), lambda: wrapper, identities[0], ["old"])
+    batcher.add(("integration_config", 1), lambda: wrapper, identities[1], ["b"])
+    batcher.add(("integration_config", 1), lambda: wrapper, identities[0], ["new"])
+    batcher.add(("integration_config", 1), lambda: wrapper, identities[2], ["c"])
+
+    # When
+    batcher.flush()
+
+    # Then
+    assert [call[0][0] for call in wrapper.identify_users.call_args_list] == [
+        [("identity-0", ["new"]), ("identity-1", ["b"])],
+        [("identity-2", ["c"])],
+    ]
+
+    # and nothing is left to send
+    wrapper.reset_mock()
+    batcher.flush()
+    wrapper.identify_users.assert_not_called()
+
+
+def test_identify_batcher_drops_identities_when_too_many_are_pending(mocker, batcher):
+    # Given
+    wrapper = mocker.MagicMock()
+    identities = [Identity(id=i, identifier=f"identity-{i}") for i in range(4)]
+    for identity in identities[:3]:
+        assert batcher.add(("integration_config", 1), lambda: wrapper, identity, [])
+
+    # When
+    added = batcher.add(("integration_config", 2), lambda: wrapper, identities[3], [])
+
+    # Then
+    assert added is False
+    assert batcher.dropped_count == 1
+
+    # but identities that are already waiting can still be updated
+    assert batcher.add(("integration_config", 1), lambda: wrapper, identities[0], [])
+
+
+def test_identify_batcher_keeps_sending_when_an_integration_fails(mocker, batcher):
+    # Given
+    failing_wrapper = mocker.MagicMock()
+    failing_wrapper.identify_users.side_effect = Exception("Unavailable")
+    wrapper = mocker.MagicMock()
+    identity = Identity(id=1, identifier="identity")
+
+    batcher.add(("integration_a_config", 1), lambda: failing_wrapper, identity, [])
+    batcher.add(("integration_b_config", 1), lambda: wrapper, identity, [])
+
+    # When
+    batcher.flush()
+
+    # Then
+    wrapper.identify_users.assert_called_once()
+
+
+def test_amplitude_identify_users_sends_all_users_in_one_request(mocker, settings):
+    # Given
+    settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS = 3
+    mock_session = mocker.patch(
+        "integrations.amplitude.amplitude.get_integrations_session"
+    ).return_value
+    wrapper = AmplitudeWrapper(AmplitudeConfiguration(api_key="123key"))
+    users_data = [{"user_id": "user-1"}, {"user_id": "user-2"}]
+
+    # When
+    wrapper.identify_users(users_data)
+
+    # Then
+    mock_session.post.assert_called_once_with(
+        wrapper.url,
+        data={"api_key": "123key", "identification": json.dumps(users_data)},
+        timeout=3,
+    )
+
+
+def test_heap_identify_users_sends_all_events_in_one_request(mocker, settings):
+    # Given
+    settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS = 3
+    mock_session = mocker.patch(
+        "integrations.heap.heap.get_integrations_session"
+    ).return_value
+    wrapper = HeapWrapper(HeapConfiguration(api_key="123key"))
+    event = {"event": "Flagsmith Feature Flags", "properties": {"feature": True}}
+    users_data = [
+        {"app_id": "123key", "identity": "user-1", **event},
+        {"app_id": "123key", "identity": "user-2", **event},
+    ]
+
+    # When
+    wrapper.identify_users(users_data)
+
+    # Then
+    mock_session.post.assert_called_once_with(
+        wrapper.url,
+        json={
+            "app_id": "123key",
+            "events": [
+                {"identity": "user-1", **event},
+                {"identity": "user-2", **event},
+            ],
+        },
+        timeout=3,
+    )
+
+
+def test_mixpanel_identify_users_sends_all_users_in_one_request(mocker, settings):
+    # Given
+    settings.INTEGRATIONS_REQUEST_TIMEOUT_SECONDS = 3
+    mock_session = mocker.patch(
+        "integrations.mixpanel.mixpanel.get_integrations_session"
+    ).return_value
+    wrapper = MixpanelWrapper(MixpanelConfiguration(api_key="123key"))
+    users_data = [{"$distinct_id": "user-1"}, {"$distinct_id": "user-2"}]
+
+    # When
+    wrapper.identify_users(users_data)
+
+    # Then
+    mock_session.post.assert_called_once_with(
+        wrapper.url,
+        headers=wrapper.headers,
+        data={"data": json.dumps(users_data)},
+        timeout=3,
+    )
@@ -0,0 +1,128 @@
+import threading
+
+from util.util import (
+    BoundedExecutor,
+    get_executor,
+    get_executor_metrics,
+    postpone,
+)
+
+
+def test_bounded_executor_runs_submitted_functions(mocker):
+    # Given
+    executor = BoundedExecutor(max_workers=2, max_queue_size=10, name="test")
+    results = []
+
+    # When
+    for i in range(5):
+        executor.submit(results.append, i)
+    executor._queue.join()
+
+    # Then
+    assert sorted(results) == [0, 1, 2, 3, 4]
+    assert executor.get_metrics() == {
+        "queue_size": 0,
+        "submitted": 5,
+        "dropped": 0,
+        "failed": 0,
+        "completed": 5,
+        "average_wait_seconds": mocker.ANY,
+        "max_wait_seconds": mocker.ANY,
+    }
+
+
+def test_bounded_executor_drops_functions_when_queue_is_full():
+    # Given - a single worker which is busy and a queue with room for one function
+    executor = BoundedExecutor(max_workers=1, max_queue_size=1, name="test")
+    started, release = threading.Event(), threading.Event()
+    executor.submit(lambda: started.set() or release.wait())
+    started.wait()
+
+    # When
+    submitted = [executor.submit(lambda: None) for _ in range(3)]
+
+    # Then
+    assert submitted == [True, False, False]
+    assert executor.get_metrics()["dropped"] == 2
+
+    release.set()
+    executor._queue.join()
+
+
+def test_bounded_executor_counts_failures():
+    # Given
+    executor = BoundedExecutor(max_workers=1, max_queue_size=1, name="test")
+
+    # When
+    executor.submit(lambda: 1 / 0)
+    executor._queue.join()
+
+    # Then
+    assert executor.get_metrics()["failed"] == 1
+
+
+def test_bounded_executor_shutdown_waits_for_queued_functions():
+    # Given
+    executor = BoundedExecutor(max_workers=1, max_queue_size=10, name="test")
+    release = threading.Event()
+    results = []
+    executor.submit(release.wait)
+    executor.submit(results.append, 1)
+
+    # When
+    release.set()
+    is_drained = executor.shutdown(timeout=5)
+
+    # Then
+    assert is_drained
+    assert results == [1]
+
+    # and no more functions are accepted
+    assert executor.submit(results.append, 2) is False
+
+
+def test_bounded_executor_shutdown_gives_up_after_timeout():
+    # Given
+    executor = BoundedExecutor(max_workers=1, max_queue_size=10, name="test")
+    release = threading.Event()
+    executor.submit(release.wait)
+
+    # When
+    is_drained = executor.shutdown(timeout=0.01)
+
+    # Then
+    assert not is_drained
+    release.set()
+
+
+def test_postpone_runs_function_with_executor_of_queue(mocker):
+    # Given
+    mocked_get_executor = mocker.patch("util.util.get_executor")
+
+    @postpone(queue_name="test-queue")
+    def function(*args, **kwargs):
+        pass
+
+    # When
+    result = function(1, key="value")
+
+    # Then
+    assert result is None
+    mocked_get_executor.assert_called_once_with("test-queue")
+    mocked_get_executor.return_value.submit.assert_called_once_with(
+        function.__wrapped__, 1, key="value"
+    )
+
+
+def test_get_executor_returns_same_executor_for_each_queue(settings):
+    # Given
+    settings.BACKGROUND_EXECUTOR_MAX_WORKERS = 3
+
+    # When
+    executor = get_executor("test-get-executor")
+
+    # Then
+    assert executor is get_executor("test-get-executor")
+    assert executor is not get_executor("test-get-executor-other")
+    assert executor.max_workers == 3
+    assert "test-get-executor" in get_executor_metrics()
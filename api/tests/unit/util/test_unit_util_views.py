@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf.urls import url
+from django.db import connections
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from features.views import SDKFeatureStates
+from util.views import sdk_urls, sdk_view
+
+
+@pytest.fixture()
+def sdk_executor(mocker):
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-sdk-view")
+    mocker.patch("util.views._get_sdk_executor", return_value=executor)
+    yield executor
+    # close the connections opened by the pool so that the test database can be
+    # dropped at the end of the test run
+    executor.submit(connections.close_all).result()
+    executor.shutdown()
+
+
+class ThreadNameView(APIView):
+    authentication_classes = permission_classes = ()
+
+    def get(self, request, *args, **kwargs):
+        return Response({"thread": threading.current_thread().name})
+
+
+def test_sdk_view_returns_view_if_async_sdk_views_are_disabled(settings):
+    # Given
+    settings.ENABLE_ASYNC_SDK_VIEWS = False
+    view = ThreadNameView.as_view()
+
+    # When / Then
+    assert sdk_view(view) is view
+
+
+def test_sdk_view_runs_view_in_sdk_thread_pool(settings, sdk_executor):
+    # Given
+    settings.ENABLE_ASYNC_SDK_VIEWS = True
+    view = sdk_view(ThreadNameView.as_view())
+    request = APIRequestFactory().get("/")
+
+    # When
+    response = async_to_sync(view)(request)
+
+    # Then
+    assert asyncio.iscoroutinefunction(view)
+    assert view.cls is ThreadNameView
+    assert view.csrf_exempt
+    assert response.is_rendered
+    assert response.data["thread"].startswith("test-sdk-view")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_sdk_flags_view_returns_flags(
+    settings, sdk_executor, environment, feature
+):
+    # Given
+    settings.ENABLE_ASYNC_SDK_VIEWS = True
+    view = sdk_view(SDKFeatureStates.as_view())
+    request = APIRequestFactory().get(
+        "/api/v1/flags/", HTTP_X_ENVIRONMENT_KEY=environment.api_key
+    )
+
+    # When
+    response = async_to_sync(view)(request)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert [flag["feature"]["name"] for flag in response.data] == [feature.name]
+
+
+def test_sdk_urls_wraps_views_of_url_patterns(settings):
+    # Given
+    settings.ENABLE_ASYNC_SDK_VIEWS = True
+    url_patterns = [url(r"^test/$", ThreadNameView.as_view(), name="test")]
+
+    # When
+    async_url_patterns = sdk_urls(url_patterns)
+
+    # Then
+    assert async_url_patterns[0].name == "test"
+    assert async_url_patterns[0].pattern == url_patterns[0].pattern
+    assert asyncio.iscoroutinefunction(async_url_patterns[0].callback)
@@ -30,11 +30,11 @@ class MailerLiteBaseClient:
 class MailerLite(MailerLiteBaseClient):
     resource = f"groups/{settings.MAILERLITE_NEW_USER_GROUP_ID}/subscribers"
 
-    @postpone
+    @postpone(queue_name="mailer-lite")
     def subscribe(self, user: "models.FFAdminUser"):
         self._subscribe(user)
 
-    @postpone
+    @postpone(queue_name="mailer-lite")
     def update_organisation_users(self, organisation_id: int):
         return self._update_organisation_users(organisation_id)
 
@@ -1,10 +1,240 @@
+import atexit
+import functools
+import logging
+import queue
+import threading
+import time
+import typing
 from threading import Thread
 
+from django.conf import settings
+from django.db import close_old_connections
 
-def postpone(function):
-    def decorator(*args, **kwargs):
-        t = Thread(target=function, args=args, kwargs=kwargs)
-        t.daemon = True
-        t.start()
+logger = logging.getLogger(__name__)
 
-    return decorator
+
+def postpone(function: typing.Callable = None, *, queue_name: str = "default"):
+    """
+    Run the decorated function in the background, using the executor of the given
+    queue, rather than in the calling thread. Can be used as `@postpone` or
+    `@postpone(queue_name="...")`.
+    """
+
+    def decorator(function: typing.Callable) -> typing.Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            get_executor(queue_name).submit(function, *args, **kwargs)
+
+        return wrapper
+
+    if function is None:
+        return decorator
+    return decorator(function)
+
+
+class PeriodicFlusher:
+    """
+    Call the given flush function from a daemon thread every `interval` seconds (or
+    as soon as `wake` is called) and, unless `flush_at_exit` is False, once more when
+    the process exits. The thread is only started by the first call to `start`.
+    """
+
+    def __init__(
+        self,
+        flush: typing.Callable[[], None],
+        interval: float,
+        name: str,
+        flush_at_exit: bool = True,
+    ):
+        self.flush = flush
+        self.interval = interval
+        self.name = name
+        self.flush_at_exit = flush_at_exit
+
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                if self.flush_at_exit:
+                    atexit.register(self.flush)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("Error in %s.", self.name)
+
+
+class BoundedExecutor:
+    """
+    Run functions on a fixed number of daemon worker threads, which are started by
+    the first call to `submit`. Functions submitted while `max_queue_size` others are
+    already waiting are dropped, rather than queued, so that a slow or unavailable
+    downstream service can't exhaust the threads or memory of the process. When the
+    process exits, the functions already queued are given up to `shutdown_timeout`
+    seconds to run.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue_size: int,
+        name: str,
+        shutdown_timeout: float = 10,
+    ):
+        self.max_workers = max_workers
+        self.name = name
+        self.shutdown_timeout = shutdown_timeout
+
+        self.submitted_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self.completed_count = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._is_shut_down = False
+
+    def submit(self, function: typing.Callable, *args, **kwargs) -> bool:
+        """
+        Queue the function to be called with the given arguments.
+
+        :return: False if the queue is full (or the executor has been shut down)
+            and the function has been dropped
+        """
+        self._start()
+        try:
+            if self._is_shut_down:
+                raise queue.Full()
+            self._queue.put_nowait((function, args, kwargs, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.dropped_count += 1
+            logger.warning("Queue of %s is full, dropping %r.", self.name, function)
+            return False
+
+        with self._lock:
+            self.submitted_count += 1
+        return True
+
+    def shutdown(self, timeout: float = None) -> bool:
+        """
+        Stop accepting functions and wait for those already queued to finish.
+
+        :return: False if they didn't finish within the timeout
+        """
+        self._is_shut_down = True
+        timeout = self.shutdown_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(
+                        "Shut down %s with %d functions still queued.",
+                        self.name,
+                        self._queue.unfinished_tasks,
+                    )
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+
+        logger.info("Shut down %s: %s", self.name, self.get_metrics())
+        return True
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            return {
+                "queue_size": self._queue.qsize(),
+                "submitted": self.submitted_count,
+                "dropped": self.dropped_count,
+                "failed": self.failed_count,
+                "completed": self.completed_count,
+                "average_wait_seconds": (
+                    self.total_wait_seconds / self.completed_count
+                    if self.completed_count
+                    else 0.0
+                ),
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+    def _start(self) -> None:
+        if self._threads:
+            return
+
+        with self._lock:
+            if not self._threads:
+                self._threads = [
+                    Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+                    for i in range(self.max_workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+                atexit.register(self.shutdown)
+
+    def _work(self) -> None:
+        while True:
+            function, args, kwargs, submitted_at = self._queue.get()
+            wait_seconds = time.monotonic() - submitted_at
+            failed = False
+            try:
+                function(*args, **kwargs)
+            except Exception:
+                failed = True
+                logger.exception("Error in %s calling %r.", self.name, function)
+            finally:
+                close_old_connections()
+                with self._lock:
+                    self.completed_count += 1
+                    self.failed_count += failed
+                    self.total_wait_seconds += wait_seconds
+                    self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+                self._queue.task_done()
+
+
+_executors: typing.Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(
+    name: str, max_workers: int = None, max_queue_size: int = None
+) -> BoundedExecutor:
+    """
+    Get the executor of the named queue, creating it on first use. Each queue has its
+    own workers so that a slow subsystem can't hold up the others.
+    """
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = BoundedExecutor(
+                max_workers or settings.BACKGROUND_EXECUTOR_MAX_WORKERS,
+                max_queue_size or settings.BACKGROUND_EXECUTOR_MAX_QUEUE_SIZE,
+                name=name,
+                shutdown_timeout=settings.BACKGROUND_EXECUTOR_SHUTDOWN_TIMEOUT_SECONDS,
+            )
+        return _executors[name]
+
+
+def get_executor_metrics() -> typing.Dict[str, dict]:
+    return {name: executor.get_metrics() for name, executor in list(_executors.items())}
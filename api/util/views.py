@@ -1,3 +1,11 @@
+import functools
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
 from rest_framework.generics import GenericAPIView
 
 from environments.authentication import EnvironmentKeyAuthentication
@@ -7,3 +15,60 @@ from environments.permissions.permissions import EnvironmentKeyPermissions
 class SDKAPIView(GenericAPIView):
     permission_classes = (EnvironmentKeyPermissions,)
     authentication_classes = (EnvironmentKeyAuthentication,)
+
+
+def sdk_view(view: typing.Callable) -> typing.Callable:
+    """
+    Wrap the given (synchronous) view in an async view that runs it in the bounded
+    SDK thread pool, if ENABLE_ASYNC_SDK_VIEWS is set. This means that, when served
+    with ASGI, requests waiting for a thread don't hold one and the number of
+    database connections used by SDK requests is limited to the size of the pool.
+
+    Only the event loop is freed, the view itself still blocks its pool thread on
+    database queries and outbound requests (e.g. to the edge API or integrations).
+    """
+    if not settings.ENABLE_ASYNC_SDK_VIEWS:
+        return view
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        run_view = sync_to_async(
+            _run_view,
+            thread_sensitive=False,
+            executor=_get_sdk_executor(settings.ASYNC_SDK_VIEWS_MAX_THREADS),
+        )
+        return await run_view(view, request, *args, **kwargs)
+
+    return async_view
+
+
+def sdk_urls(url_patterns: typing.Iterable[URLPattern]) -> typing.List[URLPattern]:
+    return [
+        URLPattern(
+            url_pattern.pattern,
+            sdk_view(url_pattern.callback),
+            url_pattern.default_args,
+            url_pattern.name,
+        )
+        for url_pattern in url_patterns
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_sdk_executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sdk-view")
+
+
+def _run_view(view: typing.Callable, request, *args, **kwargs):
+    # the request_started and request_finished signals that usually clean up the
+    # database connections are sent from a different thread, so do it here instead
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, "render", None)):
+            # render in the pool rather than in the thread that runs the synchronous
+            # code of the request
+            response.render()
+        return response
+    finally:
+        close_old_connections()
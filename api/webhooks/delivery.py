@@ -0,0 +1,353 @@
+"""
+Durable delivery of webhook events. When WEBHOOK_OUTBOX_ENABLED is set, events are
+recorded as WebhookDelivery rows, in the transaction that triggered them, and are
+delivered by the deliver_webhooks command or, if WEBHOOK_DELIVER_IN_WEB_PROCESSES is
+set, in the background by the processes that record them. Failed deliveries are
+retried with exponential backoff and requests to URLs that keep failing are paused
+by a circuit breaker, so that a slow or broken webhook only delays its own events.
+Deliveries that fail every attempt are kept for
+WEBHOOK_FAILED_DELIVERY_RETENTION_DAYS.
+"""
+import logging
+import threading
+import time
+import typing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from util.util import PeriodicFlusher
+from webhooks.models import FAILED, PENDING, WebhookDelivery
+from webhooks.webhooks import (
+    WebhookModels,
+    WebhookType,
+    get_webhook_model,
+    get_webhook_request_data,
+    send_failure_email,
+)
+
+logger = logging.getLogger(__name__)
+
+# deliveries are claimed by a process for this long, after which they are retried if
+# it hasn't recorded whether they were delivered, e.g. because it was killed
+CLAIM_SECONDS = 300
+
+
+class DeliveryOutcome(typing.NamedTuple):
+    delivery: WebhookDelivery
+    webhook: WebhookModels
+    error: str = ""
+    status_code: int = None
+    # set if the delivery wasn't attempted as the circuit of its URL is open
+    retry_in_seconds: float = None
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to a URL after `failure_threshold` consecutive failures.
+    Every `reset_timeout` seconds after that, a single request is let through, which
+    closes the circuit again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._failures: typing.Dict[str, int] = {}
+        self._opened_at: typing.Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def allow_request(self, url: str) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(url)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.reset_timeout:
+                return False
+            self._opened_at[url] = time.monotonic()
+            return True
+
+    def get_seconds_until_retry(self, url: str) -> float:
+        with self._lock:
+            opened_at = self._opened_at.get(url)
+            if opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - opened_at))
+
+    def record_success(self, url: str) -> None:
+        with self._lock:
+            self._failures.pop(url, None)
+            self._opened_at.pop(url, None)
+
+    def record_failure(self, url: str) -> None:
+        with self._lock:
+            self._failures[url] = self._failures.get(url, 0) + 1
+            if self._failures[url] >= self.failure_threshold:
+                self._opened_at[url] = time.monotonic()
+
+
+def enqueue_webhook_deliveries(
+    webhooks: typing.Iterable[WebhookModels], data: dict, webhook_type: WebhookType
+) -> None:
+    deliveries = WebhookDelivery.objects.bulk_create(
+        WebhookDelivery(
+            webhook_type=webhook_type.value, webhook_id=webhook.id, payload=data
+        )
+        for webhook in webhooks
+    )
+    if deliveries and settings.WEBHOOK_DELIVER_IN_WEB_PROCESSES:
+        deliverer = get_webhook_deliverer()
+        deliverer.start()
+        transaction.on_commit(deliverer.wake)
+
+
+def deliver_all_webhooks() -> None:
+    while deliver_webhooks():
+        pass
+    delete_expired_failed_deliveries()
+
+
+def deliver_webhooks(limit: int = None) -> int:
+    """
+    Deliver (up to `limit` of) the events that are due to be delivered.
+
+    :return: the number of events claimed for delivery
+    """
+    deliveries = _claim_deliveries(limit or settings.WEBHOOK_DELIVERY_BATCH_SIZE)
+    if not deliveries:
+        return 0
+
+    # the events for each URL are sent by a single thread, one request at a time
+    groups_by_url = defaultdict(list)
+    for webhook, webhook_deliveries in _group_deliveries_by_webhook(deliveries):
+        groups_by_url[webhook.url].append((webhook, webhook_deliveries))
+
+    executor = get_delivery_executor()
+    futures = [
+        executor.submit(_deliver_to_url, url, groups)
+        for url, groups in groups_by_url.items()
+    ]
+    _record_outcomes([outcome for future in futures for outcome in future.result()])
+    return len(deliveries)
+
+
+def delete_expired_failed_deliveries() -> int:
+    """
+    Delete the deliveries whose last attempt failed more than
+    WEBHOOK_FAILED_DELIVERY_RETENTION_DAYS ago.
+
+    :return: the number of deliveries deleted
+    """
+    # failed deliveries aren't claimed again, so their next attempt is when they
+    # were last claimed
+    expired_before = timezone.now() - timedelta(
+        days=settings.WEBHOOK_FAILED_DELIVERY_RETENTION_DAYS,
+        seconds=CLAIM_SECONDS,
+    )
+    deleted_count, _ = WebhookDelivery.objects.filter(
+        status=FAILED, next_attempt_at__lt=expired_before
+    ).delete()
+    return deleted_count
+
+
+def get_webhook_deliverer() -> PeriodicFlusher:
+    return _get_webhook_deliverer(settings.WEBHOOK_DELIVERY_INTERVAL_SECONDS)
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    return _get_circuit_breaker(
+        settings.WEBHOOK_CIRCUIT_BREAKER_THRESHOLD,
+        settings.WEBHOOK_CIRCUIT_BREAKER_RESET_SECONDS,
+    )
+
+
+def get_delivery_executor() -> ThreadPoolExecutor:
+    return _get_delivery_executor(settings.WEBHOOK_DELIVERY_MAX_WORKERS)
+
+
+def get_webhook_session() -> requests.Session:
+    return _get_webhook_session(settings.WEBHOOK_DELIVERY_MAX_WORKERS)
+
+
+@lru_cache(maxsize=None)
+def _get_webhook_deliverer(interval: float) -> PeriodicFlusher:
+    # deliveries left when the process exits are made by the next one to run
+    return PeriodicFlusher(
+        deliver_all_webhooks, interval, name="webhook-deliverer", flush_at_exit=False
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_circuit_breaker(failure_threshold: int, reset_timeout: float):
+    return CircuitBreaker(failure_threshold, reset_timeout)
+
+
+@lru_cache(maxsize=None)
+def _get_delivery_executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers, thread_name_prefix="webhook-delivery")
+
+
+@lru_cache(maxsize=None)
+def _get_webhook_session(max_workers: int) -> requests.Session:
+    # keep connections to each host alive, for each worker
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _claim_deliveries(limit: int) -> typing.List[WebhookDelivery]:
+    now = timezone.now()
+    with transaction.atomic():
+        deliveries = list(
+            WebhookDelivery.objects.select_for_update(skip_locked=True)
+            .filter(status=PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        WebhookDelivery.objects.filter(
+            id__in=[delivery.id for delivery in deliveries]
+        ).update(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+    return deliveries
+
+
+def _group_deliveries_by_webhook(
+    deliveries: typing.List[WebhookDelivery],
+) -> typing.List[typing.Tuple[WebhookModels, typing.List[WebhookDelivery]]]:
+    webhook_ids_by_type = defaultdict(set)
+    for delivery in deliveries:
+        webhook_ids_by_type[delivery.webhook_type].add(delivery.webhook_id)
+
+    webhooks = {}
+    for webhook_type, webhook_ids in webhook_ids_by_type.items():
+        webhook_model = get_webhook_model(WebhookType(webhook_type))
+        for webhook in webhook_model.objects.filter(id__in=webhook_ids, enabled=True):
+            webhooks[(webhook_type, webhook.id)] = webhook
+
+    deliveries_by_webhook = defaultdict(list)
+    orphaned_ids = []
+    for delivery in deliveries:
+        key = (delivery.webhook_type, delivery.webhook_id)
+        if key in webhooks:
+            deliveries_by_webhook[key].append(delivery)
+        else:
+            orphaned_ids.append(delivery.id)
+
+    # the webhooks have been deleted, or disabled, since the events were recorded
+    WebhookDelivery.objects.filter(id__in=orphaned_ids).delete()
+
+    return [
+        (webhooks[key], webhook_deliveries)
+        for key, webhook_deliveries in deliveries_by_webhook.items()
+    ]
+
+
+def _deliver_to_url(
+    url: str,
+    groups: typing.List[typing.Tuple[WebhookModels, typing.List[WebhookDelivery]]],
+) -> typing.List[DeliveryOutcome]:
+    circuit_breaker = get_circuit_breaker()
+    outcomes = []
+    for webhook, deliveries in groups:
+        for batch in _get_batches(deliveries):
+            if not circuit_breaker.allow_request(url):
+                retry_in_seconds = circuit_breaker.get_seconds_until_retry(url)
+                outcomes.extend(
+                    DeliveryOutcome(d, webhook, retry_in_seconds=retry_in_seconds)
+                    for d in batch
+                )
+                continue
+
+            error, status_code = _post(webhook, batch)
+            if error:
+                circuit_breaker.record_failure(url)
+            else:
+                circuit_breaker.record_success(url)
+            outcomes.extend(
+                DeliveryOutcome(d, webhook, error, status_code) for d in batch
+            )
+    return outcomes
+
+
+def _get_batches(
+    deliveries: typing.List[WebhookDelivery],
+) -> typing.Iterable[typing.List[WebhookDelivery]]:
+    batch_size = max(settings.WEBHOOK_BATCH_MAX_EVENTS, 1)
+    for start in range(0, len(deliveries), batch_size):
+        end = start + batch_size
+        yield deliveries[start:end]
+
+
+def _post(
+    webhook: WebhookModels, batch: typing.List[WebhookDelivery]
+) -> typing.Tuple[str, typing.Optional[int]]:
+    # when batching is enabled, events are always sent as a list, even on their own
+    payload = (
+        [delivery.payload for delivery in batch]
+        if settings.WEBHOOK_BATCH_MAX_EVENTS > 1
+        else batch[0].payload
+    )
+    json_data, headers = get_webhook_request_data(webhook, payload)
+    try:
+        response = get_webhook_session().post(
+            str(webhook.url),
+            data=json_data,
+            headers=headers,
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+        )
+    except requests.exceptions.RequestException as e:
+        return str(e) or e.__class__.__name__, None
+
+    if not 200 <= response.status_code < 300:
+        return f"Received status code {response.status_code}.", response.status_code
+    return "", response.status_code
+
+
+def _record_outcomes(outcomes: typing.List[DeliveryOutcome]) -> None:
+    now = timezone.now()
+    delivered_ids = []
+    updated_deliveries = []
+    for outcome in outcomes:
+        delivery = outcome.delivery
+        if outcome.retry_in_seconds is not None:
+            delivery.next_attempt_at = now + timedelta(seconds=outcome.retry_in_seconds)
+        elif not outcome.error:
+            delivered_ids.append(delivery.id)
+            continue
+        else:
+            delivery.attempts += 1
+            delivery.last_error = outcome.error
+            if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                delivery.status = FAILED
+                _send_failure_email(outcome)
+            else:
+                delivery.next_attempt_at = now + _get_retry_delay(delivery.attempts)
+        updated_deliveries.append(delivery)
+
+    WebhookDelivery.objects.filter(id__in=delivered_ids).delete()
+    WebhookDelivery.objects.bulk_update(
+        updated_deliveries, ["status", "attempts", "next_attempt_at", "last_error"]
+    )
+
+
+def _get_retry_delay(attempts: int) -> timedelta:
+    seconds = settings.WEBHOOK_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.WEBHOOK_RETRY_MAX_BACKOFF_SECONDS))
+
+
+def _send_failure_email(outcome: DeliveryOutcome) -> None:
+    try:
+        send_failure_email(
+            outcome.webhook,
+            outcome.delivery.payload,
+            WebhookType(outcome.delivery.webhook_type),
+            outcome.status_code,
+        )
+    except Exception:
+        logger.exception("Failed to send webhook failure email.")
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management import BaseCommand
+
+from webhooks.delivery import deliver_all_webhooks
+
+
+class Command(BaseCommand):
+    help = "Deliver the webhook events recorded in the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Deliver the events that are due and exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between checking for events that are due",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deliver_all_webhooks()
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -1,4 +1,10 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+
+PENDING = "PENDING"
+FAILED = "FAILED"
+DELIVERY_STATUSES = ((PENDING, "Pending"), (FAILED, "Failed"))
 
 
 class AbstractBaseWebhookModel(models.Model):
@@ -7,3 +13,26 @@ class AbstractBaseWebhookModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class WebhookDelivery(models.Model):
+    """
+    An event waiting to be delivered to a webhook (or that could not be delivered),
+    recorded when WEBHOOK_OUTBOX_ENABLED is set. See webhooks.delivery.
+    """
+
+    webhook_type = models.CharField(max_length=50)
+    webhook_id = models.PositiveIntegerField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(
+        max_length=50,
+        choices=DELIVERY_STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=("status", "next_attempt_at"))]
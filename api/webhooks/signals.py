@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from environments.models import Webhook
+from organisations.models import OrganisationWebhook
+from webhooks.webhooks import (
+    WebhookType,
+    get_webhooks_cache_key,
+    webhooks_cache,
+)
+
+
+@receiver(post_save, sender=Webhook)
+@receiver(post_delete, sender=Webhook)
+def clear_environment_webhooks_cache(instance, **kwargs):
+    webhooks_cache.delete(
+        get_webhooks_cache_key(WebhookType.ENVIRONMENT, instance.environment_id)
+    )
+
+
+@receiver(post_save, sender=OrganisationWebhook)
+@receiver(post_delete, sender=OrganisationWebhook)
+def clear_organisation_webhooks_cache(instance, **kwargs):
+    webhooks_cache.delete(
+        get_webhooks_cache_key(WebhookType.ORGANISATION, instance.organisation_id)
+    )
@@ -0,0 +1,243 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+import requests
+from django.apps import apps
+from django.core.management import call_command
+from django.utils import timezone
+
+from environments.models import Webhook
+from webhooks.delivery import (
+    CircuitBreaker,
+    delete_expired_failed_deliveries,
+    deliver_webhooks,
+)
+from webhooks.models import FAILED, PENDING, WebhookDelivery
+from webhooks.webhooks import WebhookEventType, call_environment_webhooks
+
+
+@pytest.fixture()
+def outbox(settings):
+    settings.WEBHOOK_OUTBOX_ENABLED = True
+    # deliver from the test rather than from a background thread
+    settings.WEBHOOK_DELIVER_IN_WEB_PROCESSES = False
+    settings.WEBHOOK_CIRCUIT_BREAKER_THRESHOLD = 3
+    settings.WEBHOOK_CIRCUIT_BREAKER_RESET_SECONDS = 60
+    settings.WEBHOOK_MAX_ATTEMPTS = 2
+
+
+@pytest.fixture()
+def webhook(environment):
+    return Webhook.objects.create(
+        url="http://url.1.com", enabled=True, environment=environment
+    )
+
+
+@pytest.fixture()
+def mock_session(mocker):
+    mock_session = mock.MagicMock()
+    mock_session.post.return_value.status_code = 200
+    mocker.patch("webhooks.delivery.get_webhook_session", return_value=mock_session)
+    return mock_session
+
+
+@pytest.fixture(autouse=True)
+def circuit_breaker(mocker):
+    circuit_breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    mocker.patch("webhooks.delivery.get_circuit_breaker", return_value=circuit_breaker)
+    return circuit_breaker
+
+
+def test_events_are_recorded_and_delivered_later(
+    outbox, environment, webhook, mock_session
+):
+    # When
+    call_environment_webhooks(
+        environment, {"foo": "bar"}, WebhookEventType.FLAG_UPDATED
+    )
+
+    # Then
+    mock_session.post.assert_not_called()
+    delivery = WebhookDelivery.objects.get()
+    assert delivery.webhook_id == webhook.id
+    assert delivery.payload["data"] == {"foo": "bar"}
+
+    # and
+    assert deliver_webhooks() == 1
+    mock_session.post.assert_called_once()
+    args, kwargs = mock_session.post.call_args
+    assert args[0] == webhook.url
+    assert kwargs["timeout"] == 10.0
+    assert not WebhookDelivery.objects.exists()
+
+
+def test_failed_deliveries_are_retried_with_backoff(
+    outbox, environment, webhook, mock_session, mocker
+):
+    # Given
+    mock_send_failure_email = mocker.patch("webhooks.delivery.send_failure_email")
+    mock_session.post.return_value.status_code = 500
+    call_environment_webhooks(environment, {}, WebhookEventType.FLAG_UPDATED)
+
+    # When
+    deliver_webhooks()
+
+    # Then
+    delivery = WebhookDelivery.objects.get()
+    assert delivery.status == PENDING
+    assert delivery.attempts == 1
+    assert delivery.last_error == "Received status code 500."
+    assert delivery.next_attempt_at > timezone.now() + timedelta(seconds=29)
+    assert deliver_webhooks() == 0
+
+    # and the organisation is emailed once the last attempt fails
+    WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+    deliver_webhooks()
+    delivery.refresh_from_db()
+    assert delivery.status == FAILED
+    mock_send_failure_email.assert_called_once()
+    assert mock_send_failure_email.call_args[0][3] == 500
+
+
+def test_circuit_breaker_defers_deliveries_to_failing_url(
+    outbox, environment, webhook, mock_session
+):
+    # Given
+    mock_session.post.side_effect = requests.exceptions.ConnectTimeout()
+    for _ in range(5):
+        call_environment_webhooks(environment, {}, WebhookEventType.FLAG_UPDATED)
+
+    # When
+    deliver_webhooks()
+
+    # Then
+    assert mock_session.post.call_count == 3
+    assert sorted(WebhookDelivery.objects.values_list("attempts", flat=True)) == [
+        0,
+        0,
+        1,
+        1,
+        1,
+    ]
+
+
+def test_events_are_batched(outbox, settings, environment, webhook, mock_session):
+    # Given
+    settings.WEBHOOK_BATCH_MAX_EVENTS = 10
+    for i in range(3):
+        call_environment_webhooks(environment, {"i": i}, WebhookEventType.FLAG_UPDATED)
+
+    # When
+    deliver_webhooks()
+
+    # Then
+    mock_session.post.assert_called_once()
+    assert '"i": 2' in mock_session.post.call_args[1]["data"]
+    assert not WebhookDelivery.objects.exists()
+
+
+def test_deliveries_to_disabled_webhooks_are_dropped(
+    outbox, environment, webhook, mock_session
+):
+    # Given
+    call_environment_webhooks(environment, {}, WebhookEventType.FLAG_UPDATED)
+    Webhook.objects.filter(id=webhook.id).update(enabled=False)
+
+    # When
+    deliver_webhooks()
+
+    # Then
+    mock_session.post.assert_not_called()
+    assert not WebhookDelivery.objects.exists()
+
+
+def test_expired_failed_deliveries_are_deleted(outbox, settings, environment, webhook):
+    # Given
+    settings.WEBHOOK_FAILED_DELIVERY_RETENTION_DAYS = 30
+    for _ in range(3):
+        call_environment_webhooks(environment, {}, WebhookEventType.FLAG_UPDATED)
+    expired, failed, pending = WebhookDelivery.objects.order_by("id")
+    WebhookDelivery.objects.filter(id__in=[expired.id, pending.id]).update(
+        next_attempt_at=timezone.now() - timedelta(days=31)
+    )
+    WebhookDelivery.objects.filter(id__in=[expired.id, failed.id]).update(status=FAILED)
+
+    # When
+    deleted_count = delete_expired_failed_deliveries()
+
+    # Then
+    assert deleted_count == 1
+    assert set(WebhookDelivery.objects.values_list("id", flat=True)) == {
+        failed.id,
+        pending.id,
+    }
+
+
+def test_webhook_deliverer_is_not_started_when_app_is_ready(settings, mocker):
+    # Given
+    settings.WEBHOOK_OUTBOX_ENABLED = True
+    settings.WEBHOOK_DELIVER_IN_WEB_PROCESSES = True
+    mock_get_webhook_deliverer = mocker.patch("webhooks.delivery.get_webhook_deliverer")
+
+    # When
+    apps.get_app_config("webhooks").ready()
+
+    # Then
+    mock_get_webhook_deliverer.assert_not_called()
+
+
+def test_webhook_deliverer_is_started_by_first_event_if_delivering_in_web_processes(
+    outbox, settings, environment, webhook, mocker, django_capture_on_commit_callbacks
+):
+    # Given
+    settings.WEBHOOK_DELIVER_IN_WEB_PROCESSES = True
+    mock_get_webhook_deliverer = mocker.patch("webhooks.delivery.get_webhook_deliverer")
+    mock_deliverer = mock_get_webhook_deliverer.return_value
+
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        call_environment_webhooks(environment, {}, WebhookEventType.FLAG_UPDATED)
+
+    # Then
+    mock_deliverer.start.assert_called_once_with()
+    mock_deliverer.wake.assert_called_once_with()
+
+
+def test_deliver_webhooks_command_delivers_due_events(
+    outbox, environment, webhook, mock_session
+):
+    # Given
+    call_environment_webhooks(environment, {}, WebhookEventType.FLAG_UPDATED)
+
+    # When
+    call_command("deliver_webhooks", "--once")
+
+    # Then
+    mock_session.post.assert_called_once()
+    assert not WebhookDelivery.objects.exists()
+
+
+def test_circuit_breaker_lets_a_request_through_after_reset_timeout(mocker):
+    # Given
+    mock_time = mocker.patch("webhooks.delivery.time")
+    mock_time.monotonic.return_value = 0
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    url = "http://url.1.com"
+
+    # When
+    circuit_breaker.record_failure(url)
+    circuit_breaker.record_failure(url)
+
+    # Then
+    assert circuit_breaker.allow_request(url) is False
+    assert circuit_breaker.get_seconds_until_retry(url) == 60
+
+    # and a single request is let through after the timeout
+    mock_time.monotonic.return_value = 61
+    assert circuit_breaker.allow_request(url) is True
+    assert circuit_breaker.allow_request(url) is False
+
+    # and the circuit closes if it succeeds
+    circuit_breaker.record_success(url)
+    assert circuit_breaker.allow_request(url) is True
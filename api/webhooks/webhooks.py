@@ -6,11 +6,12 @@ import requests
 from core.constants import FLAGSMITH_SIGNATURE_HEADER
 from core.signing import sign_payload
 from django.conf import settings
+from django.core.cache import caches
 from django.core.mail import EmailMultiAlternatives
 from django.core.serializers.json import DjangoJSONEncoder
 from django.template.loader import get_template
 
-from environments.models import Webhook
+from environments.models import Environment, Webhook
 from organisations.models import OrganisationWebhook
 from webhooks.sample_webhook_data import (
     environment_webhook_data,
@@ -25,6 +26,8 @@ if typing.TYPE_CHECKING:
 
 WebhookModels = typing.Union[OrganisationWebhook, "environments.models.Webhook"]
 
+webhooks_cache = caches[settings.WEBHOOKS_CACHE_LOCATION]
+
 
 class WebhookEventType(enum.Enum):
     FLAG_UPDATED = "FLAG_UPDATED"
@@ -50,6 +53,42 @@ def get_webhook_model(webhook_type: WebhookType) -> typing.Union[WebhookModels]:
         return Webhook
 
 
+def environment_has_webhooks(environment_id: int) -> bool:
+    return webhooks_cache.get_or_set(
+        get_webhooks_cache_key(WebhookType.ENVIRONMENT, environment_id),
+        lambda: Webhook.objects.filter(
+            environment_id=environment_id, enabled=True
+        ).exists(),
+        timeout=settings.CACHE_WEBHOOKS_SECONDS,
+    )
+
+
+def organisation_has_webhooks(organisation_id: int) -> bool:
+    return webhooks_cache.get_or_set(
+        get_webhooks_cache_key(WebhookType.ORGANISATION, organisation_id),
+        lambda: OrganisationWebhook.objects.filter(
+            organisation_id=organisation_id, enabled=True
+        ).exists(),
+        timeout=settings.CACHE_WEBHOOKS_SECONDS,
+    )
+
+
+def get_environment_organisation_id(environment_id: int) -> int:
+    # cached so that checking whether the changes to an environment need sending to
+    # any webhooks doesn't need any queries
+    return webhooks_cache.get_or_set(
+        f"environment-organisation:{environment_id}",
+        lambda: Environment.objects.filter(id=environment_id)
+        .values_list("project__organisation_id", flat=True)
+        .first(),
+        timeout=settings.CACHE_WEBHOOKS_SECONDS,
+    )
+
+
+def get_webhooks_cache_key(webhook_type: WebhookType, owner_id: int) -> str:
+    return f"{webhook_type.value}:{owner_id}"
+
+
 def call_environment_webhooks(environment, data, event_type):
     _call_webhooks(
         environment.webhooks.filter(enabled=True),
@@ -82,17 +121,32 @@ def trigger_sample_webhook(
     return _call_webhook(webhook, serializer.data)
 
 
-def _call_webhook(
+def get_webhook_request_data(
     webhook: typing.Type[AbstractBaseWebhookModel],
-    data: typing.Mapping,
-) -> requests.models.Response:
+    data: typing.Any,
+) -> typing.Tuple[str, typing.Dict[str, str]]:
+    """
+    :return: the body, and headers, of the request to send the data to the webhook
+    """
     headers = {"content-type": "application/json"}
     json_data = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
     if webhook.secret:
         signature = sign_payload(json_data, key=webhook.secret)
         headers.update({FLAGSMITH_SIGNATURE_HEADER: signature})
+    return json_data, headers
 
-    return requests.post(str(webhook.url), data=json_data, headers=headers)
+
+def _call_webhook(
+    webhook: typing.Type[AbstractBaseWebhookModel],
+    data: typing.Mapping,
+) -> requests.models.Response:
+    json_data, headers = get_webhook_request_data(webhook, data)
+    return requests.post(
+        str(webhook.url),
+        data=json_data,
+        headers=headers,
+        timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+    )
 
 
 def _call_webhook_email_on_error(
@@ -100,7 +154,7 @@ def _call_webhook_email_on_error(
 ):
     try:
         res = _call_webhook(webhook, data)
-    except requests.exceptions.ConnectionError:
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         send_failure_email(webhook, data, webhook_type)
         return
 
@@ -112,6 +166,13 @@ def _call_webhooks(webhooks, data, event_type, webhook_type):
     webhook_data = {"event_type": event_type.value, "data": data}
     serializer = WebhookSerializer(data=webhook_data)
     serializer.is_valid(raise_exception=False)
+    if settings.WEBHOOK_OUTBOX_ENABLED:
+        # imported here as the delivery engine depends on this module
+        from webhooks.delivery import enqueue_webhook_deliveries
+
+        enqueue_webhook_deliveries(webhooks, serializer.data, webhook_type)
+        return
+
     for webhook in webhooks:
         _call_webhook_email_on_error(webhook, serializer.data, webhook_type)
 